@@ -1,5 +1,6 @@
 import shutil
 import subprocess
+import threading
 import time
 from collections import defaultdict
 
@@ -9,12 +10,21 @@ import requests
 import base64
 import re
 import os
-from svgpathtools import svg2paths
-from PIL import Image, ImageDraw
+from Metrics import stage_timer, timed
 
 # Load environment variables
 load_dotenv()
 
+# Seconds before its expiry a cached access token is refreshed anyway.
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "120"))
+
+# Access token shared by all ACCAPI instances, when it expires (time.time()), and whether a
+# thread is waiting for someone to complete the interactive authorization.
+_token_cache = {"access_token": None, "expires_at": 0, "authorizing": False}
+# Refresh tokens rotate on every use, so only one thread may refresh at a time. The
+# authorization prompt runs without it; threads needing a token meanwhile wait on it.
+_token_lock = threading.Condition()
+
 class ACCAPI:
     def __init__(self):
         self.modified_folder = "./Modified_Files"
@@ -67,6 +77,7 @@ class ACCAPI:
 
             # Save the refresh token securely
             self.save_refresh_token(refresh_token)
+            _token_cache.update(access_token=access_token, expires_at=time.time() + int(data.get("expires_in", 3600)))
 
             return access_token, refresh_token
 
@@ -113,6 +124,7 @@ class ACCAPI:
 
             # Save the new refresh token securely
             self.save_refresh_token(new_refresh_token)
+            _token_cache.update(access_token=new_access_token, expires_at=time.time() + int(data.get("expires_in", 3600)))
 
             return new_access_token, new_refresh_token  # Return both access and refresh tokens
 
@@ -147,38 +159,23 @@ class ACCAPI:
 
     def convert_svg_to_png(self, svg_code, output_path):
         """
-        Converts SVG code to PNG using svgpathtools and Pillow and returns the path to the generated PNG.
+        Converts SVG code to PNG and returns the path to the generated PNG.
+        Rendering goes through the shared signature cache, so repeated signatures are rasterized once.
         
         Parameters:
         - svg_code: str, SVG code as a string.
+        - output_path: str, file name (without extension) of the PNG inside the modified folder.
         
         Returns:
         - str: Path to the saved PNG file.
         """
         try:
-            # Step 1: Save the SVG code to a temporary file
-            temp_svg_path = os.path.join(self.modified_folder, f"{output_path}.svg")
-            with open(temp_svg_path, "w", encoding="utf-8") as svg_file:
-                svg_file.write(svg_code)
-    
-            # Step 2: Parse the SVG to extract paths
-            paths, attributes = svg2paths(temp_svg_path)
-    
-            # Step 3: Create a new blank image (white background)
-            width, height = 600, 300  # You can adjust the size as needed
-            img = Image.new('RGBA', (width, height), (255, 255, 255, 255))  # White background
-            draw = ImageDraw.Draw(img)
-    
-            # Step 4: Draw the paths onto the image
-            for path in paths:
-                for segment in path:
-                    start = segment.start
-                    end = segment.end
-                    draw.line((start.real, start.imag, end.real, end.imag), fill='black', width=2)
-    
-            # Step 5: Save the image as PNG
+            from signature_renderer import render_signature_png, WHITE
+            png_bytes = render_signature_png(svg_code, background=WHITE)
+
             temp_png_path = os.path.join(self.modified_folder, f"{output_path}.png")
-            img.save(temp_png_path, "PNG")
+            with open(temp_png_path, "wb") as png_file:
+                png_file.write(png_bytes)
     
             # Return the path to the PNG image
             return temp_png_path
@@ -187,6 +184,7 @@ class ACCAPI:
             print(f"An error occurred while processing the SVG: {e}")
             return None
 
+    @timed("upload")
     def upload_pdf_to_acc(self, pdf_path, filename, project_name="Information Systems Workspace", folder_name="Cost Cover Sheets"):
         """
         Function to export the PDF to a specified location on the Autodesk Odrive and refresh the directory.
@@ -271,6 +269,7 @@ class ACCAPI:
         os.chdir(original_dir)
         print(f"Changed back to the original working directory: {original_dir}")
 
+    @timed("upload")
     def upload_equipment_pdf_to_acc(self, pdf_path, filename, project_name="Information Systems Workspace", folder_name="Cost Cover Sheets"):
         """
         Function to export the PDF to a specified location on the Autodesk Odrive and refresh the directory.
@@ -294,7 +293,7 @@ class ACCAPI:
         # Save the current working directory to return to it later
         original_dir = os.getcwd()
 
-        pdf_path = os.path.join(original_dir, f"modified_files/{filename}.pdf")
+        pdf_path = os.path.join(original_dir, pdf_path or f"modified_files/{filename}.pdf")
 
         # Ensure the target directory exists, if not, create it
         project_files_dir = os.path.join(home_dir, f'server/odrive/Autodesk/Square Engineering Firm/{project_name}')
@@ -483,30 +482,66 @@ class ACCAPI:
                 "status_code": 200
         }
 
-    def call_api(self, endpoint, params=None):
+    def get_valid_access_token(self):
+        """
+        Returns an access token, refreshing it only when the cached one is about to expire.
+        Falls back to the interactive authorization flow when there is no usable refresh token.
+        """
+        with _token_lock:
+            while True:
+                if _token_cache["access_token"] and time.time() < _token_cache["expires_at"] - TOKEN_REFRESH_MARGIN:
+                    return _token_cache["access_token"]
+                if not _token_cache["authorizing"]:
+                    break
+                # Another thread is prompting for authorization; its token will be shared.
+                _token_lock.wait()
+
             # Load the refresh token
             refresh_token = self.load_refresh_token()
-    
-            # If no refresh token is found, prompt for authorization code
-            if not refresh_token:
-                print("No refresh token found. Please authenticate first.")
-                auth_url = self.get_authorization_url()
-                print(f"Visit this URL to authenticate and get the code: {auth_url}")
-                auth_code = input("Enter the authorization code: ")
-                access_token, refresh_token = self.get_access_token(auth_code)
-    
-            # Attempt to refresh the token and get a valid access token
-            access_token, _ = self.refresh_access_token(refresh_token)  # Refresh token to get the access token
-    
-            # If the refresh token failed, prompt for the initial authorization flow
-            if not access_token:
+            access_token = None
+
+            if refresh_token:
+                # Attempt to refresh the token and get a valid access token
+                access_token, _ = self.refresh_access_token(refresh_token)
+
+                # Refresh tokens rotate on every use: another process sharing refresh_token.txt (a
+                # worker node, a second server) may have used this one since it was read. Retry once
+                # with the token that process saved before asking for a new authorization.
+                if not access_token:
+                    current_refresh_token = self.load_refresh_token()
+                    if current_refresh_token and current_refresh_token != refresh_token:
+                        print("Refresh token was rotated by another process, retrying with the new one.")
+                        access_token, _ = self.refresh_access_token(current_refresh_token)
+
+            if access_token:
+                return access_token
+            _token_cache["authorizing"] = True
+
+        # Waiting for a person to paste the code can take minutes, so the lock is not held meanwhile.
+        try:
+            if refresh_token:
                 print("Refresh token expired or invalid. Please authenticate again.")
-                auth_url = self.get_authorization_url()
-                print(f"Visit this URL to authenticate and get the code: {auth_url}")
-                auth_code = input("Enter the authorization code: ")
-                access_token, refresh_token = self.get_access_token(auth_code)  # Re-authenticate
-                self.save_refresh_token(refresh_token)  # Save the new refresh token
-    
+            else:
+                print("No refresh token found. Please authenticate first.")
+            auth_url = self.get_authorization_url()
+            print(f"Visit this URL to authenticate and get the code: {auth_url}")
+            auth_code = input("Enter the authorization code: ")
+            # Saves the new refresh token and caches the access token
+            access_token, _ = self.get_access_token(auth_code)
+            return access_token
+        finally:
+            with _token_lock:
+                _token_cache["authorizing"] = False
+                _token_lock.notify_all()
+
+    def invalidate_access_token(self):
+        """Drops the cached access token, e.g. after the API rejected it."""
+        with _token_lock:
+            _token_cache.update(access_token=None, expires_at=0)
+
+    def call_api(self, endpoint, params=None):
+            access_token = self.get_valid_access_token()
+
             # API call to the specified endpoint
             url = f"{self.BASE_URL}/{endpoint}"
             headers = {
@@ -516,15 +551,17 @@ class ACCAPI:
     
             try:
                 # Send the GET request to the API endpoint
-                response = requests.get(url, headers=headers, params=params, verify=False)
+                with stage_timer("acc_fetch") as fetch_span:
+                    fetch_span["attributes"].update(method="GET", endpoint=endpoint)
+                    response = requests.get(url, headers=headers, params=params, verify=False)
+                    fetch_span["attributes"].update(http_status=response.status_code, response_bytes=len(response.content))
                 response.raise_for_status()  # Raise an exception for HTTP errors
                 return response.json()  # Return the raw JSON response from the API
             except requests.exceptions.HTTPError as http_err:
                 if response.status_code == 401:  # Unauthorized, typically means access token expired
                     print("Access token expired. Refreshing token and retrying...")
-                    # Refresh the token and retry the request
-                    access_token, refresh_token = self.refresh_access_token(refresh_token)
-                    self.save_refresh_token(refresh_token)  # Save the new refresh token
+                    # Drop the rejected token; the retry refreshes it
+                    self.invalidate_access_token()
                     return self.call_api(endpoint, params)  # Retry the API call with the new token
                 else:
                     print(f"HTTP error occurred: {http_err}")
@@ -535,28 +572,7 @@ class ACCAPI:
                 raise
 
     def post_api(self, endpoint, json=None):
-        # Load the refresh token
-        refresh_token = self.load_refresh_token()
-
-        # If no refresh token is found, prompt for authorization code
-        if not refresh_token:
-            print("No refresh token found. Please authenticate first.")
-            auth_url = self.get_authorization_url()
-            print(f"Visit this URL to authenticate and get the code: {auth_url}")
-            auth_code = input("Enter the authorization code: ")
-            access_token, refresh_token = self.get_access_token(auth_code)
-
-        # Attempt to refresh the token and get a valid access token
-        access_token, _ = self.refresh_access_token(refresh_token)  # Refresh token to get the access token
-
-        # If the refresh token failed, prompt for the initial authorization flow
-        if not access_token:
-            print("Refresh token expired or invalid. Please authenticate again.")
-            auth_url = self.get_authorization_url()
-            print(f"Visit this URL to authenticate and get the code: {auth_url}")
-            auth_code = input("Enter the authorization code: ")
-            access_token, refresh_token = self.get_access_token(auth_code)  # Re-authenticate
-            self.save_refresh_token(refresh_token)  # Save the new refresh token
+        access_token = self.get_valid_access_token()
 
         # API call to the specified endpoint
         url = f"{self.BASE_URL}/{endpoint}"
@@ -567,15 +583,17 @@ class ACCAPI:
 
         try:
             # Send the GET request to the API endpoint
-            response = requests.post(url, headers=headers, json=json, verify=False)
+            with stage_timer("acc_fetch") as fetch_span:
+                fetch_span["attributes"].update(method="POST", endpoint=endpoint)
+                response = requests.post(url, headers=headers, json=json, verify=False)
+                fetch_span["attributes"].update(http_status=response.status_code, response_bytes=len(response.content))
             response.raise_for_status()  # Raise an exception for HTTP errors
             return response.json()  # Return the raw JSON response from the API
         except requests.exceptions.HTTPError as http_err:
             if response.status_code == 401:  # Unauthorized, typically means access token expired
                 print("Access token expired. Refreshing token and retrying...")
-                # Refresh the token and retry the request
-                access_token, refresh_token = self.refresh_access_token(refresh_token)
-                self.save_refresh_token(refresh_token)  # Save the new refresh token
+                # Drop the rejected token; the retry refreshes it
+                self.invalidate_access_token()
                 return self.post_api(endpoint, json)  # Retry the API call with the new token
             else:
                 print(f"HTTP error occurred: {http_err}")
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+
+# Seconds a generated PDF is served from the cache; ACC data may change after that.
+ARTIFACT_CACHE_TTL = int(os.getenv("ARTIFACT_CACHE_TTL", "300"))
+
+# Upper bound for everything under the output folder; least recently used files go first.
+ARTIFACT_CACHE_MAX_MB = float(os.getenv("ARTIFACT_CACHE_MAX_MB", "500"))
+
+# Review-stage workbooks of cost covers ({payment id}.xlsx) are inputs of the next stage, not
+# regenerable output, and worker nodes identify the shared folder by its marker (see
+# JobBroker), so eviction never removes them.
+_PROTECTED_FILE = re.compile(r"^([0-9a-f-]{36}\.xlsx|\.broker_marker)$")
+
+
+class ArtifactCache:
+    """
+    Caches generated PDFs under the output folder, keyed by a fingerprint of the job's inputs.
+
+    The fingerprint doubles as the response ETag and the artifact's modification time as its
+    Last-Modified, so clients can revalidate with conditional requests. After every store the
+    whole output folder is kept under max_bytes by deleting the least recently used files.
+    """
+
+    def __init__(self, output_folder="modified_files", ttl=ARTIFACT_CACHE_TTL, max_bytes=ARTIFACT_CACHE_MAX_MB * 1024 * 1024):
+        self.output_folder = output_folder
+        self.folder = os.path.join(output_folder, "artifacts")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evicted_files": 0, "evicted_bytes": 0}
+        os.makedirs(self.folder, exist_ok=True)
+
+    def fingerprint(self, key, settings=()):
+        """
+        Hashes everything a generated PDF depends on apart from live ACC data: the normalized
+        request key, the templates it is rendered from and the rendering settings.
+        """
+        digest = hashlib.sha256(repr((key, tuple(settings))).encode("utf-8"))
+        for root, _, files in os.walk("templates"):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, fingerprint):
+        return os.path.join(self.folder, f"{fingerprint}.pdf")
+
+    def get(self, fingerprint):
+        """Returns the artifact's path if it is cached and still fresh, else None."""
+        path = self.path(fingerprint)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        if time.time() - modified > self.ttl:
+            self.stats["misses"] += 1
+            return None
+        # Record the access for LRU; the modification time stays the Last-Modified.
+        try:
+            os.utime(path, (time.time(), modified))
+        except FileNotFoundError:
+            # Evicted or discarded since it was looked up.
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return path
+
+    def put(self, fingerprint, pdf_bytes):
+        """Stores an artifact, then enforces the size bound. Returns its path."""
+        path = self.path(fingerprint)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as pdf_file:
+            pdf_file.write(pdf_bytes)
+        os.replace(temp_path, path)
+        self.evict()
+        return path
+
+    def discard(self, fingerprint):
+        """Deletes an artifact whose inputs are known to have changed; missing ones are ignored."""
+        try:
+            os.remove(self.path(fingerprint))
+            return True
+        except OSError:
+            return False
+
+    def evict(self):
+        """Deletes least recently used files under the output folder until it fits in max_bytes."""
+        with self.lock:
+            files = []
+            total = 0
+            for root, _, names in os.walk(self.output_folder):
+                for name in names:
+                    if _PROTECTED_FILE.match(name) or name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.stats["evicted_files"] += 1
+                self.stats["evicted_bytes"] += size
+            print(f"Artifact cache evicted down to {total} bytes")
@@ -0,0 +1,223 @@
+import atexit
+import os
+import subprocess
+import threading
+import time
+
+import xlwings as xw
+
+
+# Number of warm Excel instances kept running.
+EXCEL_POOL_SIZE = int(os.getenv("EXCEL_POOL_SIZE", "2"))
+
+# Jobs an instance serves before it is replaced, so leaked memory and stray state do not pile up.
+EXCEL_POOL_MAX_JOBS = int(os.getenv("EXCEL_POOL_MAX_JOBS", "50"))
+
+# Seconds a job may hold an instance before Excel is killed; 0 disables the watchdog.
+EXCEL_JOB_TIMEOUT = float(os.getenv("EXCEL_JOB_TIMEOUT", "300"))
+
+
+class PooledExcelApp:
+    """One running Excel instance owned by an ExcelAppPool."""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = app.pid
+        self.thread_id = threading.get_ident()
+        self.jobs = 0
+        self.timed_out = False
+        self.watchdog = None
+
+    def attach(self):
+        """
+        Returns an xlwings App usable from the calling thread.
+        COM objects belong to the thread that created them, so other threads re-attach by pid.
+        """
+        if self.thread_id != threading.get_ident():
+            import pythoncom
+            pythoncom.CoInitialize()
+            self.app = xw.apps[self.pid]
+            self.thread_id = threading.get_ident()
+        return self.app
+
+    def kill(self):
+        """Terminates the Excel process without going through COM, which may be hung."""
+        subprocess.run(['taskkill', '/F', '/PID', str(self.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class ExcelAppPool:
+    """
+    Keeps warm Excel instances that jobs lease and return, instead of paying
+    Excel's COM startup for every document.
+
+    Instances are health-checked on lease, recycled after max_jobs jobs, and
+    killed by a watchdog when a job holds one for longer than job_timeout seconds.
+    """
+
+    def __init__(self, size=EXCEL_POOL_SIZE, max_jobs=EXCEL_POOL_MAX_JOBS, job_timeout=EXCEL_JOB_TIMEOUT):
+        self.size = max(1, size)
+        self.max_jobs = max(1, max_jobs)
+        self.job_timeout = job_timeout
+        self.idle = []
+        self.busy = set()
+        self.starting = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {"started": 0, "reused": 0, "recycled": 0, "unhealthy": 0, "timed_out": 0}
+
+    def acquire(self, wait_timeout=None):
+        """
+        Leases an Excel instance, starting one if the pool is not full.
+
+        Parameters:
+        - wait_timeout: seconds to wait for a free instance (defaults to job_timeout).
+
+        Returns:
+        - PooledExcelApp: the lease; hand it back with release().
+        """
+        wait_timeout = wait_timeout if wait_timeout is not None else (self.job_timeout or None)
+        deadline = time.monotonic() + wait_timeout if wait_timeout else None
+
+        while True:
+            with self.condition:
+                while not self.idle and len(self.busy) + self.starting >= self.size:
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No Excel instance became available in time.")
+                    self.condition.wait(remaining)
+                pooled = self.idle.pop() if self.idle else None
+                start_new = pooled is None
+                if start_new:
+                    # Reserve the slot before starting Excel outside the lock.
+                    self.starting += 1
+
+            if start_new:
+                try:
+                    pooled = self._start()
+                finally:
+                    with self.condition:
+                        self.starting -= 1
+                        if pooled is not None:
+                            self.busy.add(pooled)
+                        self.condition.notify()
+                break
+
+            with self.condition:
+                self.busy.add(pooled)
+            if self._is_healthy(pooled):
+                self.stats["reused"] += 1
+                break
+            print(f"Excel instance {pooled.pid} failed its health check, replacing it.")
+            self.stats["unhealthy"] += 1
+            self._discard(pooled)
+
+        pooled.jobs += 1
+        pooled.timed_out = False
+        if self.job_timeout:
+            pooled.watchdog = threading.Timer(self.job_timeout, self._expire, args=(pooled,))
+            pooled.watchdog.daemon = True
+            pooled.watchdog.start()
+        return pooled
+
+    def release(self, pooled):
+        """Returns a leased instance, closing any workbooks the job left open."""
+        if pooled is None:
+            return
+        if pooled.watchdog:
+            pooled.watchdog.cancel()
+            pooled.watchdog = None
+
+        if pooled.timed_out or self.closed:
+            self._discard(pooled)
+            return
+        try:
+            for book in list(pooled.attach().books):
+                book.close()
+        except Exception as e:
+            print(f"Excel instance {pooled.pid} could not be cleaned up, replacing it: {e}")
+            self._discard(pooled)
+            return
+        if pooled.jobs >= self.max_jobs:
+            print(f"Recycling Excel instance {pooled.pid} after {pooled.jobs} jobs.")
+            self.stats["recycled"] += 1
+            self._discard(pooled)
+            return
+
+        with self.condition:
+            self.busy.discard(pooled)
+            self.idle.append(pooled)
+            self.condition.notify()
+
+    def lease(self):
+        """Context manager form of acquire()/release() that yields the xlwings App."""
+        return _Lease(self)
+
+    def shutdown(self):
+        """Quits every idle instance; busy ones are quit when released."""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _start(self):
+        app = xw.App(visible=False, add_book=False)
+        app.display_alerts = False
+        app.screen_updating = False
+        self.stats["started"] += 1
+        print(f"Started Excel instance {app.pid} for the pool.")
+        return PooledExcelApp(app)
+
+    def _is_healthy(self, pooled):
+        try:
+            app = pooled.attach()
+            return app.api.Ready and app.books.count == 0
+        except Exception:
+            return False
+
+    def _expire(self, pooled):
+        print(f"Excel job exceeded {self.job_timeout}s, killing instance {pooled.pid}.")
+        pooled.timed_out = True
+        self.stats["timed_out"] += 1
+        pooled.kill()
+
+    def _discard(self, pooled):
+        with self.condition:
+            self.busy.discard(pooled)
+            self.condition.notify()
+        self._quit(pooled)
+
+    def _quit(self, pooled):
+        try:
+            pooled.attach().quit()
+        except Exception:
+            pooled.kill()
+
+
+class _Lease:
+    def __init__(self, pool):
+        self.pool = pool
+        self.pooled = None
+
+    def __enter__(self):
+        self.pooled = self.pool.acquire()
+        return self.pooled.attach()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.pooled)
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_excel_pool():
+    """Returns the process-wide Excel pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExcelAppPool()
+            atexit.register(_pool.shutdown)
+        return _pool
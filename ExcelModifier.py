@@ -1,25 +1,169 @@
+import io
+import itertools
 import os
+import re
 import sys
+import shutil
 import subprocess
 import tempfile
+import time
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy
+from pathlib import Path
 
-from openpyxl.styles import Font, PatternFill, Border, Alignment
-from svgpathtools import svg2paths
-from PIL import Image, ImageDraw
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
 
 from ACCAPI import ACCAPI
+from Metrics import timed
+from Tracing import set_attribute, span
 
 # Decide which backend to use based on the OS.
 USE_XLWINGS = sys.platform.startswith('win')
 
 if USE_XLWINGS:
     import xlwings as xw
+    from ExcelAppPool import get_excel_pool
 else:
+    # Converter slots are file locks; LibreOffice only runs on this backend.
+    import fcntl
     import openpyxl
     from openpyxl.utils import get_column_letter
     from openpyxl.drawing.image import Image as XLImage
     from openpyxl.worksheet.properties import PageSetupProperties
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import NamedStyle
+    from openpyxl.worksheet.cell_range import CellRange
+    from openpyxl.worksheet.dimensions import RowDimension
+    from openpyxl.cell.cell import MergedCell
+
+# Number of LibreOffice processes that may run side by side on this machine, across the web
+# server, its worker processes and any broker workers (see CONVERTER_DIR).
+CONVERTER_WORKERS = int(os.getenv("CONVERTER_WORKERS", "1"))
+
+# Folder of the converter slot locks and LibreOffice profiles; every process converting on the
+# machine must use the same one for CONVERTER_WORKERS to hold across them.
+CONVERTER_DIR = os.getenv("CONVERTER_DIR", tempfile.gettempdir())
+
+# Seconds between checks for a free converter slot while all of them are busy.
+CONVERTER_POLL_INTERVAL = 0.05
+
+# Default export_to_pdf backend on Linux: "libreoffice" or "native" (PDFRenderer).
+PDF_RENDERER = os.getenv("PDF_RENDERER", "libreoffice")
+
+# Run every exported PDF through pdf_tools.compact_pdf() before it is returned or saved.
+COMPACT_PDFS = os.getenv("COMPACT_PDFS", "false").lower() == "true"
+
+
+# In-memory conversions stage their files on tmpfs where the OS provides one.
+TMPFS_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def convert_xlsx_bytes_to_pdf(xlsx_bytes, profile_dir=None):
+    """
+    Converts xlsx bytes to PDF bytes with LibreOffice.
+
+    LibreOffice only reads and writes files, so both are staged in a private scratch
+    folder on tmpfs that is removed afterwards; nothing touches the shared output folder.
+    Raises subprocess.CalledProcessError if the conversion fails.
+    """
+    with tempfile.TemporaryDirectory(prefix="pdf_job_", dir=TMPFS_DIR) as work_dir:
+        xlsx_path = os.path.join(work_dir, "workbook.xlsx")
+        with open(xlsx_path, "wb") as xlsx_file:
+            xlsx_file.write(xlsx_bytes)
+        result = run_libreoffice([xlsx_path], work_dir, profile_dir)
+        pdf_path = os.path.join(work_dir, "workbook.pdf")
+        if not os.path.exists(pdf_path):
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        with open(pdf_path, "rb") as pdf_file:
+            return pdf_file.read()
+
+
+def _compact_pdf_file(pdf_path):
+    # pdf_tools pulls in pypdf, which only compaction and splitting need.
+    from pdf_tools import compact_pdf_file
+    return compact_pdf_file(pdf_path)
+
+
+def _copy_cell_style(source_cell, target):
+    """Copies the visual style of a cell onto another cell or a NamedStyle."""
+    target.font = copy(source_cell.font)
+    target.fill = copy(source_cell.fill)
+    target.border = copy(source_cell.border)
+    target.alignment = copy(source_cell.alignment)
+    target.number_format = source_cell.number_format
+    target.protection = copy(source_cell.protection)
+
+
+class ReusableBytesIO(io.BytesIO):
+    """
+    In-memory image stream that survives being closed.
+    openpyxl closes an image's stream after reading it once, which breaks saving
+    or rendering the same workbook a second time.
+    """
+
+    def close(self):
+        self.seek(0)
+
+
+# Slot the next conversion of this process tries first, so conversions (and the warm-up)
+# go round all the slots instead of always starting at the first.
+_next_converter_slot = itertools.count()
+
+
+def _converter_profile_dir(slot):
+    return os.path.join(CONVERTER_DIR, f"pdf_converter_profile_{slot}")
+
+
+@contextmanager
+def _converter_slot():
+    """
+    Leases one of the CONVERTER_WORKERS converter slots machine-wide and yields its profile
+    directory; each slot owns a LibreOffice user profile, since concurrent LibreOffice
+    processes cannot share one. A slot is an exclusive lock on a file in CONVERTER_DIR, so
+    the cap holds across processes, and a crashed holder releases it with its process.
+    """
+    slots = max(1, CONVERTER_WORKERS)
+    first = next(_next_converter_slot)
+    while True:
+        for slot in ((first + offset) % slots for offset in range(slots)):
+            lock_file = open(os.path.join(CONVERTER_DIR, f"pdf_converter_slot_{slot}.lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            try:
+                yield _converter_profile_dir(slot)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+        time.sleep(CONVERTER_POLL_INTERVAL)
+
+
+def run_libreoffice(input_paths, outdir, profile_dir=None):
+    """
+    Converts one or more workbooks to PDF with a single headless LibreOffice invocation.
+
+    Without a profile_dir the call waits for one of the CONVERTER_WORKERS converter slots
+    and uses its private profile, so the processes converting on this machine never run more
+    LibreOffice processes than configured between them.
+
+    Parameters:
+    - input_paths: list of xlsx paths converted together.
+    - outdir: folder LibreOffice writes the PDFs into (named after each input).
+    - profile_dir: optional private user profile to use instead of a converter slot.
+    """
+    if profile_dir is None:
+        with _converter_slot() as slot_profile_dir:
+            return run_libreoffice(input_paths, outdir, slot_profile_dir)
+
+    cmd = ['libreoffice', '--headless', f'-env:UserInstallation={Path(profile_dir).resolve().as_uri()}',
+           '--convert-to', 'pdf', '--outdir', outdir, *input_paths]
+    with span("libreoffice", documents=len(input_paths), profile=os.path.basename(profile_dir)):
+        return subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
 
 class ExcelModifier:
@@ -33,18 +177,32 @@ class ExcelModifier:
 
         self.backend = 'xlwings' if USE_XLWINGS else 'openpyxl'
         self.app = None
+        # Pooled Excel instance leased by open_workbook() on the xlwings backend.
+        self.app_lease = None
         self.workbook = None
         self.sheet = None
+        # Sheet cloned by add_template_sheet(), the first sheet of the opened workbook.
+        self.template_sheet = None
+        # Saved workbooks waiting for export_pending_to_pdf().
+        self.pending_exports = []
+        # compact_pdf() reports for the PDFs this modifier exported, when COMPACT_PDFS is on.
+        self.compaction_reports = []
 
+    @timed("template_load")
     def open_workbook(self):
         """Opens the Excel workbook and initializes the sheet."""
         if self.backend == 'xlwings':
-            self.app = xw.App(visible=False, add_book=False)
+            # Excel is leased from the warm pool instead of started for every job.
+            self.app_lease = get_excel_pool().acquire()
+            self.app = self.app_lease.attach()
             self.workbook = self.app.books.open(self.excel_path)
             self.sheet = self.workbook.sheets[0]
         else:
             self.workbook = openpyxl.load_workbook(self.excel_path)
             self.sheet = self.workbook.active
+            for worksheet in self.workbook.worksheets:
+                for image in worksheet._images:
+                    image.ref = ReusableBytesIO(image._data())
         print(f"Workbook opened using {self.backend}.")
 
     def modify_cell(self, cell_range, value):
@@ -81,53 +239,80 @@ class ExcelModifier:
                 
         print(f"Cell {cell_range} updated to {value}.")
 
-    def auto_fit_columns(self):
-        """Automatically adjusts all columns to fit content."""
+    def auto_fit_columns(self, min_row=None, max_row=None, min_col=None, max_col=None):
+        """
+        Automatically adjusts columns to fit content.
+        The optional bounds limit the measured window; by default the whole used range is fitted.
+        """
         if self.sheet is None:
             raise Exception("Workbook is not opened. Call open_workbook() first.")
 
         if self.backend == 'xlwings':
-            self.sheet.api.Columns.AutoFit()
+            if any(bound is not None for bound in (min_row, max_row, min_col, max_col)):
+                used = self.sheet.used_range
+                self.sheet.range((min_row or 1, min_col or 1),
+                                 (max_row or used.last_cell.row, max_col or used.last_cell.column)).columns.autofit()
+            else:
+                self.sheet.api.Columns.AutoFit()
         else:
-            # For openpyxl, iterate through all columns in the sheet and adjust width
-            for col in self.sheet.columns:
-                max_length = 0
-                column = col[0].column  # can be a number or letter
-                col_letter = get_column_letter(column) if isinstance(column, int) else column
-                for cell in col:
-                    try:
-                        if cell.value:
-                            max_length = max(max_length, len(str(cell.value)))
-                    except:
-                        pass
+            # One pass over the values, row by row, keeping the longest entry per column
+            min_col = min_col or 1
+            max_col = max_col or self.sheet.max_column
+            max_lengths = [0] * (max_col - min_col + 1)
+            for row in self.sheet.iter_rows(min_row=min_row, max_row=max_row,
+                                            min_col=min_col, max_col=max_col, values_only=True):
+                for offset, value in enumerate(row):
+                    if not value:
+                        continue
+                    length = len(value) if isinstance(value, str) else len(str(value))
+                    if length > max_lengths[offset]:
+                        max_lengths[offset] = length
+            for offset, max_length in enumerate(max_lengths):
                 # Add a little extra space
-                adjusted_width = (max_length + 2)
-                self.sheet.column_dimensions[col_letter].width = adjusted_width
+                self.sheet.column_dimensions[get_column_letter(min_col + offset)].width = max_length + 2
         print("Auto-fit applied to all columns.")
 
-    def add_gridlines(self):
+    def add_gridlines(self, print_gridlines=False):
         """
-        Adds gridlines to the sheet by applying borders.
+        Adds gridlines to the sheet.
+
+        By default a thin border is applied to every cell in the used range, sharing one
+        registered style per distinct cell style. With print_gridlines=True the sheet's
+        "print gridlines" setting is turned on instead, which needs no per-cell styling.
         Note: On Windows, Excel shows gridlines by default.
         """
         if self.sheet is None:
             raise Exception("Workbook is not opened. Call open_workbook() first.")
 
         if self.backend == 'xlwings':
-            # Use borders to simulate gridlines (as in the original code)
-            for border_id in range(7, 13):  # Border IDs for Excel
-                self.sheet.api.Cells.Borders(border_id).LineStyle = 1  # xlContinuous
+            if print_gridlines:
+                self.sheet.api.PageSetup.PrintGridlines = True
+            else:
+                # Use borders to simulate gridlines (as in the original code)
+                for border_id in range(7, 13):  # Border IDs for Excel
+                    self.sheet.api.Cells.Borders(border_id).LineStyle = 1  # xlContinuous
+        elif print_gridlines:
+            self.sheet.print_options.gridLines = True
+            self.sheet.print_options.gridLinesSet = True
         else:
             # For openpyxl, we add a thin border to each cell in the used range.
             from openpyxl.styles import Border, Side
             thin = Side(style='thin', color="000000")
             border = Border(left=thin, right=thin, top=thin, bottom=thin)
 
-            # Determine the used range (assuming sheet.max_row and sheet.max_column)
+            # The border is registered once per distinct existing style; every other cell with
+            # that style just takes a copy of the resulting style ids.
+            bordered_styles = {}
             for row in self.sheet.iter_rows(min_row=1, max_row=self.sheet.max_row,
                                             min_col=1, max_col=self.sheet.max_column):
                 for cell in row:
-                    cell.border = border
+                    key = tuple(cell._style) if cell._style else ()
+                    style = bordered_styles.get(key)
+                    if style is None:
+                        cell.border = border
+                        bordered_styles[key] = copy(cell._style)
+                    else:
+                        cell._style = copy(style)
         print("Gridlines added to the sheet.")
 
     # def insert_row(self, row):
@@ -138,46 +323,416 @@ class ExcelModifier:
 
     def insert_row(self, row):
         """Inserts a new row and copies styling from the row above."""
+        self.insert_rows(row, 1)
+
+    def insert_rows(self, at, count=1, style_source_row=None):
+        """
+        Inserts `count` rows at row `at` with a single shift of the rows below.
+
+        The new rows are styled like style_source_row (defaults to the row above `at`,
+        given in the numbering before the insert). Each column's style is registered once
+        and reused for every new cell, so inserting n rows costs O(n) instead of O(n²).
+        """
+        if self.sheet is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+        if count < 1:
+            return
 
         if self.backend == 'xlwings':
-            self.sheet.range(f"{row}:{row}").insert(shift="down")
-            print(f"Inserted a new row at {row}.")
+            # Excel copies the formatting of the row above on its own.
+            self.sheet.range(f"{at}:{at + count - 1}").insert(shift="down")
+            print(f"Inserted {count} new rows at {at}.")
+            return
+
+        if style_source_row is None:
+            style_source_row = at - 1
+        self.sheet.insert_rows(at, count)
+        if style_source_row >= at:
+            style_source_row += count  # the source row moved down with the insert
+        if style_source_row < 1:
+            return
+
+        column_styles = []
+        for col in range(1, self.sheet.max_column + 1):
+            source_cell = self.sheet.cell(row=style_source_row, column=col)
+            if source_cell.has_style:
+                column_styles.append((col, source_cell._style))
+
+        for row in range(at, at + count):
+            for col, style in column_styles:
+                # StyleArray only holds ids into the workbook's shared style tables;
+                # each cell gets its own copy so later edits stay local to that cell.
+                self.sheet.cell(row=row, column=col)._style = copy(style)
+
+    def write_streaming_report(self, rows, data_start_row, filename, footer_values=None, rows_per_sheet=None):
+        """
+        Writes an append-heavy report in bounded memory and saves it to modified_folder.
+
+        The opened template is used as a layout only: its header (rows above data_start_row)
+        and footer (rows below it) are copied into an openpyxl write-only workbook and the data
+        rows are streamed in between, so rows are never inserted or kept in memory. Every data
+        cell is styled through one named style per column, taken from the template's data_start_row.
+        The template's print title rows are repeated on every printed page.
+
+        Parameters:
+        - rows: iterable of row value lists (column A first); a generator keeps memory flat.
+          Formula strings may use "{row}" for their own row number, e.g. "=P{row}*Q{row}-R{row}".
+        - data_start_row: int, the template's first (styled) data row.
+        - filename: str, xlsx name inside modified_folder.
+        - footer_values: optional dict of template coordinates below the data row to values,
+          e.g. {"S9": "=SUM(S7:S{last_row})"}. "{first_row}" and "{last_row}" give the data rows
+          of the sheet the footer is on.
+        - rows_per_sheet: int, start a new sheet (with its own header and footer) after this
+          many data rows. Ignored by the xlwings backend, where a sheet holds a million rows.
+
+        Returns:
+        - dict: "path" of the saved workbook, "row_count" of streamed data rows and "sheet_count".
+        """
+        if self.sheet is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+
+        if self.backend == 'xlwings':
+            return self._write_report_with_excel(rows, data_start_row, filename, footer_values)
+
+        workbook = openpyxl.Workbook(write_only=True)
+        style_names = {}
+        for col in range(1, self.sheet.max_column + 1):
+            source_cell = self.sheet.cell(row=data_start_row, column=col)
+            if source_cell.has_style:
+                style = NamedStyle(name=f"report_data_{get_column_letter(col)}")
+                _copy_cell_style(source_cell, style)
+                workbook.add_named_style(style)
+                style_names[col] = style.name
+
+        rows = iter(rows)
+        row_count = sheet_count = 0
+        while True:
+            sheet_rows = itertools.islice(rows, rows_per_sheet) if rows_per_sheet else rows
+            first_row = next(sheet_rows, None)
+            if first_row is None and sheet_count:
+                break
+            sheet_rows = itertools.chain([first_row], sheet_rows) if first_row is not None else []
+            title = self.sheet.title if not sheet_count else f"{self.sheet.title} ({sheet_count + 1})"
+            row_count += self._stream_report_sheet(workbook, title, sheet_rows, data_start_row, footer_values, style_names)
+            sheet_count += 1
+            if not rows_per_sheet:
+                break
+
+        save_path = os.path.join(self.modified_folder, filename)
+        workbook.save(save_path)
+        set_attribute("rows_written", row_count)
+        set_attribute("sheets", sheet_count)
+        print(f"Streamed {row_count} rows on {sheet_count} sheets into {save_path}")
+        return {"path": save_path, "row_count": row_count, "sheet_count": sheet_count}
+
+    def _stream_report_sheet(self, workbook, title, rows, data_start_row, footer_values, style_names):
+        """Streams one sheet of write_streaming_report() and returns its data row count."""
+        template = self.sheet
+        max_col = template.max_column
+        sheet = workbook.create_sheet(title)
+
+        # Sheet-level layout must be in place before the first row is written.
+        for key, dimension in template.column_dimensions.items():
+            sheet.column_dimensions[key] = copy(dimension)
+            sheet.column_dimensions[key].parent = sheet
+        sheet.sheet_format = copy(template.sheet_format)
+        sheet.sheet_properties = copy(template.sheet_properties)
+        sheet.sheet_view.rightToLeft = template.sheet_view.rightToLeft
+        sheet.page_setup = copy(template.page_setup)
+        sheet.print_options = copy(template.print_options)
+        sheet.page_margins = copy(template.page_margins)
+        sheet.HeaderFooter = copy(template.HeaderFooter)
+        if template.freeze_panes:
+            sheet.freeze_panes = template.freeze_panes
+        if template.print_title_rows:
+            sheet.print_title_rows = template.print_title_rows
+
+        data_styles = {}
+        for col, style_name in style_names.items():
+            # Resolve the named style to its style ids once; cells then take a copy of them.
+            probe = WriteOnlyCell(sheet)
+            probe.style = style_name
+            data_styles[col] = probe._style
+
+        def write_template_row(template_row, target_row, values=None):
+            if template.row_dimensions[template_row].height is not None:
+                sheet.row_dimensions[target_row] = RowDimension(sheet, index=target_row, ht=template.row_dimensions[template_row].height)
+            cells = []
+            for col in range(1, max_col + 1):
+                source_cell = template.cell(row=template_row, column=col)
+                value = (values or {}).get(col, source_cell.value)
+                cell = WriteOnlyCell(sheet, value)
+                if source_cell.has_style:
+                    _copy_cell_style(source_cell, cell)
+                cells.append(cell)
+            sheet.append(cells)
+
+        for template_row in range(1, data_start_row):
+            write_template_row(template_row, template_row)
+
+        data_height = template.row_dimensions[data_start_row].height
+        target_row = data_start_row
+        for values in rows:
+            if data_height is not None:
+                sheet.row_dimensions[target_row] = RowDimension(sheet, index=target_row, ht=data_height)
+            cells = []
+            for col, value in enumerate(values, start=1):
+                if isinstance(value, str) and value.startswith("="):
+                    value = value.replace("{row}", str(target_row))
+                cell = WriteOnlyCell(sheet, value)
+                if col in data_styles:
+                    cell._style = copy(data_styles[col])
+                cells.append(cell)
+            sheet.append(cells)
+            # Drop the written row's dimension so memory does not grow with the row count.
+            sheet.row_dimensions.pop(target_row, None)
+            target_row += 1
+
+        row_count = target_row - data_start_row
+        last_row = max(target_row - 1, data_start_row)
+        shift = max(row_count - 1, 0)  # footer rows move down by the rows added beyond the template's one
+
+        placeholders = {"first_row": data_start_row, "last_row": last_row}
+        footer_by_row = {}
+        for coordinate, value in (footer_values or {}).items():
+            column_letter, template_row = coordinate_from_string(coordinate)
+            if isinstance(value, str):
+                value = value.format(**placeholders)
+            footer_by_row.setdefault(template_row, {})[column_index_from_string(column_letter)] = value
+
+        max_template_row = max([template.max_row, *footer_by_row.keys()])
+        for template_row in range(data_start_row + 1, max_template_row + 1):
+            write_template_row(template_row, template_row + shift, footer_by_row.get(template_row))
+
+        for merged_range in template.merged_cells.ranges:
+            if merged_range.min_row > data_start_row:
+                merged_range = CellRange(merged_range.coord)
+                merged_range.shift(row_shift=shift)
+            sheet.merged_cells.add(merged_range.coord)
+
+        for image in template._images:
+            xl_img = XLImage(ReusableBytesIO(image._data()))
+            anchor = copy(image.anchor)
+            if not isinstance(anchor, str) and anchor._from.row + 1 > data_start_row:
+                anchor._from = copy(anchor._from)
+                anchor._from.row += shift
+                if getattr(anchor, "to", None) is not None:
+                    anchor.to = copy(anchor.to)
+                    anchor.to.row += shift
+            xl_img.anchor = anchor
+            xl_img.width, xl_img.height = image.width, image.height
+            sheet.add_image(xl_img)
+
+        if template.print_area:
+            sheet.print_area = f"A1:{get_column_letter(max_col)}{max_template_row + shift}"
+
+        return row_count
+
+    def _write_report_with_excel(self, rows, data_start_row, filename, footer_values):
+        """xlwings counterpart of write_streaming_report: one insert and one block write."""
+        rows = [list(values) for values in rows]
+        row_count = len(rows)
+        last_row = max(data_start_row + row_count - 1, data_start_row)
+        shift = max(row_count - 1, 0)
+        if shift:
+            self.insert_rows(data_start_row + 1, shift, style_source_row=data_start_row)
+        block = [[value.replace("{row}", str(data_start_row + i)) if isinstance(value, str) and value.startswith("=") else value
+                  for value in values] for i, values in enumerate(rows)]
+        if block:
+            self.sheet.range(f"A{data_start_row}").value = block
+        for coordinate, value in (footer_values or {}).items():
+            column_letter, template_row = coordinate_from_string(coordinate)
+            if isinstance(value, str):
+                value = value.format(first_row=data_start_row, last_row=last_row)
+            self.sheet.range(f"{column_letter}{template_row + shift}").value = value
+        return {"path": self.save_workbook(filename), "row_count": row_count, "sheet_count": 1}
+
+    def add_template_sheet(self, title, state_path=None):
+        """
+        Clones the template sheet (the workbook's first sheet) into a new sheet and makes it the
+        active sheet, so several documents can be filled and converted as one workbook.
+
+        Every clone is fitted to a single page, which lets export_sheets_to_pdf_bytes() split the
+        converted workbook back into one PDF per sheet.
+
+        Parameters:
+        - title: str, name of the new sheet.
+        - state_path: str, optional single-sheet workbook (see save_sheet_state()) whose cell
+          values are laid over the clone, e.g. a payment's earlier review stage.
+
+        Returns:
+        - the new sheet.
+        """
+        if self.workbook is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+        if self.template_sheet is None:
+            self.template_sheet = self.sheet
+        template = self.template_sheet
+        # Excel sheet names are limited to 31 characters and a few symbols are not allowed.
+        title = re.sub(r"[\[\]:*?/\\]", "_", str(title))[:31]
+        has_state = state_path and os.path.exists(state_path)
+
+        if self.backend == 'xlwings':
+            sheet = template.copy(after=self.workbook.sheets[-1], name=title)
+            if has_state:
+                state_book = self.app.books.open(os.path.abspath(state_path))
+                try:
+                    used_range = state_book.sheets[0].used_range
+                    sheet.range(used_range.address).formula = used_range.formula
+                finally:
+                    state_book.close()
+            sheet.api.PageSetup.Zoom = False
+            sheet.api.PageSetup.FitToPagesWide = 1
+            sheet.api.PageSetup.FitToPagesTall = 1
         else:
-            self.sheet.insert_rows(row)
-            
-            if row > 1:
-                for col in range(1, self.sheet.max_column + 1):
-                    cell_above = self.sheet.cell(row=row - 1, column=col)
-                    new_cell = self.sheet.cell(row=row, column=col)
-    
-                    if cell_above.has_style:
-                        new_cell.font = Font(
-                                name=cell_above.font.name,
-                                size=cell_above.font.size,
-                                bold=cell_above.font.bold,
-                                italic=cell_above.font.italic,
-                                underline=cell_above.font.underline,
-                                color=cell_above.font.color
-                        )
-                        new_cell.fill = PatternFill(
-                                fill_type=cell_above.fill.fill_type,
-                                start_color=cell_above.fill.start_color,
-                                end_color=cell_above.fill.end_color
-                        )
-                        new_cell.border = Border(
-                                left=cell_above.border.left,
-                                right=cell_above.border.right,
-                                top=cell_above.border.top,
-                                bottom=cell_above.border.bottom
-                        )
-                        new_cell.alignment = Alignment(
-                                horizontal=cell_above.alignment.horizontal,
-                                vertical=cell_above.alignment.vertical,
-                                wrap_text=cell_above.alignment.wrap_text
-                        )
-                        new_cell.number_format = cell_above.number_format
+            # copy_worksheet covers cells, styles, dimensions, merges and page setup,
+            # but not the sheet view, print area or images.
+            sheet = self.workbook.copy_worksheet(template)
+            sheet.title = title
+            sheet.sheet_view.rightToLeft = template.sheet_view.rightToLeft
+            if template.print_area:
+                print_area = template.print_area
+                if isinstance(print_area, (list, tuple)):
+                    print_area = ",".join(print_area)
+                sheet.print_area = [area.split("!")[-1] for area in print_area.split(",")]
+            for image in template._images:
+                xl_img = XLImage(ReusableBytesIO(image._data()))
+                xl_img.anchor = copy(image.anchor)
+                xl_img.width, xl_img.height = image.width, image.height
+                sheet.add_image(xl_img)
+            if has_state:
+                # Only values are needed from the saved stage; read-only mode skips styles and drawings.
+                state_book = openpyxl.load_workbook(state_path, read_only=True)
+                try:
+                    for row_index, values in enumerate(state_book.worksheets[0].iter_rows(values_only=True), start=1):
+                        for col_index, value in enumerate(values, start=1):
+                            if value is None:
+                                continue
+                            target = sheet.cell(row=row_index, column=col_index)
+                            # Only the top-left cell of a merged range holds a value.
+                            if not isinstance(target, MergedCell):
+                                target.value = value
+                finally:
+                    state_book.close()
+            if sheet.sheet_properties.pageSetUpPr is None:
+                sheet.sheet_properties.pageSetUpPr = PageSetupProperties()
+            sheet.sheet_properties.pageSetUpPr.fitToPage = True
+            sheet.page_setup.fitToWidth = 1
+            sheet.page_setup.fitToHeight = 1
 
+        self.sheet = sheet
+        return sheet
 
+    def drop_template_sheet(self):
+        """Removes the template sheet once all clones are made, so it is not converted with them."""
+        if self.template_sheet is None:
+            return
+        if self.backend == 'xlwings':
+            self.template_sheet.delete()
+        else:
+            self.workbook.remove(self.template_sheet)
+        self.template_sheet = None
+
+    def remove_sheet(self, sheet):
+        """Removes a sheet added by add_template_sheet(), e.g. one that could not be filled."""
+        if self.backend == 'xlwings':
+            sheet.delete()
+        else:
+            self.workbook.remove(sheet)
+        if self.sheet is sheet:
+            self.sheet = self.template_sheet
+
+    def save_sheet_state(self, filename):
+        """
+        Saves the active sheet on its own as a single-sheet workbook in modified_folder,
+        in the same form save_workbook() gives a workbook opened for one document.
+        """
+        if self.sheet is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+        save_path = os.path.join(self.modified_folder, filename)
+        if self.backend == 'xlwings':
+            # Copying a sheet without a destination puts it in a new workbook.
+            self.sheet.copy()
+            state_book = self.app.books.active
+            try:
+                state_book.save(os.path.abspath(save_path))
+            finally:
+                state_book.close()
+        else:
+            # Write the workbook with only this sheet in it, then put the other sheets back.
+            sheets, active_index = self.workbook._sheets, self.workbook.index(self.workbook.active)
+            self.workbook._sheets = [self.sheet]
+            self.workbook.active = 0
+            try:
+                self.workbook.save(save_path)
+            finally:
+                self.workbook._sheets = sheets
+                self.workbook.active = active_index
+        print(f"Sheet {self.sheet.name if self.backend == 'xlwings' else self.sheet.title} saved at {save_path}")
+        return save_path
+
+    @timed("pdf_convert")
+    def export_sheets_to_pdf_bytes(self, split=True, renderer=None):
+        """
+        Converts every sheet of the workbook in a single pass.
+
+        Parameters:
+        - split: bool, return one PDF per sheet (cut from the combined PDF by page) instead of
+          the combined PDF. Each sheet must print on exactly one page, as add_template_sheet() sets up.
+        - renderer: "libreoffice" or "native", defaults to PDF_RENDERER (Linux only).
+
+        Returns:
+        - list of PDF bytes in sheet order when split, otherwise the combined PDF bytes;
+          None if the export failed.
+        """
+        if self.workbook is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+
+        try:
+            if self.backend == 'xlwings':
+                sheet_names = [sheet.name for sheet in self.workbook.sheets]
+                with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as work_dir:
+                    pdf_path = os.path.join(work_dir, "output.pdf")
+                    self.workbook.api.ExportAsFixedFormat(0, pdf_path)  # 0 refers to xlTypePDF
+                    with open(pdf_path, "rb") as pdf_file:
+                        pdf_bytes = pdf_file.read()
+            elif (renderer or PDF_RENDERER) == 'native':
+                from PDFRenderer import PDFRenderer
+                sheet_names = self.workbook.sheetnames
+                buffer = io.BytesIO()
+                PDFRenderer.render_sheets(self.workbook.worksheets, buffer)
+                pdf_bytes = buffer.getvalue()
+            else:
+                sheet_names = self.workbook.sheetnames
+                pdf_bytes = convert_xlsx_bytes_to_pdf(self.save_workbook_to_bytes())
+        except subprocess.CalledProcessError as e:
+            print(f"LibreOffice conversion failed: {e.stderr.decode(errors='replace')}")
+            return None
+        except Exception as e:
+            print(f"Error exporting workbook to PDF: {e}")
+            return None
+
+        sheet_count = len(sheet_names)
+        print(f"Workbook with {sheet_count} sheets exported in one pass ({len(pdf_bytes)} bytes)")
+        if not split:
+            return self._compact(pdf_bytes, "workbook.pdf") if COMPACT_PDFS else pdf_bytes
+
+        try:
+            from pypdf import PdfReader
+            from pdf_tools import split_pdf
+            page_count = len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+            if page_count != sheet_count:
+                print(f"Cannot split PDF: {page_count} pages for {sheet_count} sheets.")
+                return None
+            parts = split_pdf(pdf_bytes, [(page, page + 1) for page in range(page_count)])
+        except Exception as e:
+            print(f"Error splitting PDF: {e}")
+            return None
+        if COMPACT_PDFS:
+            parts = [self._compact(part, f"{name}.pdf") for name, part in zip(sheet_names, parts)]
+        return parts
+
+    @timed("save")
     def save_workbook(self, filename='modified.xlsx'):
         """Saves the workbook with a new name."""
         if self.workbook is None:
@@ -191,8 +746,101 @@ class ExcelModifier:
         print(f"Workbook saved at {save_path}")
         return save_path
 
-    def export_to_pdf(self, payment=None, filename='modified.pdf', excel_filename="output", project_name="Information Systems Workspace", destination_folder="Cost Cover Sheets"):
-        """Exports the sheet to a PDF, fitting it to a single page."""
+    @timed("save")
+    def save_workbook_to_bytes(self, filename=None):
+        """
+        Serialises the workbook in memory and returns the xlsx bytes.
+        When filename is given the same bytes are also written to modified_folder.
+        """
+        if self.workbook is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+        if self.backend == 'xlwings':
+            # Excel can only save to a file; SaveCopyAs keeps the open workbook's own path.
+            with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as work_dir:
+                copy_path = os.path.join(work_dir, "workbook.xlsx")
+                self.workbook.api.SaveCopyAs(copy_path)
+                with open(copy_path, "rb") as xlsx_file:
+                    xlsx_bytes = xlsx_file.read()
+        else:
+            buffer = io.BytesIO()
+            self.workbook.save(buffer)
+            xlsx_bytes = buffer.getvalue()
+
+        if filename:
+            save_path = os.path.join(self.modified_folder, filename)
+            with open(save_path, "wb") as xlsx_file:
+                xlsx_file.write(xlsx_bytes)
+            print(f"Workbook saved at {save_path}")
+        return xlsx_bytes
+
+    @timed("pdf_convert")
+    def export_to_pdf_bytes(self, xlsx_bytes=None, pdf_filename=None, renderer=None):
+        """
+        Exports the sheet to PDF and returns the PDF bytes, without going through modified_folder.
+
+        Parameters:
+        - xlsx_bytes: bytes from save_workbook_to_bytes(), to avoid serialising the workbook twice.
+        - pdf_filename: str, optional name under modified_folder to also persist the PDF to.
+        - renderer: "libreoffice" or "native", defaults to PDF_RENDERER (Linux only).
+
+        Returns:
+        - bytes: the PDF, or None if the export failed.
+        """
+        if self.sheet is None:
+            raise Exception("Workbook is not opened. Call open_workbook() first.")
+
+        try:
+            if self.backend == 'xlwings':
+                with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as work_dir:
+                    sheet_api = self.sheet.api
+                    sheet_api.PageSetup.FitToPagesWide = 1
+                    sheet_api.PageSetup.FitToPagesTall = 1
+                    sheet_api.PageSetup.Zoom = False
+                    pdf_path = os.path.join(work_dir, "output.pdf")
+                    sheet_api.ExportAsFixedFormat(0, pdf_path)  # 0 refers to xlTypePDF
+                    with open(pdf_path, "rb") as pdf_file:
+                        pdf_bytes = pdf_file.read()
+            elif (renderer or PDF_RENDERER) == 'native':
+                from PDFRenderer import PDFRenderer
+                pdf_bytes = PDFRenderer(self.sheet).render_to_bytes()
+            else:
+                if xlsx_bytes is None:
+                    xlsx_bytes = self.save_workbook_to_bytes()
+                pdf_bytes = convert_xlsx_bytes_to_pdf(xlsx_bytes)
+        except subprocess.CalledProcessError as e:
+            print(f"LibreOffice conversion failed: {e.stderr.decode(errors='replace')}")
+            return None
+        except Exception as e:
+            print(f"Error exporting to PDF: {e}")
+            return None
+
+        if COMPACT_PDFS:
+            pdf_bytes = self._compact(pdf_bytes, pdf_filename or "output.pdf")
+
+        if pdf_filename:
+            pdf_path = os.path.join(self.modified_folder, pdf_filename)
+            with open(pdf_path, "wb") as pdf_file:
+                pdf_file.write(pdf_bytes)
+            print(f"PDF exported at {pdf_path}")
+        set_attribute("pdf_bytes", len(pdf_bytes))
+        print(f"PDF exported in memory ({len(pdf_bytes)} bytes)")
+        return pdf_bytes
+
+    def _compact(self, pdf_bytes, name):
+        """Compacts PDF bytes and keeps the report in compaction_reports."""
+        from pdf_tools import compact_pdf
+        pdf_bytes, report = compact_pdf(pdf_bytes, name=name)
+        self.compaction_reports.append(report)
+        return pdf_bytes
+
+    @timed("pdf_convert")
+    def export_to_pdf(self, payment=None, filename='modified.pdf', excel_filename="output", project_name="Information Systems Workspace", destination_folder="Cost Cover Sheets", renderer=None):
+        """
+        Exports the sheet to a PDF, fitting it to a single page.
+
+        renderer selects how the PDF is produced on Linux: "libreoffice" converts the saved
+        workbook, "native" draws the open sheet directly with PDFRenderer. Defaults to PDF_RENDERER.
+        """
         if self.sheet is None:
             raise Exception("Workbook is not opened. Call open_workbook() first.")
 
@@ -207,6 +855,18 @@ class ExcelModifier:
     
         pdf_path = os.path.join(self.modified_folder, name)
         print(pdf_path)
+
+        if self.backend == 'openpyxl' and (renderer or PDF_RENDERER) == 'native':
+            from PDFRenderer import PDFRenderer
+            try:
+                PDFRenderer(self.sheet).render(pdf_path)
+                print(f"PDF rendered natively at {pdf_path}")
+                if COMPACT_PDFS:
+                    self.compaction_reports.append(_compact_pdf_file(pdf_path))
+                return pdf_path
+            except Exception as e:
+                print(f"Error rendering PDF natively: {e}")
+                return None
     
         if self.backend == 'xlwings':
             # Windows-specific export using xlwings (unchanged)
@@ -219,6 +879,8 @@ class ExcelModifier:
                 pdf_path = pdf_path + ".pdf"  # xlwings doesn't add the extension
                 
                 print(f"PDF exported at {pdf_path}")
+                if COMPACT_PDFS:
+                    self.compaction_reports.append(_compact_pdf_file(pdf_path))
                 return pdf_path
             except Exception as e:
                 print(f"Error exporting to PDF: {e}")
@@ -230,16 +892,7 @@ class ExcelModifier:
             original_dir = os.getcwd()
             
             try:
-                cmd = [
-                        'libreoffice', '--headless',
-                        '--convert-to', 'pdf',
-                        '--outdir', self.modified_folder,
-                        temp_xlsx
-                ]
-
-
-
-                subprocess.run(cmd, check=True)
+                run_libreoffice([temp_xlsx], self.modified_folder)
     
                 # Ensure that the generated PDF has the same name as the input XLSX file.
                 generated_pdf = os.path.join(self.modified_folder, f'{excel_filename}.pdf')
@@ -252,6 +905,8 @@ class ExcelModifier:
                 # Rename the generated PDF to the desired filename (overwrite if exists).
                 os.rename(generated_pdf, pdf_path)
                 print(f"PDF exported at {pdf_path}")
+                if COMPACT_PDFS:
+                    self.compaction_reports.append(_compact_pdf_file(pdf_path))
 
 
                 # acc_api = ACCAPI()
@@ -270,6 +925,7 @@ class ExcelModifier:
         
 
 
+    @timed("pdf_convert")
     def export_to_pdf_no_upload(self, excel_filename="output"):
         """Exports the sheet to a PDF, fitting it to a single page."""
         if self.sheet is None:
@@ -288,13 +944,7 @@ class ExcelModifier:
     
         # Convert using LibreOffice
         try:
-            cmd = [
-                    'libreoffice', '--headless',
-                    '--convert-to', 'pdf',
-                    '--outdir', self.modified_folder,
-                    temp_xlsx  # No quotes needed; subprocess handles spaces
-            ]
-            result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            result = run_libreoffice([temp_xlsx], self.modified_folder)
             print(f"LibreOffice stdout: {result.stdout.decode()}")
             print(f"LibreOffice stderr: {result.stderr.decode()}")
     
@@ -310,48 +960,186 @@ class ExcelModifier:
             print(f"LibreOffice conversion failed: {e.stderr.decode()}")
             return None
 
+    def queue_pdf_export(self, excel_filename, pdf_filename=None, job=None, fit_to_page=True):
+        """
+        Queues a saved workbook for the next export_pending_to_pdf() call.
+
+        Parameters:
+        - excel_filename: str, name of the saved workbook in modified_folder, without extension.
+        - pdf_filename: str, name of the resulting PDF without extension (defaults to excel_filename).
+        - job: any value the caller wants handed back with the result (e.g. the project name).
+        - fit_to_page: bool, on Excel squeeze the first sheet onto one page. False exports every
+          sheet with the workbook's own page setup, for reports that run over many pages.
+
+        Returns:
+        - dict: the queued entry, filled in with "status", "pdf_path" and "error" once converted.
+        """
+        entry = {
+                "xlsx_path": os.path.join(self.modified_folder, f"{excel_filename}.xlsx"),
+                "pdf_filename": pdf_filename or excel_filename,
+                "output_folder": self.modified_folder,
+                "job": job,
+                "fit_to_page": fit_to_page,
+        }
+        self.pending_exports.append(entry)
+        return entry
+
+    def export_pending_to_pdf(self, workers=None):
+        """Converts every queued workbook to PDF in one batch and clears the queue."""
+        entries, self.pending_exports = self.pending_exports, []
+        return ExcelModifier.convert_batch_to_pdf(entries, workers=workers)
+
+    @staticmethod
+    @timed("pdf_convert")
+    def convert_batch_to_pdf(entries, workers=None):
+        """
+        Converts many saved workbooks at once, paying the converter startup once per worker
+        instead of once per document, and maps every produced PDF back to its entry.
+
+        Parameters:
+        - entries: list of dicts as returned by queue_pdf_export().
+        - workers: int, number of converter processes to split the batch over (defaults to CONVERTER_WORKERS).
+
+        Returns:
+        - list: the same entries, each with "status" set to "ok" (with "pdf_path") or "error" (with "error").
+        """
+        if not entries:
+            return []
+
+        for entry in entries:
+            entry.update(status="error", pdf_path=None, error=None)
+
+        if USE_XLWINGS:
+            ExcelModifier._convert_batch_with_excel(entries)
+        else:
+            workers = max(1, workers or CONVERTER_WORKERS)
+            missing = [entry for entry in entries if not os.path.exists(entry["xlsx_path"])]
+            for entry in missing:
+                entry["error"] = f"{entry['xlsx_path']} does not exist."
+            existing = [entry for entry in entries if entry not in missing]
+
+            # LibreOffice names every PDF after its input, so workbooks sharing a
+            # file name have to go through different invocations.
+            chunks = [[] for _ in range(min(workers, len(existing)))]
+            for i, entry in enumerate(existing):
+                name = os.path.basename(entry["xlsx_path"])
+                # Prefer the round-robin chunk, then any chunk that has no workbook of that name yet.
+                candidates = chunks[i % len(chunks):] + chunks[:i % len(chunks)]
+                chunk = next((c for c in candidates
+                              if all(os.path.basename(e["xlsx_path"]) != name for e in c)), None)
+                if chunk is None:
+                    chunk = []
+                    chunks.append(chunk)
+                chunk.append(entry)
+
+            if len(chunks) == 1:
+                ExcelModifier._convert_chunk_with_libreoffice(chunks[0])
+            elif chunks:
+                # Each worker runs its chunks one after another; run_libreoffice gives
+                # every invocation a converter slot with its own user profile.
+                lanes = [chunks[w::workers] for w in range(min(workers, len(chunks)))]
+
+                def run_lane(worker_index):
+                    for lane_chunk in lanes[worker_index]:
+                        ExcelModifier._convert_chunk_with_libreoffice(lane_chunk)
+
+                with ThreadPoolExecutor(max_workers=len(lanes)) as executor:
+                    list(executor.map(run_lane, range(len(lanes))))
+
+        converted = sum(1 for entry in entries if entry["status"] == "ok")
+        set_attribute("documents", len(entries))
+        set_attribute("converted", converted)
+        print(f"Batch export finished: {converted}/{len(entries)} PDFs generated.")
+        if COMPACT_PDFS:
+            for entry in entries:
+                if entry["status"] == "ok":
+                    entry["compaction"] = _compact_pdf_file(entry["pdf_path"])
+            saved = sum(entry["compaction"]["saved_bytes"] for entry in entries if entry.get("compaction"))
+            print(f"Batch compaction saved {saved} bytes.")
+        for entry in entries:
+            if entry["status"] != "ok":
+                print(f"Failed to export {entry['xlsx_path']}: {entry['error']}")
+        return entries
+
+    @staticmethod
+    def _convert_chunk_with_libreoffice(chunk):
+        """Runs a single LibreOffice invocation for a chunk of batch entries."""
+        with tempfile.TemporaryDirectory(prefix="pdf_batch_") as outdir:
+            error = None
+            try:
+                run_libreoffice([entry["xlsx_path"] for entry in chunk], outdir)
+            except subprocess.CalledProcessError as e:
+                error = f"LibreOffice conversion failed: {e.stderr.decode(errors='replace')}"
+            except OSError as e:
+                error = f"LibreOffice could not be started: {e}"
+
+            # A failing document does not stop LibreOffice from converting the rest,
+            # so every entry is checked on its own.
+            for entry in chunk:
+                generated_pdf = os.path.join(outdir, f"{Path(entry['xlsx_path']).stem}.pdf")
+                if not os.path.exists(generated_pdf):
+                    entry["error"] = error or "LibreOffice did not produce a PDF."
+                    continue
+                os.makedirs(entry["output_folder"], exist_ok=True)
+                pdf_path = os.path.join(entry["output_folder"], f"{entry['pdf_filename']}.pdf")
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+                shutil.move(generated_pdf, pdf_path)
+                entry.update(status="ok", pdf_path=pdf_path, error=None)
+
+    @staticmethod
+    def _convert_batch_with_excel(entries):
+        """
+        Exports batch entries through pooled Excel instances.
+        Each entry is its own lease, so the per-job timeout applies per document.
+        """
+        pool = get_excel_pool()
+        for entry in entries:
+            try:
+                with pool.lease() as app:
+                    workbook = app.books.open(os.path.abspath(entry["xlsx_path"]))
+                    try:
+                        pdf_path = os.path.abspath(os.path.join(entry["output_folder"], entry["pdf_filename"]))
+                        if entry.get("fit_to_page", True):
+                            sheet_api = workbook.sheets[0].api
+                            sheet_api.PageSetup.FitToPagesWide = 1
+                            sheet_api.PageSetup.FitToPagesTall = 1
+                            sheet_api.PageSetup.Zoom = False
+                            sheet_api.ExportAsFixedFormat(0, pdf_path)  # 0 refers to xlTypePDF
+                        else:
+                            workbook.api.ExportAsFixedFormat(0, pdf_path)
+                    finally:
+                        workbook.close()
+                entry.update(status="ok", pdf_path=pdf_path + ".pdf", error=None)
+            except Exception as e:
+                entry["error"] = str(e)
+
 
     def insert_svg_as_image(self, svg_code, cell_range):
         """
-        Converts SVG code to PNG using svgpathtools and Pillow, and inserts it into the Excel sheet.
+        Converts SVG code to PNG and inserts it into the Excel sheet.
+        Rendering goes through the shared signature cache and stays in memory.
 
         Parameters:
         - svg_code: str, SVG code as a string.
         - cell_range: str, Excel cell range where the image should be inserted.
         """
         try:
-            # Step 1: Save the SVG code to a temporary file
-            temp_svg_path = os.path.join(self.modified_folder, "temp_image.svg")
-            with open(temp_svg_path, "w", encoding="utf-8") as svg_file:
-                svg_file.write(svg_code)
-
-            # Step 2: Parse the SVG to extract paths
-            paths, attributes = svg2paths(temp_svg_path)
-
-            # Step 3: Create a new blank image (transparent background)
-            width, height = 600, 300  # adjust size as needed
-            img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-            draw = ImageDraw.Draw(img)
-
-            # Step 4: Draw the paths onto the image
-            for path in paths:
-                for segment in path:
-                    start = segment.start
-                    end = segment.end
-                    draw.line((start.real, start.imag, end.real, end.imag), fill='black', width=2)
-
-            # Step 5: Save the image as PNG
-            temp_png_path = os.path.join(self.modified_folder, "temp_image.png")
-            img.save(temp_png_path, "PNG")
-
-            # Step 6: Insert the PNG into the Excel sheet
+            from signature_renderer import render_signature_png
+            png_bytes = render_signature_png(svg_code)
+
             if self.backend == 'xlwings':
-                self.sheet.pictures.add(temp_png_path,
-                                        left=self.sheet.range(cell_range).left,
-                                        top=self.sheet.range(cell_range).top)
+                # Excel needs a file to insert a picture from; use a private one per call.
+                with tempfile.TemporaryDirectory(dir=TMPFS_DIR) as work_dir:
+                    png_path = os.path.join(work_dir, "signature.png")
+                    with open(png_path, "wb") as png_file:
+                        png_file.write(png_bytes)
+                    self.sheet.pictures.add(png_path,
+                                            left=self.sheet.range(cell_range).left,
+                                            top=self.sheet.range(cell_range).top)
             else:
                 # For openpyxl, create an image object and anchor it to the cell.
-                xl_img = XLImage(temp_png_path)
+                xl_img = XLImage(ReusableBytesIO(png_bytes))
                 xl_img.anchor = cell_range  # e.g. "B2"
                 self.sheet.add_image(xl_img)
             print(f"SVG inserted as image at {cell_range}")
@@ -361,10 +1149,18 @@ class ExcelModifier:
     def close_workbook(self):
         """Closes the workbook and Excel application if necessary."""
         if self.backend == 'xlwings':
-            if self.workbook:
-                self.workbook.close()
-            if self.app:
-                self.app.quit()
+            try:
+                if self.workbook:
+                    self.workbook.close()
+            finally:
+                # The Excel instance goes back to the pool warm rather than being quit.
+                if self.app_lease:
+                    get_excel_pool().release(self.app_lease)
+                elif self.app:
+                    self.app.quit()
+                self.app_lease = None
+                self.app = None
+                self.workbook = None
         # For openpyxl, nothing special is needed.
         print("Workbook closed.")
 
@@ -0,0 +1,490 @@
+import hashlib
+import json
+import math
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from WorkerPool import (PRIORITY_CLASSES, PRIORITY_WEIGHTS, QUEUE_CAPACITY, QueueFull, ShuttingDown,
+                        job_processing_seconds, job_queue_wait_seconds, jobs_total, parse_section_limits)
+
+
+# "local" runs jobs on this process's WorkerPool; "sqlite" queues them in BROKER_PATH for
+# worker.py processes, on this machine or any other that sees the same files.
+JOB_TRANSPORT = os.getenv("JOB_TRANSPORT", "local")
+
+# Broker database and the folder workers leave generated PDFs in; both must be shared by
+# the web server and every worker node (a network share will do).
+BROKER_PATH = os.getenv("BROKER_PATH", os.path.join("broker", "jobs.sqlite3"))
+BROKER_ARTIFACT_DIR = os.getenv("BROKER_ARTIFACT_DIR", os.path.join("broker", "artifacts"))
+
+# Folders the jobs use besides the broker's: cost covers read and write each payment's review
+# stage in the output folder, and every section renders from the templates. Worker nodes are
+# only stateless if they see the web server's output folder (the same share, not a copy) and
+# identical templates; run_worker() checks both against what the web server published.
+# Both are the paths the sections use, relative to the repository root.
+SHARED_STATE_DIR = "modified_files"
+TEMPLATES_DIR = "templates"
+
+# Seconds between the web server's checks for finished jobs, and between a worker's checks for new ones.
+BROKER_POLL_INTERVAL = float(os.getenv("BROKER_POLL_INTERVAL", "0.2"))
+
+# Seconds a running job may go without a heartbeat (its worker died) before it is queued again.
+BROKER_LEASE_TIMEOUT = float(os.getenv("BROKER_LEASE_TIMEOUT", "60"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    section TEXT,
+    priority TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    state TEXT NOT NULL,
+    deadline REAL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, rank, enqueued_at);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    concurrency INTEGER NOT NULL,
+    seen_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteBroker:
+    """
+    A job queue in a SQLite file, for running workers without an external message broker.
+
+    Jobs are pickled (function and arguments), so the web server and the workers must run
+    the same code. A job is "queued", "running", "done" or "expired"; workers claim the
+    oldest queued job of the most urgent priority class in one transaction, so every job
+    is handed out once, and keep a heartbeat on it while it runs. A job whose heartbeat
+    stops for BROKER_LEASE_TIMEOUT seconds is queued again (it may then run twice).
+    """
+
+    def __init__(self, path=BROKER_PATH, lease_timeout=BROKER_LEASE_TIMEOUT):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads; every thread opens its own.
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.row_factory = sqlite3.Row
+            self.local.connection = connection
+        return connection
+
+    def put(self, job_id, fn, data, section=None, priority="interactive", deadline=None):
+        """Queues fn(data); deadline is the time.time() after which nobody waits for it."""
+        self._connection().execute(
+                "INSERT INTO jobs (id, section, priority, rank, payload, state, deadline, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, section, priority, PRIORITY_CLASSES.index(priority), pickle.dumps((fn, data)), deadline, time.time()))
+
+    def claim(self, worker_id):
+        """
+        Takes the next job for a worker and returns (id, fn, data, row), or None if none is queued.
+        Jobs whose deadline has passed are marked "expired" on the way.
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("UPDATE jobs SET state = 'queued', worker = NULL WHERE state = 'running' AND heartbeat_at < ?",
+                               (now - self.lease_timeout,))
+            connection.execute("UPDATE jobs SET state = 'expired', finished_at = ? WHERE state = 'queued' AND deadline < ?",
+                               (now, now))
+            row = connection.execute("SELECT * FROM jobs WHERE state = 'queued' ORDER BY rank, enqueued_at LIMIT 1").fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET state = 'running', worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                                   (worker_id, now, now, row["id"]))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        fn, data = pickle.loads(row["payload"])
+        return row["id"], fn, data, row
+
+    def heartbeat(self, job_id):
+        self._connection().execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running'", (time.time(), job_id))
+
+    def finish(self, job_id, result):
+        """Stores a finished job's JSON-safe result dict."""
+        self._connection().execute("UPDATE jobs SET state = 'done', finished_at = ?, result = ? WHERE id = ?",
+                                   (time.time(), json.dumps(result, default=str), job_id))
+
+    def set_priority(self, job_id, priority):
+        """Moves a queued job to another priority class; returns False if it is no longer queued."""
+        cursor = self._connection().execute("UPDATE jobs SET priority = ?, rank = ? WHERE id = ? AND state = 'queued'",
+                                            (priority, PRIORITY_CLASSES.index(priority), job_id))
+        return cursor.rowcount > 0
+
+    def set_deadline(self, job_id, deadline):
+        self._connection().execute("UPDATE jobs SET deadline = ? WHERE id = ? AND state = 'queued'", (deadline, job_id))
+
+    def jobs(self, job_ids):
+        """Returns the rows of the given jobs by id (without their payload)."""
+        if not job_ids:
+            return {}
+        placeholders = ",".join("?" * len(job_ids))
+        rows = self._connection().execute(
+                f"SELECT id, section, priority, state, deadline, enqueued_at, started_at, finished_at, worker, result "
+                f"FROM jobs WHERE id IN ({placeholders})", list(job_ids))
+        return {row["id"]: row for row in rows}
+
+    def delete(self, job_id):
+        self._connection().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def depths(self):
+        """Queued jobs per priority class."""
+        depths = {priority: 0 for priority in PRIORITY_CLASSES}
+        for row in self._connection().execute("SELECT priority, COUNT(*) FROM jobs WHERE state = 'queued' GROUP BY priority"):
+            depths[row[0]] = row[1]
+        return depths
+
+    def running(self):
+        return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()[0]
+
+    def set_setting(self, name, value):
+        self._connection().execute("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, value))
+
+    def setting(self, name):
+        """Returns a value stored with set_setting(), or None."""
+        row = self._connection().execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def register_worker(self, worker_id, concurrency):
+        self._connection().execute("INSERT OR REPLACE INTO workers (id, concurrency, seen_at) VALUES (?, ?, ?)",
+                                   (worker_id, concurrency, time.time()))
+
+    def unregister_worker(self, worker_id):
+        self._connection().execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def worker_slots(self):
+        """Jobs the workers seen within the lease timeout can run at once."""
+        row = self._connection().execute("SELECT SUM(concurrency) FROM workers WHERE seen_at >= ?",
+                                         (time.time() - self.lease_timeout,)).fetchone()
+        return row[0] or 0
+
+
+def templates_digest(templates_dir=TEMPLATES_DIR):
+    """Hash of the template files' names and contents (not their times, which differ between copies)."""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(templates_dir)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, templates_dir).encode("utf-8"))
+            with open(path, "rb") as template_file:
+                digest.update(hashlib.sha256(template_file.read()).digest())
+    return digest.hexdigest()
+
+
+def publish_shared_state(broker, state_dir=SHARED_STATE_DIR, templates_dir=TEMPLATES_DIR):
+    """
+    Records what worker nodes must share with the web server: a marker file left in the
+    output folder, and the digest of the templates.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    marker_path = os.path.join(state_dir, ".broker_marker")
+    try:
+        with open(marker_path) as marker_file:
+            marker = marker_file.read().strip()
+    except OSError:
+        marker = ""
+    if not marker:
+        marker = uuid.uuid4().hex
+        with open(marker_path, "w") as marker_file:
+            marker_file.write(marker)
+    broker.set_setting("state_marker", marker)
+    broker.set_setting("templates_digest", templates_digest(templates_dir))
+
+
+def check_shared_state(broker, state_dir=SHARED_STATE_DIR, templates_dir=TEMPLATES_DIR):
+    """Raises RuntimeError unless this node sees the output folder and templates the web server published."""
+    marker = broker.setting("state_marker")
+    if marker is None:
+        raise RuntimeError(f"No web server has published its shared state in {broker.path} yet")
+    try:
+        with open(os.path.join(state_dir, ".broker_marker")) as marker_file:
+            local_marker = marker_file.read().strip()
+    except OSError:
+        local_marker = None
+    if local_marker != marker:
+        raise RuntimeError(f"{os.path.abspath(state_dir)} is not the web server's output folder; "
+                           f"mount the same share there")
+    if templates_digest(templates_dir) != broker.setting("templates_digest"):
+        raise RuntimeError(f"Templates in {os.path.abspath(templates_dir)} differ from the web server's")
+
+
+class BrokerPool:
+    """
+    Stands in for WorkerPool when jobs run on worker.py nodes: submit() queues the job in the
+    broker and returns a Future that a poller thread resolves once a worker has finished it.
+
+    Priority classes are served strictly in PRIORITY_CLASSES order across the broker (the
+    weights are reported but not applied), and per-section limits are not enforced. Progress
+    reporting and traces stay with the worker that runs the job.
+
+    start() publishes the shared state (see SHARED_STATE_DIR) the workers check before they
+    take any job.
+    """
+
+    def __init__(self, broker=None, artifact_dir=BROKER_ARTIFACT_DIR, capacity=QUEUE_CAPACITY, poll_interval=BROKER_POLL_INTERVAL):
+        self.broker = broker or SQLiteBroker()
+        self.artifact_dir = artifact_dir
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self.mode = "sqlite"
+        self.weights = {priority: 1 for priority in PRIORITY_CLASSES}
+        self.weights.update(parse_section_limits(PRIORITY_WEIGHTS))
+        self.section_limits = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stats = {}
+        self.class_stats = {priority: {"jobs": 0, "queue_wait_s": 0.0, "max_queue_wait_s": 0.0} for priority in PRIORITY_CLASSES}
+        self.shed = {"rejected": 0, "expired": 0}
+        self.draining = False
+
+    @property
+    def workers(self):
+        """Job slots of the workers currently connected to the broker (at least 1)."""
+        return max(1, self.broker.worker_slots())
+
+    def start(self):
+        """Publishes the shared state and starts the thread collecting finished jobs."""
+        if self.thread is None:
+            publish_shared_state(self.broker)
+            self.thread = threading.Thread(target=self._poll, name="broker-poller", daemon=True)
+            self.thread.start()
+            print(f"Broker pool started: jobs go through {self.broker.path}, PDFs through {self.artifact_dir}")
+        return self
+
+    def submit(self, fn, data, section=None, on_start=None, priority="interactive", deadline=None):
+        """Same contract as WorkerPool.submit(); fn and data must be picklable."""
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        job_id = uuid.uuid4().hex
+        job = {"future": Future(), "on_start": on_start, "deadline": deadline, "section": section,
+               "priority": priority, "started": False}
+        with self.lock:
+            # Checked and queued under one lock, so concurrent submissions from this process
+            # cannot overshoot capacity (retry_after() takes the lock itself, so it is asked after).
+            refused = ShuttingDown if self.draining else None
+            if refused is None and self.capacity and self.queue_size() >= self.capacity:
+                self.shed["rejected"] += 1
+                refused = QueueFull
+            if refused is None:
+                self.pending[job_id] = job
+                try:
+                    self.broker.put(job_id, fn, data, section=section, priority=priority, deadline=self._wall_deadline(job))
+                except Exception:
+                    del self.pending[job_id]
+                    raise
+        if refused is ShuttingDown:
+            raise ShuttingDown(self.retry_after())
+        if refused is QueueFull:
+            raise QueueFull(self.capacity, self.retry_after())
+        return job["future"]
+
+    def promote(self, future, priority):
+        """Same contract as WorkerPool.promote()."""
+        with self.lock:
+            job_id = next((job_id for job_id, job in self.pending.items() if job["future"] is future), None)
+        if job_id is None or not self.broker.set_priority(job_id, priority):
+            return False
+        self.pending[job_id]["priority"] = priority
+        return True
+
+    def queue_size(self):
+        return sum(self.broker.depths().values())
+
+    def queue_depths(self):
+        return self.broker.depths()
+
+    def busy(self):
+        return self.broker.running()
+
+    def retry_after(self):
+        """Estimated seconds until the current queue has drained, from the average job time."""
+        with self.lock:
+            jobs = sum(stats["jobs"] for stats in self.stats.values())
+            processing = sum(stats["processing_s"] for stats in self.stats.values())
+        average = processing / jobs if jobs else 1.0
+        return max(1, math.ceil(average * self.queue_size() / self.workers))
+
+    def drain(self, timeout=None):
+        """Stops taking new jobs and waits until the ones submitted from here have finished."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self.draining = True
+        while self.pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Broker pool drain timed out with {len(self.pending)} jobs outstanding")
+                return False
+            time.sleep(self.poll_interval)
+        print("Broker pool drained")
+        return True
+
+    def _wall_deadline(self, job):
+        # Deadlines are monotonic times of this process; other machines need wall clock times.
+        deadline = job["deadline"]() if job["deadline"] else None
+        return None if deadline is None else time.time() + deadline - time.monotonic()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self._collect()
+            except Exception as e:
+                print(f"Error polling the job broker: {e}")
+
+    def _collect(self):
+        with self.lock:
+            pending = dict(self.pending)
+        for job_id, row in self.broker.jobs(list(pending)).items():
+            job = pending[job_id]
+            if row["state"] == "queued":
+                # Coalesced requests may have extended the deadline since it was queued.
+                self.broker.set_deadline(job_id, self._wall_deadline(job))
+                continue
+            if not job["started"] and row["state"] in ("running", "done"):
+                job["started"] = True
+                if job["on_start"]:
+                    job["on_start"]()
+            if row["state"] == "running":
+                continue
+
+            if row["state"] == "expired":
+                with self.lock:
+                    self.shed["expired"] += 1
+                wait = row["finished_at"] - row["enqueued_at"]
+                result = {"error": "Request deadline passed before processing started", "status_code": 503,
+                          "queue_wait_ms": round(wait * 1000), "processing_ms": 0}
+            else:
+                result = self._load_result(row)
+            with self.lock:
+                del self.pending[job_id]
+            self.broker.delete(job_id)
+            job["future"].set_result(result)
+
+    def _load_result(self, row):
+        result = json.loads(row["result"]) if row["result"] else {"error": "No result", "status_code": 500}
+        artifact_path = result.pop("artifact_path", None)
+        if artifact_path:
+            try:
+                with open(artifact_path, "rb") as pdf_file:
+                    result["pdf_bytes"] = pdf_file.read()
+                os.remove(artifact_path)
+            except OSError as e:
+                result = {"error": f"PDF produced by {row['worker']} is not readable: {e}", "status_code": 500}
+
+        wait = row["started_at"] - row["enqueued_at"]
+        processing = row["finished_at"] - row["started_at"]
+        result["queue_wait_ms"] = round(wait * 1000)
+        result["processing_ms"] = round(processing * 1000)
+        section = row["section"]
+        with self.lock:
+            stats = self.stats.setdefault(section, {"jobs": 0, "queue_wait_s": 0.0, "processing_s": 0.0})
+            stats["jobs"] += 1
+            stats["queue_wait_s"] += wait
+            stats["processing_s"] += processing
+            class_stats = self.class_stats[row["priority"]]
+            class_stats["jobs"] += 1
+            class_stats["queue_wait_s"] += wait
+            class_stats["max_queue_wait_s"] = max(class_stats["max_queue_wait_s"], wait)
+        jobs_total.inc(section=section or "none", priority=row["priority"], status=result.get("status_code", 200))
+        job_queue_wait_seconds.observe(wait, section=section or "none", priority=row["priority"])
+        job_processing_seconds.observe(processing, section=section or "none")
+        print(f"{section or 'Job'} ({row['priority']}) ran on {row['worker']}: waited {wait * 1000:.0f} ms in queue, "
+              f"processed in {processing * 1000:.0f} ms")
+        return result
+
+
+def run_worker(broker=None, artifact_dir=BROKER_ARTIFACT_DIR, concurrency=1, worker_id=None, stop=None,
+               poll_interval=BROKER_POLL_INTERVAL):
+    """
+    Claims and runs broker jobs until stop (a threading.Event) is set, finishing the running ones.
+
+    Every job's PDF is written to artifact_dir and only its path goes back through the broker.
+    Raises RuntimeError before claiming anything if this node does not share the web server's
+    output folder and templates (see check_shared_state()).
+
+    Parameters:
+    - broker: SQLiteBroker, defaults to the one at BROKER_PATH.
+    - artifact_dir: str, folder shared with the web server.
+    - concurrency: int, jobs run at the same time.
+    - worker_id: str, name shown in the web server's logs, defaults to host and process id.
+    - stop: threading.Event, set to stop claiming jobs.
+    """
+    broker = broker or SQLiteBroker()
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stop = stop or threading.Event()
+    check_shared_state(broker)
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    def run_slot():
+        while not stop.is_set():
+            broker.register_worker(worker_id, concurrency)
+            claimed = broker.claim(worker_id)
+            if claimed is None:
+                stop.wait(poll_interval)
+                continue
+            job_id, fn, data, row = claimed
+            done = threading.Event()
+
+            def keep_alive():
+                while not done.wait(broker.lease_timeout / 3):
+                    broker.heartbeat(job_id)
+
+            threading.Thread(target=keep_alive, name=f"heartbeat-{job_id[:8]}", daemon=True).start()
+            try:
+                result = fn(data)
+            except Exception as e:
+                print(f"Error processing request: {str(e)}")
+                result = {"error": str(e), "status_code": 500}
+            finally:
+                done.set()
+            if not isinstance(result, dict):
+                result = {"error": "No result", "status_code": 500}
+            pdf_bytes = result.pop("pdf_bytes", None)
+            if pdf_bytes:
+                artifact_path = os.path.join(artifact_dir, f"{job_id}.pdf")
+                with open(artifact_path, "wb") as pdf_file:
+                    pdf_file.write(pdf_bytes)
+                result["artifact_path"] = artifact_path
+            broker.finish(job_id, result)
+            print(f"{row['section'] or 'Job'} ({row['priority']}) finished by {worker_id} "
+                  f"with status {result.get('status_code', 200)}")
+
+    threads = [threading.Thread(target=run_slot, name=f"broker-worker-{i}", daemon=True) for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    print(f"Worker {worker_id} consuming {broker.path} with {len(threads)} slots")
+    for thread in threads:
+        thread.join()
+    broker.unregister_worker(worker_id)
+    print(f"Worker {worker_id} stopped")
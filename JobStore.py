@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from Tracing import span, trace
+from WorkerPool import PRIORITY_CLASSES, QueueFull, ShuttingDown
+
+
+# Seconds a finished job and its PDF are kept for GET /jobs/<id>/result.
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "600"))
+
+# Finished jobs kept at most, oldest dropped first; unfinished jobs are never dropped.
+JOB_STORE_MAX = int(os.getenv("JOB_STORE_MAX", "200"))
+
+_current = threading.local()
+
+# Jobs currently running in this process, by id, for report_progress().
+_running_jobs = {}
+
+
+def report_progress(stage, percent):
+    """
+    Records how far the job running on this thread has come.
+    Outside a tracked job (or inside a worker process) this is a no-op.
+    """
+    job = _running_jobs.get(getattr(_current, "job_id", None))
+    if job is not None:
+        job["stage"] = stage
+        job["progress"] = percent
+
+
+class JobStore:
+    """
+    Tracks PDF generation jobs submitted to a WorkerPool so clients can poll for them.
+
+    A job is a dict with its id, state ("queued", "running", "done" or "failed"),
+    stage, progress and, once finished, the worker's result dict. Finished jobs are kept
+    for ttl seconds and at most max_jobs of them.
+
+    Jobs submitted with a key are coalesced: while a job with the same key is queued or
+    running, identical submissions attach to it and share its result instead of doing
+    the work again. A more urgent submission attaching to a queued job moves the job up
+    to its priority class.
+
+    A job's deadline is the latest of its submitters' deadlines (none if any of them has
+    none); the pool drops the job if that has passed before it starts.
+
+    The job id is also the id of the job's trace: everything the job does is recorded as
+    spans under a root "job" span (see Tracing), tagged with the ids of the requests that
+    submitted it.
+    """
+
+    def __init__(self, pool, ttl=JOB_RESULT_TTL, max_jobs=JOB_STORE_MAX):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        # Unfinished jobs by coalescing key.
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stats = {"submitted": 0, "coalesced": 0}
+
+    def submit(self, fn, data, section=None, key=None, priority="interactive", deadline=None, request_id=None,
+               attach_running=True):
+        """
+        Queues fn(data) on the pool and returns the job.
+        With a key, an unfinished job with the same key is returned instead of a new one;
+        with attach_running=False only a job that has not started yet is.
+        priority is the pool's priority class for the job; deadline is the time.monotonic()
+        after which the submitter no longer waits for the result, or None.
+        request_id is the submitting request's correlation id, recorded on the job's trace.
+        Raises WorkerPool.QueueFull if the pool cannot take the job.
+        """
+        with self.lock:
+            # Looked up and published in one step, so simultaneous duplicates share one job.
+            self.stats["submitted"] += 1
+            existing = self.in_flight.get(key) if key is not None else None
+            if existing is not None and not attach_running and existing["state"] != "queued":
+                existing = None
+            if existing is not None:
+                existing["attached"] += 1
+                if _more_urgent(priority, existing["priority"]):
+                    # Before the job reaches the pool, submitting it picks the new class up.
+                    if existing["pool_future"] is None or self.pool.promote(existing["pool_future"], priority):
+                        print(f"Promoted job {existing['id']} from {existing['priority']} to {priority}")
+                        existing["priority"] = priority
+                if request_id:
+                    existing["request_ids"].append(request_id)
+                if existing["deadline"] is not None:
+                    existing["deadline"] = None if deadline is None else max(existing["deadline"], deadline)
+                self.stats["coalesced"] += 1
+                print(f"Coalesced request into job {existing['id']} ({existing['attached']} attached)")
+                return existing
+
+            job = {
+                    "id": uuid.uuid4().hex,
+                    "key": key,
+                    "attached": 1,
+                    "request_ids": [request_id] if request_id else [],
+                    "section": section,
+                    "priority": priority,
+                    "deadline": deadline,
+                    "state": "queued",
+                    "stage": "queued",
+                    "progress": 0,
+                    "created_at": time.time(),
+                    "started_at": None,
+                    "finished_at": None,
+                    "result": None,
+                    # Resolved with the pool's result; exists before anyone can attach.
+                    "future": Future(),
+                    "pool_future": None,
+            }
+            self._purge()
+            self.jobs[job["id"]] = job
+            if key is not None:
+                self.in_flight[key] = job
+
+        def on_start():
+            job.update(state="running", stage="started", started_at=time.time())
+            _running_jobs[job["id"]] = job
+
+        # Only the id travels with the work, so it can be pickled for worker processes.
+        submitted_priority = job["priority"]
+        try:
+            pool_future = self.pool.submit(_tracked, (job["id"], fn, data, job["created_at"]), section=section, on_start=on_start,
+                                           priority=submitted_priority, deadline=lambda: job["deadline"])
+        except Exception as e:
+            with self.lock:
+                self.jobs.pop(job["id"], None)
+                if self.in_flight.get(key) is job:
+                    del self.in_flight[key]
+            # Requests that attached meanwhile get the refusal as their result.
+            self._finish(job, {"error": f"Job could not be queued: {e}", "status_code": _refusal_status(e)})
+            raise
+        with self.lock:
+            job["pool_future"] = pool_future
+            # A more urgent request may have attached while the job was being queued.
+            if job["priority"] != submitted_priority:
+                self.pool.promote(pool_future, job["priority"])
+        pool_future.add_done_callback(lambda future: self._finish(job, _pool_result(future)))
+        return job
+
+    def get(self, job_id):
+        """Returns the job, or None if it is unknown or has expired."""
+        with self.lock:
+            self._purge()
+            return self.jobs.get(job_id)
+
+    def wait(self, job, timeout=None):
+        """Blocks until the job has finished and returns its result dict."""
+        return job["future"].result(timeout)
+
+    def describe(self, job):
+        """JSON-safe view of a job for the status endpoint."""
+        result = job["result"] or {}
+        return {
+                "id": job["id"],
+                "section": job["section"],
+                "priority": job["priority"],
+                "state": job["state"],
+                "stage": job["stage"],
+                "progress": job["progress"],
+                "attached": job["attached"],
+                "request_ids": job["request_ids"],
+                "created_at": job["created_at"],
+                "started_at": job["started_at"],
+                "finished_at": job["finished_at"],
+                "queue_wait_ms": result.get("queue_wait_ms"),
+                "processing_ms": result.get("processing_ms"),
+                "error": result.get("error"),
+        }
+
+    def _finish(self, job, result):
+        _running_jobs.pop(job["id"], None)
+        with self.lock:
+            if self.in_flight.get(job["key"]) is job:
+                del self.in_flight[job["key"]]
+        failed = not isinstance(result, dict) or "error" in result
+        job.update(result=result if isinstance(result, dict) else {"error": "No result", "status_code": 500},
+                   state="failed" if failed else "done",
+                   stage="failed" if failed else "done",
+                   progress=job["progress"] if failed else 100,
+                   finished_at=time.time())
+        # Waiters wake up to a job that is already finished.
+        job["future"].set_result(result)
+
+    def _purge(self):
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job["finished_at"] is not None]
+        expired = {job["id"] for job in finished if now - job["finished_at"] > self.ttl}
+        finished = [job for job in finished if job["id"] not in expired]
+        if len(finished) > self.max_jobs:
+            finished.sort(key=lambda job: job["finished_at"])
+            expired.update(job["id"] for job in finished[:len(finished) - self.max_jobs])
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+def _pool_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return {"error": str(e), "status_code": 500}
+
+
+def _refusal_status(error):
+    # Same answers as the app gives the submitter: 503 while shutting down, 429 when full.
+    if isinstance(error, ShuttingDown):
+        return 503
+    return 429 if isinstance(error, QueueFull) else 500
+
+
+def _more_urgent(priority, than):
+    # Classes outside PRIORITY_CLASSES (custom PRIORITY_WEIGHTS) rank last.
+    ranks = {name: rank for rank, name in enumerate(PRIORITY_CLASSES)}
+    return ranks.get(priority, len(ranks)) < ranks.get(than, len(ranks))
+
+
+def _tracked(args):
+    job_id, fn, data, created_at = args
+    _current.job_id = job_id
+    # Inside worker processes only the id is known; the job itself stays in the web server.
+    job = _running_jobs.get(job_id)
+    attributes = {key: job[key] for key in ("section", "priority", "request_ids")} if job else {}
+    try:
+        with trace(job_id), span("job", queue_wait_ms=round((time.time() - created_at) * 1000), **attributes) as job_span:
+            result = fn(data)
+            if isinstance(result, dict):
+                job_span["attributes"]["status_code"] = result.get("status_code", 200)
+                if result.get("pdf_bytes"):
+                    job_span["attributes"]["pdf_bytes"] = len(result["pdf_bytes"])
+                if "error" in result:
+                    job_span["status"] = "error"
+                    job_span["error"] = result["error"]
+            return result
+    finally:
+        _current.job_id = None
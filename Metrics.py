@@ -0,0 +1,199 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from Tracing import span
+
+
+# When the process started, as far as this process can tell: entry points import this module first.
+PROCESS_STARTED_AT = time.time()
+
+# Upper bounds (seconds) of the timing histogram buckets.
+METRICS_BUCKETS = tuple(float(bound) for bound in os.getenv("METRICS_BUCKETS", "0.05,0.1,0.25,0.5,1,2.5,5,10,30,60,120").split(","))
+
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self.values.items())]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination."""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, [("le", _format_value(bound))]), bucket_count))
+                samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, [("le", "+Inf")]), count))
+                samples.append((f"{self.name}_sum", _format_labels(self.labels, key), total))
+                samples.append((f"{self.name}_count", _format_labels(self.labels, key), count))
+        return samples
+
+
+class Collected:
+    """
+    A metric read at scrape time from state another component already keeps
+    (queue depths, cache statistics), so that component needs no metrics code.
+    fn returns a number, or a dict of label value tuples to numbers.
+    """
+
+    def __init__(self, name, help_text, type_="gauge", labels=(), fn=None):
+        self.name = name
+        self.help = help_text
+        self.type = type_
+        self.labels = tuple(labels)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Could not collect metric {self.name}: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [(self.name, _format_labels(self.labels, key if isinstance(key, tuple) else (key,)), value)
+                for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=METRICS_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def collect(self, name, help_text, fn, type_="gauge", labels=()):
+        return self._register(Collected(name, help_text, type_, labels, fn))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram("pdf_stage_duration_seconds", "Time spent per stage of PDF generation.", labels=("stage",))
+
+_stages = threading.local()
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Times the enclosed block into the stage histogram, whether or not it raises.
+
+    The stages are acc_fetch, template_load, cell_fill, save, pdf_convert and upload.
+    Time spent in a stage nested inside another (an ACC call while filling cells) is
+    only counted for the inner stage, so the stages of a job add up to its duration.
+    Stages timed inside worker processes (WORKER_MODE=process) stay in that process's
+    registry and are not served by the web server's /metrics.
+
+    Every stage is also a span of the current trace (see Tracing), which is yielded.
+    """
+    stack = _stages.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    started_at = time.perf_counter()
+    try:
+        with span(stage) as stage_span:
+            yield stage_span
+    finally:
+        elapsed = time.perf_counter() - started_at
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        stage_seconds.observe(elapsed - nested, stage=stage)
+
+
+def timed(stage):
+    """Decorator form of stage_timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+startup_seconds = {}
+
+registry.collect("app_startup_seconds", "Seconds from process start to each startup milestone.",
+                 lambda: {(milestone,): seconds for milestone, seconds in startup_seconds.items()}, labels=("milestone",))
+
+
+def mark_startup(milestone):
+    """Records the first time a startup milestone is reached ("imported", "listening", ...)."""
+    if milestone not in startup_seconds:
+        startup_seconds[milestone] = time.time() - PROCESS_STARTED_AT
+        print(f"Startup: {milestone} after {startup_seconds[milestone]:.2f}s")
@@ -0,0 +1,544 @@
+import io
+import os
+import re
+from datetime import date, datetime
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from openpyxl.utils import get_column_letter, range_boundaries
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A3, A4, B5, LETTER, LEGAL
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_DIR = os.path.join(SCRIPT_DIR, "trash", "Amiri")
+
+# Amiri covers both Arabic and Latin glyphs and is metrically close to Times New Roman,
+# the font the templates are designed with.
+REGULAR_FONT = "Amiri"
+BOLD_FONT = "Amiri-Bold"
+
+# Excel paper size codes used by the templates (ECMA-376 paperSize).
+PAPER_SIZES = {1: LETTER, 5: LEGAL, 8: A3, 9: A4, 13: B5}
+
+# Line widths in points for Excel border styles.
+BORDER_WIDTHS = {
+        "hair": 0.25, "thin": 0.5, "dotted": 0.5, "dashed": 0.5, "dashDot": 0.5, "dashDotDot": 0.5,
+        "medium": 1.0, "mediumDashed": 1.0, "mediumDashDot": 1.0, "mediumDashDotDot": 1.0,
+        "slantDashDot": 1.0, "thick": 1.5, "double": 1.5,
+}
+
+EMU_PER_POINT = 12700
+
+# Embed image streams as raw binary; ASCII85 encoding them in pure Python dominates render time.
+rl_config.useA85 = 0
+
+ARABIC_CHARS = re.compile(r"[؀-ۿݐ-ݿﭐ-﷿ﹰ-﻿]")
+CELL_REF = re.compile(r"\$?([A-Z]{1,3})\$?(\d+)")
+
+ARABIC_MONTHS = [
+        "يناير", "فبراير", "مارس", "أبريل", "مايو", "يونيو",
+        "يوليو", "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر",
+]
+
+_fonts_registered = False
+
+
+def register_fonts():
+    """Registers the Arabic capable fonts with reportlab once per process."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    pdfmetrics.registerFont(TTFont(REGULAR_FONT, os.path.join(FONT_DIR, "Amiri-Regular.ttf")))
+    pdfmetrics.registerFont(TTFont(BOLD_FONT, os.path.join(FONT_DIR, "Amiri-Bold.ttf")))
+    _fonts_registered = True
+
+
+class PDFRenderer:
+    """
+    Draws a filled openpyxl worksheet straight to PDF with reportlab.
+
+    It is meant for fixed single page layouts such as the cost cover sheet: it honours the
+    print area, fit-to-page, right-to-left sheets, column widths, row heights, merged cells,
+    fonts, fills, borders, number formats and anchored images. Formulas are limited to the
+    cell arithmetic and TEXT(TODAY(), ...) expressions the templates use.
+    """
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.today = date.today()
+        self._evaluating = set()
+        register_fonts()
+
+        print_area = sheet.print_area
+        if isinstance(print_area, (list, tuple)):
+            print_area = print_area[0] if print_area else None
+        if print_area:
+            print_area = print_area.split("!")[-1].replace("$", "")
+            self.min_col, self.min_row, self.max_col, self.max_row = range_boundaries(print_area)
+        else:
+            self.min_col, self.min_row = 1, 1
+            self.max_col, self.max_row = sheet.max_column, sheet.max_row
+
+        self.right_to_left = bool(sheet.sheet_view.rightToLeft)
+
+        # Column and row offsets in points, relative to the top-left of the print area.
+        self.col_widths = [self._column_width(col) for col in range(self.min_col, self.max_col + 1)]
+        self.row_heights = [self._row_height(row) for row in range(self.min_row, self.max_row + 1)]
+        self.col_offsets = [0]
+        for width in self.col_widths:
+            self.col_offsets.append(self.col_offsets[-1] + width)
+        self.row_offsets = [0]
+        for height in self.row_heights:
+            self.row_offsets.append(self.row_offsets[-1] + height)
+
+        # Map every merged cell to its range so borders and values are drawn once.
+        self.merged_ranges = {}
+        for merged_range in sheet.merged_cells.ranges:
+            for row in range(merged_range.min_row, merged_range.max_row + 1):
+                for col in range(merged_range.min_col, merged_range.max_col + 1):
+                    self.merged_ranges[(row, col)] = merged_range
+
+    def render(self, output):
+        """
+        Renders the sheet to a PDF.
+
+        Parameters:
+        - output: str path or binary file object the PDF is written to.
+        """
+        pdf = canvas.Canvas(output, pageCompression=1)
+        self.draw_page(pdf)
+        pdf.save()
+
+    @staticmethod
+    def render_sheets(sheets, output):
+        """
+        Renders several sheets into one PDF, one page per sheet and in the given order.
+        Fonts and images are embedded once for the whole document.
+        """
+        pdf = canvas.Canvas(output, pageCompression=1)
+        for sheet in sheets:
+            PDFRenderer(sheet).draw_page(pdf)
+        pdf.save()
+
+    def draw_page(self, pdf):
+        """Draws the sheet as the next page of a reportlab canvas."""
+        page_width, page_height = PAPER_SIZES.get(self.sheet.page_setup.paperSize, A4)
+        if self.sheet.page_setup.orientation == "landscape":
+            page_width, page_height = page_height, page_width
+
+        margins = self.sheet.page_margins
+        left, right = margins.left * 72, margins.right * 72
+        top, bottom = margins.top * 72, margins.bottom * 72
+        available_width = page_width - left - right
+        available_height = page_height - top - bottom
+
+        total_width = self.col_offsets[-1]
+        total_height = self.row_offsets[-1]
+        if self.sheet.sheet_properties.pageSetUpPr and self.sheet.sheet_properties.pageSetUpPr.fitToPage:
+            scale = min(available_width / total_width, available_height / total_height, 1)
+        else:
+            scale = (self.sheet.page_setup.scale or 100) / 100
+
+        if self.sheet.print_options.horizontalCentered:
+            origin_x = left + (available_width - total_width * scale) / 2
+        elif self.right_to_left:
+            origin_x = page_width - right - total_width * scale
+        else:
+            origin_x = left
+        origin_y = page_height - top
+
+        pdf.setPageSize((page_width, page_height))
+        pdf.translate(origin_x, origin_y)
+        pdf.scale(scale, scale)
+
+        self._draw_fills(pdf)
+        self._draw_values(pdf)
+        self._draw_borders(pdf)
+        self._draw_images(pdf)
+
+        pdf.showPage()
+
+    def render_to_bytes(self):
+        """Renders the sheet and returns the PDF as bytes."""
+        buffer = io.BytesIO()
+        self.render(buffer)
+        return buffer.getvalue()
+
+    # --- geometry -------------------------------------------------------------------------
+
+    def _column_width(self, col):
+        # openpyxl groups neighbouring columns sharing a width into one dimension (min..max).
+        dimension = next((d for d in self.sheet.column_dimensions.values()
+                          if (d.min or 0) <= col <= (d.max or 0)), None)
+        if dimension is None:
+            dimension = self.sheet.column_dimensions.get(get_column_letter(col))
+        if dimension is not None and dimension.hidden:
+            return 0
+        width = dimension.width if dimension is not None and dimension.customWidth else None
+        if not width:
+            width = self.sheet.sheet_format.defaultColWidth or 8.43
+        # Excel widths are in characters of the default font (7px) plus 5px of padding.
+        return (width * 7 + 5) * 0.75
+
+    def _row_height(self, row):
+        dimension = self.sheet.row_dimensions.get(row)
+        if dimension is not None and dimension.hidden:
+            return 0
+        if dimension is not None and dimension.height is not None:
+            return dimension.height
+        return self.sheet.sheet_format.defaultRowHeight or 15
+
+    def _rect(self, min_row, min_col, max_row, max_col):
+        """Returns (x, y, width, height) of a cell block in canvas coordinates (y grows up)."""
+        x0 = self.col_offsets[min_col - self.min_col]
+        x1 = self.col_offsets[max_col - self.min_col + 1]
+        if self.right_to_left:
+            x0, x1 = self.col_offsets[-1] - x1, self.col_offsets[-1] - x0
+        y_top = -self.row_offsets[min_row - self.min_row]
+        y_bottom = -self.row_offsets[max_row - self.min_row + 1]
+        return x0, y_bottom, x1 - x0, y_top - y_bottom
+
+    def _cells(self):
+        for row in self.sheet.iter_rows(min_row=self.min_row, max_row=self.max_row,
+                                        min_col=self.min_col, max_col=self.max_col):
+            for cell in row:
+                yield cell
+
+    # --- drawing --------------------------------------------------------------------------
+
+    def _draw_fills(self, pdf):
+        for cell in self._cells():
+            if cell.fill.fill_type != "solid":
+                continue
+            color = _rgb(cell.fill.fgColor)
+            if color is None:
+                continue
+            x, y, width, height = self._rect(cell.row, cell.column, cell.row, cell.column)
+            pdf.setFillColorRGB(*color)
+            pdf.rect(x, y, width, height, stroke=0, fill=1)
+
+    def _draw_values(self, pdf):
+        for cell in self._cells():
+            merged_range = self.merged_ranges.get((cell.row, cell.column))
+            if merged_range is not None:
+                if (cell.row, cell.column) != (merged_range.min_row, merged_range.min_col):
+                    continue
+                bounds = (merged_range.min_row, merged_range.min_col,
+                          min(merged_range.max_row, self.max_row), min(merged_range.max_col, self.max_col))
+            else:
+                bounds = (cell.row, cell.column, cell.row, cell.column)
+
+            value = self._value(cell)
+            if value is None or value == "":
+                continue
+            text = self._format(value, cell.number_format)
+            if not text.strip():
+                continue
+            self._draw_text(pdf, cell, text, isinstance(value, (int, float)), *self._rect(*bounds))
+
+    def _draw_text(self, pdf, cell, text, is_number, x, y, width, height):
+        font = cell.font
+        font_name = BOLD_FONT if font.b else REGULAR_FONT
+        font_size = font.sz or 11
+        padding = 2
+
+        lines = []
+        for paragraph in text.split("\n"):
+            paragraph = paragraph.strip() if "\n" in text else paragraph
+            if cell.alignment.wrap_text:
+                lines.extend(_wrap(paragraph, font_name, font_size, width - 2 * padding))
+            else:
+                lines.append(paragraph)
+
+        horizontal = cell.alignment.horizontal
+        if horizontal in (None, "general"):
+            # General alignment puts numbers at the end and text at the start of the reading direction.
+            if is_number:
+                horizontal = "left" if self.right_to_left else "right"
+            else:
+                horizontal = "right" if self.right_to_left else "left"
+        elif self.right_to_left and horizontal in ("left", "right"):
+            horizontal = "right" if horizontal == "left" else "left"
+
+        line_height = font_size * 1.2
+        block_height = line_height * len(lines)
+        vertical = cell.alignment.vertical or "bottom"
+        if vertical == "top":
+            baseline = y + height - font_size
+        elif vertical == "center":
+            baseline = y + (height + block_height) / 2 - font_size
+        else:
+            baseline = y + block_height - font_size + padding
+
+        color = _rgb(font.color) if font.color is not None else None
+        pdf.setFillColorRGB(*(color or (0, 0, 0)))
+        pdf.setFont(font_name, font_size)
+        for line in lines:
+            visual = _visual(line)
+            if horizontal == "center" or horizontal == "centerContinuous":
+                pdf.drawCentredString(x + width / 2, baseline, visual)
+            elif horizontal == "right":
+                pdf.drawRightString(x + width - padding, baseline, visual)
+            else:
+                pdf.drawString(x + padding, baseline, visual)
+            baseline -= line_height
+
+    def _draw_borders(self, pdf):
+        pdf.setStrokeColorRGB(0, 0, 0)
+        for cell in self._cells():
+            x, y, width, height = self._rect(cell.row, cell.column, cell.row, cell.column)
+            if width == 0 or height == 0:
+                continue
+            left_x, right_x = (x + width, x) if self.right_to_left else (x, x + width)
+            edges = {
+                    "left": (left_x, y, left_x, y + height, cell.column - 1, cell.row),
+                    "right": (right_x, y, right_x, y + height, cell.column + 1, cell.row),
+                    "top": (x, y + height, x + width, y + height, cell.column, cell.row - 1),
+                    "bottom": (x, y, x + width, y, cell.column, cell.row + 1),
+            }
+            merged_range = self.merged_ranges.get((cell.row, cell.column))
+            for side, (x1, y1, x2, y2, neighbour_col, neighbour_row) in edges.items():
+                style = getattr(cell.border, side).style
+                if not style:
+                    continue
+                # Edges inside a merged block are not visible in Excel either.
+                if merged_range is not None and self.merged_ranges.get((neighbour_row, neighbour_col)) is merged_range:
+                    continue
+                pdf.setLineWidth(BORDER_WIDTHS.get(style, 0.5))
+                pdf.line(x1, y1, x2, y2)
+
+    def _draw_images(self, pdf):
+        for image in getattr(self.sheet, "_images", []):
+            anchor = image.anchor
+            if isinstance(anchor, str):
+                continue
+            start = anchor._from
+            x_start = self._column_offset(start.col) + start.colOff / EMU_PER_POINT
+            y_start = self._row_offset(start.row) + start.rowOff / EMU_PER_POINT
+            end = getattr(anchor, "to", None)
+            if end is not None:
+                x_end = self._column_offset(end.col) + end.colOff / EMU_PER_POINT
+                y_end = self._row_offset(end.row) + end.rowOff / EMU_PER_POINT
+            else:
+                x_end = x_start + image.width * 0.75
+                y_end = y_start + image.height * 0.75
+            if self.right_to_left:
+                x_start, x_end = self.col_offsets[-1] - x_end, self.col_offsets[-1] - x_start
+            try:
+                reader = ImageReader(io.BytesIO(image._data()))
+            except Exception as e:
+                print(f"Skipping image that could not be read: {e}")
+                continue
+            pdf.drawImage(reader, x_start, -y_end, width=x_end - x_start, height=y_end - y_start, mask="auto")
+
+    def _column_offset(self, zero_based_col):
+        index = min(max(zero_based_col + 1 - self.min_col, 0), len(self.col_offsets) - 1)
+        return self.col_offsets[index]
+
+    def _row_offset(self, zero_based_row):
+        index = min(max(zero_based_row + 1 - self.min_row, 0), len(self.row_offsets) - 1)
+        return self.row_offsets[index]
+
+    # --- values ---------------------------------------------------------------------------
+
+    def _value(self, cell):
+        value = cell.value
+        if isinstance(value, str) and value.startswith("="):
+            return self._evaluate(cell.coordinate, value[1:])
+        return value
+
+    def _cell_number(self, coordinate):
+        if coordinate in self._evaluating:
+            return 0
+        self._evaluating.add(coordinate)
+        try:
+            value = self._value(self.sheet[coordinate])
+        finally:
+            self._evaluating.discard(coordinate)
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0
+
+    def _evaluate(self, coordinate, formula):
+        """Evaluates the small formula subset used by the templates, or returns None."""
+        formula = formula.strip()
+
+        # Cell arithmetic such as D10+D13-D41 or a plain reference such as C44.
+        if re.fullmatch(r"[\s$A-Z0-9.+\-]+", formula):
+            total = 0
+            for sign, term in re.findall(r"([+-]?)\s*([$A-Z]*\$?\d+(?:\.\d+)?)", formula):
+                ref = CELL_REF.fullmatch(term)
+                number = self._cell_number(f"{ref.group(1)}{ref.group(2)}") if ref else float(term)
+                total = total - number if sign == "-" else total + number
+            return total
+
+        # String concatenation of literals and TEXT(TODAY(), "format").
+        parts = _split_concatenation(formula)
+        if parts is not None:
+            pieces = []
+            for part in parts:
+                if part.startswith('"'):
+                    pieces.append(part[1:-1].replace('""', '"'))
+                    continue
+                match = re.fullmatch(r'TEXT\(\s*TODAY\(\)\s*,\s*"(.*)"\s*\)', part)
+                if not match:
+                    break
+                pieces.append(_format_date(self.today, match.group(1)))
+            else:
+                return "".join(pieces)
+
+        print(f"PDFRenderer: formula in {coordinate} is not supported and is left empty: ={formula}")
+        return None
+
+    def _format(self, value, number_format):
+        if isinstance(value, (datetime, date)):
+            return _format_date(value, number_format)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return str(value)
+        return _format_number(value, number_format)
+
+
+def _rgb(color):
+    """Converts an openpyxl ARGB color to a reportlab RGB tuple; theme colors yield None."""
+    if color is None or color.type != "rgb" or not isinstance(color.rgb, str):
+        return None
+    rgb = color.rgb[-6:]
+    return tuple(int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _visual(text):
+    """Shapes and reorders Arabic text so reportlab draws it right to left."""
+    if ARABIC_CHARS.search(text):
+        return get_display(arabic_reshaper.reshape(text))
+    return text
+
+
+def _wrap(text, font_name, font_size, max_width):
+    words = text.split(" ")
+    lines, current = [], ""
+    for word in words:
+        candidate = f"{current} {word}" if current else word
+        if current and pdfmetrics.stringWidth(_visual(candidate), font_name, font_size) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    lines.append(current)
+    return lines
+
+
+def _split_concatenation(formula):
+    """Splits `"a" & TEXT(...) & "b"` on top-level ampersands, or returns None."""
+    parts, current, depth, in_string = [], "", 0, False
+    i = 0
+    while i < len(formula):
+        char = formula[i]
+        if char == '"':
+            if in_string and formula[i + 1:i + 2] == '"':
+                current += '""'
+                i += 2
+                continue
+            in_string = not in_string
+        elif not in_string and char == "(":
+            depth += 1
+        elif not in_string and char == ")":
+            depth -= 1
+        if char == "&" and not in_string and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+        i += 1
+    parts.append(current.strip())
+    return parts if all(parts) else None
+
+
+def _format_date(value, number_format):
+    """Formats a date with the d/dd/mmm/mmmm/yy/yyyy tokens of an Excel date format."""
+    arabic = "-ar" in number_format or "B0000]" in number_format
+    pattern = re.sub(r"\[[^\]]*\]", "", number_format.split(";")[0]).replace("\\", "")
+    month_names = ARABIC_MONTHS if arabic else None
+
+    def replace(match):
+        token = match.group(0)
+        if token == "yyyy":
+            return f"{value.year:04d}"
+        if token == "yy":
+            return f"{value.year % 100:02d}"
+        if token == "mmmm":
+            return month_names[value.month - 1] if month_names else value.strftime("%B")
+        if token == "mmm":
+            return month_names[value.month - 1] if month_names else value.strftime("%b")
+        if token == "mm":
+            return f"{value.month:02d}"
+        if token == "m":
+            return str(value.month)
+        if token == "dd":
+            return f"{value.day:02d}"
+        return str(value.day)
+
+    if not re.search(r"[dmy]", pattern):
+        pattern = "dd mmmm yyyy"
+    return re.sub(r"yyyy|yy|mmmm|mmm|mm|m|dd|d", replace, pattern)
+
+
+def _format_number(value, number_format):
+    """Formats a number with the literal text, #/0 placeholders, thousands and % of an Excel format."""
+    section = number_format.split(";")[0]
+    if section in ("General", "@", ""):
+        if isinstance(value, float):
+            return str(int(value)) if value.is_integer() else f"{value:.10g}"
+        return str(value)
+
+    prefix, placeholder, suffix = "", "", ""
+    i = 0
+    target = "prefix"
+    while i < len(section):
+        char = section[i]
+        if char == "\\" and i + 1 < len(section):
+            literal = section[i + 1]
+            i += 2
+        elif char == '"':
+            end = section.index('"', i + 1)
+            literal = section[i + 1:end]
+            i = end + 1
+        elif char == "[":
+            i = section.index("]", i) + 1
+            continue
+        elif char in "_*":
+            literal = " " if char == "_" else ""
+            i += 2
+        elif char in "#0,.?":
+            if target == "suffix":
+                literal = char
+                i += 1
+            else:
+                placeholder += char
+                target = "number"
+                i += 1
+                continue
+        else:
+            literal = char
+            i += 1
+        if target == "prefix":
+            prefix += literal
+        else:
+            target = "suffix"
+            suffix += literal
+
+    percent = "%" in suffix or "%" in prefix
+    number = value * 100 if percent else value
+    decimals = len(placeholder.split(".")[1]) if "." in placeholder else 0
+    if "," in placeholder:
+        formatted = f"{number:,.{decimals}f}"
+    else:
+        formatted = f"{number:.{decimals}f}"
+    return f"{prefix}{formatted}{suffix}"
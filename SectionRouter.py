@@ -0,0 +1,77 @@
+import importlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from Tracing import propagate
+
+
+class SectionRouter:
+    """
+    Maps ACC URLs to the handlers that turn them into PDFs.
+
+    A section is registered with a URL pattern, a handler given as "module:function" (the
+    module is imported on the first request for that section) and the ACC data it depends on.
+    Dependencies are fetched concurrently before the handler runs and handed to it in the
+    request context, so a handler only builds the resources it actually needs.
+
+    Patterns are tried in registration order; the first match wins.
+    """
+
+    def __init__(self):
+        self.routes = []
+        self.handlers = {}
+
+    def register(self, name, pattern, handler, dependencies=None):
+        """
+        Adds a section.
+
+        Parameters:
+        - name: str, the section name ("Budgets", ...), also used for per-section limits and metrics.
+        - pattern: str regex searched for in the URL.
+        - handler: "module:function"; the function takes the request context and returns a result dict.
+        - dependencies: dict of context key to (ACC endpoint, response key). The endpoint is
+          formatted with the context (e.g. "{project_id}"), the response key is taken from the JSON.
+        """
+        self.routes.append({
+                "name": name,
+                "pattern": re.compile(pattern),
+                "handler": handler,
+                "dependencies": dependencies or {},
+        })
+
+    def match(self, url):
+        """Returns the route for a URL, or None."""
+        return next((route for route in self.routes if route["pattern"].search(url)), None)
+
+    def handler(self, route):
+        """Imports (once) and returns the route's handler function."""
+        if route["handler"] not in self.handlers:
+            module_name, function_name = route["handler"].split(":")
+            self.handlers[route["handler"]] = getattr(importlib.import_module(module_name), function_name)
+        return self.handlers[route["handler"]]
+
+    def prefetch(self, route, context, acc_api_factory):
+        """
+        Fetches the route's dependencies side by side.
+
+        Parameters:
+        - route: dict from match().
+        - context: dict the endpoints are formatted with.
+        - acc_api_factory: callable returning an ACCAPI, only called if there is something to fetch.
+
+        Returns:
+        - dict: the fetched data by context key. Raises if any fetch fails.
+        """
+        dependencies = route["dependencies"]
+        if not dependencies:
+            return {}
+        acc_api = acc_api_factory()
+
+        def fetch(item):
+            key, (endpoint, response_key) = item
+            return key, acc_api.call_api(endpoint.format(**context))[response_key]
+
+        if len(dependencies) == 1:
+            return dict(map(fetch, dependencies.items()))
+        with ThreadPoolExecutor(max_workers=len(dependencies)) as executor:
+            return dict(executor.map(propagate(fetch), dependencies.items()))
@@ -0,0 +1,148 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+# Where finished spans are written as JSON lines: a file path, "stdout", or empty for nowhere.
+TRACE_OUTPUT = os.getenv("TRACE_OUTPUT", "")
+
+# Recent traces kept in memory for GET /jobs/<id>/trace; 0 turns the local collector off.
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "200"))
+
+
+# The trace (a job id, or a request id outside jobs) and span the current code runs in.
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_span = contextvars.ContextVar("span", default=None)
+
+_output_lock = threading.Lock()
+
+
+class TraceCollector:
+    """Keeps the spans of the most recent traces in memory, oldest trace dropped first."""
+
+    def __init__(self, max_traces=TRACE_BUFFER):
+        self.max_traces = max_traces
+        self.traces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, span):
+        if not self.max_traces:
+            return
+        with self.lock:
+            self.traces.setdefault(span["trace_id"], []).append(span)
+            self.traces.move_to_end(span["trace_id"])
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+
+    def get(self, trace_id):
+        """Returns the trace's finished spans in start order, or None if it is unknown."""
+        with self.lock:
+            spans = self.traces.get(trace_id)
+            return sorted(spans, key=lambda span: span["start"]) if spans is not None else None
+
+
+collector = TraceCollector()
+
+
+def current_trace_id():
+    """Returns the id of the trace the caller runs in, or None."""
+    return _trace_id.get()
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def trace(trace_id=None):
+    """Runs the enclosed block in a trace, a new one unless trace_id (e.g. the job id) is given."""
+    token = _trace_id.set(trace_id or new_id())
+    span_token = _span.set(None)
+    try:
+        yield _trace_id.get()
+    finally:
+        _span.reset(span_token)
+        _trace_id.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the enclosed block as a span of the current trace and emits it when it ends.
+
+    Spans nest: a span opened inside another becomes its child. Outside a trace the span
+    starts a trace of its own. The span dict is yielded so the block can add attributes
+    (rows written, PDF size, ...); set_attribute() does the same for the innermost span.
+    Exceptions are recorded on the span and re-raised.
+    """
+    parent = _span.get()
+    trace_id = _trace_id.get()
+    trace_token = _trace_id.set(new_id()) if trace_id is None else None
+    current = {
+            "trace_id": _trace_id.get(),
+            "span_id": new_id()[:16],
+            "parent_id": parent["span_id"] if parent else None,
+            "name": name,
+            "start": time.time(),
+            "duration_ms": None,
+            "status": "ok",
+            "thread": threading.current_thread().name,
+            "attributes": dict(attributes),
+    }
+    token = _span.set(current)
+    started_at = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current["status"] = "error"
+        current["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current["duration_ms"] = round((time.perf_counter() - started_at) * 1000, 3)
+        _span.reset(token)
+        if trace_token is not None:
+            _trace_id.reset(trace_token)
+        _emit(current)
+
+
+def set_attribute(key, value):
+    """Adds an attribute to the innermost open span; a no-op outside spans."""
+    current = _span.get()
+    if current is not None:
+        current["attributes"][key] = value
+
+
+def propagate(fn):
+    """
+    Wraps fn so it runs in the caller's trace when called from another thread
+    (executor.submit(propagate(fn), ...)). Every call gets its own copy of the context.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def _emit(finished):
+    collector.add(finished)
+    if not TRACE_OUTPUT:
+        return
+    line = json.dumps(finished, default=str, ensure_ascii=False)
+    try:
+        with _output_lock:
+            if TRACE_OUTPUT == "stdout":
+                sys.stdout.write(line + "\n")
+            else:
+                with open(TRACE_OUTPUT, "a", encoding="utf-8") as trace_file:
+                    trace_file.write(line + "\n")
+    except OSError as e:
+        print(f"Could not write span {finished['name']}: {e}")
@@ -0,0 +1,318 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from Metrics import registry
+
+
+# "thread" runs jobs in the worker threads, "process" hands them to a process pool
+# (for CPU-heavy rendering that should not share the GIL with the web server).
+WORKER_MODE = os.getenv("WORKER_MODE", "thread")
+
+# Number of jobs processed at the same time.
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "4"))
+
+# Per-section caps on concurrent jobs, e.g. "Costs=2,Forms=1"; unlisted sections only share WORKER_COUNT.
+SECTION_CONCURRENCY = os.getenv("SECTION_CONCURRENCY", "")
+
+# Share of the workers each priority class gets while several are waiting.
+PRIORITY_WEIGHTS = os.getenv("PRIORITY_WEIGHTS", "interactive=8,batch=2,background=1")
+
+PRIORITY_CLASSES = ("interactive", "batch", "background")
+
+# Jobs that may wait for a worker at once; further submissions are refused. 0 means unbounded.
+QUEUE_CAPACITY = int(os.getenv("QUEUE_CAPACITY", "50"))
+
+
+jobs_total = registry.counter("pdf_jobs_total", "Jobs processed by the worker pool.", labels=("section", "priority", "status"))
+job_queue_wait_seconds = registry.histogram("pdf_job_queue_wait_seconds", "Time jobs waited for a worker.", labels=("section", "priority"))
+job_processing_seconds = registry.histogram("pdf_job_processing_seconds", "Time workers spent on a job.", labels=("section",))
+
+
+class QueueFull(Exception):
+    """Raised by WorkerPool.submit() when the queue is at capacity."""
+
+    def __init__(self, capacity, retry_after):
+        super().__init__(f"Queue is full ({capacity} jobs waiting)")
+        self.capacity = capacity
+        # Seconds until a slot is likely to free up.
+        self.retry_after = retry_after
+
+
+class ShuttingDown(QueueFull):
+    """Raised by WorkerPool.submit() once the pool is draining for shutdown."""
+
+    def __init__(self, retry_after):
+        Exception.__init__(self, "Server is shutting down")
+        self.capacity = 0
+        self.retry_after = retry_after
+
+
+def parse_section_limits(value):
+    """Parses "name=number,..." (section limits, priority weights) into a dict."""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            section, limit = item.split("=", 1)
+            limits[section.strip()] = max(1, int(limit))
+    return limits
+
+
+class WorkerPool:
+    """
+    Runs queued jobs on a pool of workers, with priority classes and optional per-section
+    concurrency limits.
+
+    Jobs are picked with weighted fair queuing across the classes in PRIORITY_CLASSES: every
+    job gets a virtual finish tag that grows by 1/weight within its class and the smallest tag
+    runs next. A newly waiting interactive job therefore goes ahead of a batch backlog at the
+    next job boundary, while batch and background work still get their share under load.
+
+    A job whose section is at its limit is parked rather than holding a worker, so other
+    sections keep moving. Every result is tagged with how long the job waited in the queue
+    and how long it took to process.
+
+    At most capacity jobs wait at once, and a job whose deadline has passed by the time a
+    worker picks it up is dropped unprocessed: nobody is waiting for its answer any more.
+    """
+
+    def __init__(self, workers=WORKER_COUNT, mode=WORKER_MODE, section_limits=None, weights=None, capacity=QUEUE_CAPACITY):
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.capacity = capacity
+        self.section_limits = parse_section_limits(SECTION_CONCURRENCY) if section_limits is None else section_limits
+        self.weights = {priority: 1 for priority in PRIORITY_CLASSES}
+        self.weights.update(parse_section_limits(PRIORITY_WEIGHTS) if weights is None else weights)
+        self.queues = {priority: deque() for priority in self.weights}
+        self.class_finish = {priority: 0.0 for priority in self.weights}
+        self.virtual_time = 0.0
+        self.condition = threading.Condition()
+        self.running = {}
+        self.parked = {}
+        self.executor = None
+        self.threads = []
+        self.stats = {}
+        self.class_stats = {priority: {"jobs": 0, "queue_wait_s": 0.0, "max_queue_wait_s": 0.0} for priority in self.weights}
+        self.shed = {"rejected": 0, "expired": 0}
+        self.draining = False
+
+    def start(self):
+        """Starts the worker threads (and the process pool in process mode)."""
+        if self.threads:
+            return self
+        if self.mode == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"pdf-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"Worker pool started: {self.workers} {self.mode} workers, section limits "
+              f"{self.section_limits or 'none'}, priority weights {self.weights}")
+        return self
+
+    def submit(self, fn, data, section=None, on_start=None, priority="interactive", deadline=None):
+        """
+        Queues fn(data) and returns a Future for its result dict.
+        The dict gets "queue_wait_ms" and "processing_ms" added.
+        In process mode fn and data must be picklable (fn defined at module level).
+        on_start, if given, is called without arguments when a worker picks the job up.
+        priority is one of PRIORITY_CLASSES.
+        deadline, if given, is called without arguments when a worker picks the job up and
+        returns the time.monotonic() after which the result is no longer wanted, or None.
+        Raises QueueFull when capacity jobs are already waiting, ShuttingDown after drain().
+        """
+        if priority not in self.queues:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        job = {
+                "fn": fn,
+                "data": data,
+                "section": section,
+                "priority": priority,
+                "future": Future(),
+                "queued_at": time.monotonic(),
+                "on_start": on_start,
+                "deadline": deadline,
+        }
+        with self.condition:
+            # Checked and queued under one lock, so concurrent submissions cannot overshoot capacity.
+            if self.draining:
+                raise ShuttingDown(self.retry_after())
+            if self.capacity and self.queue_size() >= self.capacity:
+                self.shed["rejected"] += 1
+                raise QueueFull(self.capacity, self.retry_after())
+            job["tag"] = max(self.virtual_time, self.class_finish[priority]) + 1 / self.weights[priority]
+            self.class_finish[priority] = job["tag"]
+            self.queues[priority].append(job)
+            self.condition.notify()
+        return job["future"]
+
+    def promote(self, future, priority):
+        """
+        Moves a waiting job (by its Future) to another priority class, at the back of that
+        class's queue. Returns False if the job is no longer waiting.
+        """
+        with self.condition:
+            for jobs in self.queues.values():
+                job = next((job for job in jobs if job["future"] is future), None)
+                if job is not None:
+                    jobs.remove(job)
+                    job["priority"] = priority
+                    job["tag"] = max(self.virtual_time, self.class_finish[priority]) + 1 / self.weights[priority]
+                    self.class_finish[priority] = job["tag"]
+                    self.queues[priority].append(job)
+                    return True
+            for parked in self.parked.values():
+                job = next((job for job in parked if job["future"] is future), None)
+                if job is not None:
+                    # Re-queued into its new class once its section has a free slot.
+                    job["priority"] = priority
+                    return True
+        return False
+
+    def queue_size(self):
+        """Jobs waiting for a worker, including parked ones."""
+        with self.condition:
+            return sum(len(jobs) for jobs in self.queues.values()) + sum(len(parked) for parked in self.parked.values())
+
+    def drain(self, timeout=None):
+        """
+        Stops taking new jobs and waits until the queued and running ones have finished.
+
+        Parameters:
+        - timeout: seconds to wait at most, None to wait for as long as it takes.
+
+        Returns:
+        - bool: True if every job finished, False if the timeout ran out first.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            self.draining = True
+            while self.queue_size() or sum(self.running.values()):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    print(f"Worker pool drain timed out with {self.queue_size()} queued and "
+                          f"{sum(self.running.values())} running jobs")
+                    return False
+                self.condition.wait(remaining)
+        if self.executor:
+            self.executor.shutdown()
+        print("Worker pool drained")
+        return True
+
+    def retry_after(self):
+        """Estimated seconds until the current queue has drained, from the average job time."""
+        with self.condition:
+            jobs = sum(stats["jobs"] for stats in self.stats.values())
+            processing = sum(stats["processing_s"] for stats in self.stats.values())
+        average = processing / jobs if jobs else 1.0
+        return max(1, math.ceil(average * self.queue_size() / self.workers))
+
+    def busy(self):
+        """Number of workers currently processing a job."""
+        with self.condition:
+            return sum(self.running.values())
+
+    def queue_depths(self):
+        """Waiting jobs per priority class, including parked ones."""
+        with self.condition:
+            depths = {priority: len(jobs) for priority, jobs in self.queues.items()}
+            for parked in self.parked.values():
+                for job in parked:
+                    depths[job["priority"]] += 1
+            return depths
+
+    def _next_job(self):
+        """
+        Blocks until a job can run and returns the one with the smallest finish tag, counted
+        as running in its section. Jobs whose section is at its limit are parked on the way,
+        all under one lock, so a job is always either queued, parked or running (drain() relies on it).
+        """
+        with self.condition:
+            while True:
+                while not any(self.queues.values()):
+                    self.condition.wait()
+                priority = min((jobs[0]["tag"], priority) for priority, jobs in self.queues.items() if jobs)[1]
+                job = self.queues[priority].popleft()
+                self.virtual_time = max(self.virtual_time, job["tag"])
+                section = job["section"]
+                limit = self.section_limits.get(section)
+                if limit is not None and self.running.get(section, 0) >= limit:
+                    self.parked.setdefault(section, deque()).append(job)
+                    continue
+                self.running[section] = self.running.get(section, 0) + 1
+                return job
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            section = job["section"]
+            # The deadline callable may take its caller's locks, so it is asked outside the pool's.
+            deadline = job["deadline"]() if job["deadline"] else None
+            if deadline is not None and time.monotonic() > deadline:
+                self._leave(section)
+                self._expire(job)
+                continue
+
+            started_at = time.monotonic()
+            try:
+                if job["on_start"]:
+                    job["on_start"]()
+                if self.executor:
+                    result = self.executor.submit(job["fn"], job["data"]).result()
+                else:
+                    result = job["fn"](job["data"])
+            except Exception as e:
+                print(f"Error processing request: {str(e)}")
+                result = {"error": str(e), "status_code": 500}
+            finally:
+                self._leave(section)
+            finished_at = time.monotonic()
+
+            wait = started_at - job["queued_at"]
+            if isinstance(result, dict):
+                result["queue_wait_ms"] = round(wait * 1000)
+                result["processing_ms"] = round((finished_at - started_at) * 1000)
+            self._record(job, wait, finished_at - started_at)
+            status = result.get("status_code", 200) if isinstance(result, dict) else 500
+            jobs_total.inc(section=section or "none", priority=job["priority"], status=status)
+            job_queue_wait_seconds.observe(wait, section=section or "none", priority=job["priority"])
+            job_processing_seconds.observe(finished_at - started_at, section=section or "none")
+            print(f"{section or 'Job'} ({job['priority']}) waited {wait * 1000:.0f} ms in queue, "
+                  f"processed in {(finished_at - started_at) * 1000:.0f} ms")
+            job["future"].set_result(result)
+
+    def _expire(self, job):
+        wait = time.monotonic() - job["queued_at"]
+        with self.condition:
+            self.shed["expired"] += 1
+            self.condition.notify_all()
+        print(f"Dropping {job['section'] or 'job'} ({job['priority']}) after {wait * 1000:.0f} ms in queue: "
+              f"its deadline has passed")
+        job["future"].set_result({"error": "Request deadline passed before processing started",
+                                  "status_code": 503, "queue_wait_ms": round(wait * 1000), "processing_ms": 0})
+
+    def _leave(self, section):
+        with self.condition:
+            self.running[section] -= 1
+            parked = self.parked.get(section)
+            if parked:
+                # Hand the freed slot to the oldest parked job of this section, keeping its
+                # original finish tag so it does not lose its place.
+                job = parked.popleft()
+                self.queues[job["priority"]].appendleft(job)
+            # Wakes a worker for a re-queued job, and drain() waiting for the last one.
+            self.condition.notify_all()
+
+    def _record(self, job, wait, processing):
+        with self.condition:
+            stats = self.stats.setdefault(job["section"], {"jobs": 0, "queue_wait_s": 0.0, "processing_s": 0.0})
+            stats["jobs"] += 1
+            stats["queue_wait_s"] += wait
+            stats["processing_s"] += processing
+            class_stats = self.class_stats[job["priority"]]
+            class_stats["jobs"] += 1
+            class_stats["queue_wait_s"] += wait
+            class_stats["max_queue_wait_s"] = max(class_stats["max_queue_wait_s"], wait)
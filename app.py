@@ -1,13 +1,24 @@
+import hashlib
+import hmac
+import io
 import json
+import multiprocessing
 import re
 import os
-import threading
-import queue
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, request, send_file, jsonify, url_for, g
 from ACCAPI import ACCAPI
-from trash.ACC_Smart_Forms import generate_smart_form
-from ExcelModifier import ExcelModifier
+from ExcelModifier import PDF_RENDERER, COMPACT_PDFS
+from ArtifactCache import ArtifactCache
+from WorkerPool import WorkerPool, QueueFull, ShuttingDown
+from JobBroker import JOB_TRANSPORT, BrokerPool
+from JobStore import JobStore, report_progress
+from Metrics import registry, mark_startup
+from SectionRouter import SectionRouter
+from Tracing import collector, new_id, span
+from sections_functions.cost import extract_cost_id
 from flask_cors import CORS
 
 
@@ -20,9 +31,97 @@ def pretty_print_json(data):
 app = Flask(__name__)
 CORS(app)
 
-# Thread-safe queue to store incoming requests
-request_queue = queue.Queue()
-lock = threading.Lock()
+# Pool of workers processing /generate-pdf requests (see WorkerPool for the settings), or with
+# JOB_TRANSPORT=sqlite the worker.py nodes behind the job broker (see JobBroker)
+worker_pool = BrokerPool() if JOB_TRANSPORT == "sqlite" else WorkerPool()
+
+# PDF generation jobs and their retained results (see JobStore for the settings)
+job_store = JobStore(worker_pool)
+
+# Also keep a copy of every generated PDF in modified_files (PDFs are otherwise only held in memory).
+PERSIST_PDFS = os.getenv("PERSIST_PDFS", "false").lower() == "true"
+
+# Generated PDFs by input fingerprint, served with ETag/Last-Modified (see ArtifactCache for the settings)
+artifact_cache = ArtifactCache("modified_files")
+
+# Seconds a /generate-pdf caller is assumed to wait; clients can send a shorter X-Request-Timeout.
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "120"))
+
+# Secret of the ACC (APS) webhook subscription; when set, events must carry its x-adsk-signature.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# ACC cost events that regenerate the payment's cover sheet in the background.
+WEBHOOK_EVENTS = {event.strip() for event in os.getenv(
+        "WEBHOOK_EVENTS", "payment.created-1.0,payment.updated-1.0,payment.statusChanged-1.0").split(",") if event.strip()}
+
+# Start the job workers on import; worker.py turns this off, it only runs the jobs.
+START_WORKER_POOL = os.getenv("START_WORKER_POOL", "true").lower() == "true"
+
+
+def client_deadline(default=None):
+    """
+    Returns the time.monotonic() after which the client stops waiting: X-Request-Timeout
+    seconds from now, capped at default. None if neither is set.
+    """
+    timeout = default
+    header = request.headers.get("X-Request-Timeout")
+    if header:
+        try:
+            timeout = float(header) if default is None else min(float(header), default)
+        except ValueError:
+            pass
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+def queue_full_response(error):
+    """
+    Answer with Retry-After for a request the worker pool had no room for: 429 while the queue
+    is at capacity, 503 once the server is shutting down.
+    """
+    print(f"Rejecting request: {error}")
+    headers = {"Retry-After": str(error.retry_after)}
+    if isinstance(error, ShuttingDown):
+        return jsonify({"error": "Server is shutting down, try again later."}), 503, headers
+    return jsonify({"error": "Server is busy, try again later."}), 429, headers
+
+
+def request_fingerprint(key):
+    """Fingerprint of a request's coalescing key plus the settings that change the PDF."""
+    return artifact_cache.fingerprint(key, settings=(PDF_RENDERER, COMPACT_PDFS))
+
+
+def extract_project_id(url):
+    """Returns the ACC project id in a URL, or None."""
+    match = re.search(r"projects/([a-f0-9-]{36})", url)
+    return match.group(1) if match else None
+
+
+def coalescing_key(data):
+    """
+    Normalises a request to what it actually renders, so duplicates (double clicks, several
+    people opening the same payment) share one job. Differences in the rest of the URL,
+    such as tracking parameters or the way the payment is selected, do not matter.
+    """
+    url = data.get('url') or ""
+    section = detect_section(url)
+    cost_id = extract_cost_id(url) if section == "Costs" else None
+    return (extract_project_id(url), section, cost_id, bool(data.get('all_payments')))
+
+
+# ACC sections by URL pattern, tried in order. Handlers are imported on the first request
+# for their section; the ACC data they declare is fetched concurrently beforehand.
+section_router = SectionRouter()
+# Budgets pages through ACC itself while it writes, so it declares no dependencies.
+section_router.register("Budgets", r"/budget", "sections_functions.budget:export_budgets")
+section_router.register("Costs", r"/cost/cost", "sections_functions.cost:export_cost_cover")
+section_router.register("Forms", r"/forms", "sections_functions.forms:export_forms",
+                        dependencies={"forms": ("construction/forms/v1/projects/{project_id}/forms", "data")})
+
+
+def detect_section(url):
+    """Returns the name of the ACC section a URL points to ("Budgets", "Costs", "Forms"), or None."""
+    route = section_router.match(url)
+    return route["name"] if route else None
 
 
 def process_request(data):
@@ -34,119 +133,64 @@ def process_request(data):
     print(f"Processing request for URL: {url}")
 
     # Extract Project ID using regex
-    project_id = None
-    pattern = r"projects/([a-f0-9-]{36})"
-    match = re.search(pattern, url)
-    if match:
-        project_id = match.group(1)
-    else:
+    project_id = extract_project_id(url)
+    if project_id is None:
         return {"error": "Project ID not found in the URL", "status_code": 400}
 
-    # Detect the section in the URL
-    section = None
-    if "/budget" in url:
-        section = "Budgets"
-    elif "/cost/cost" in url:
-        section = "Costs"
-    elif "/forms" in url:
-        section = "Forms"
-    else:
+    # Find the section handler for the URL
+    route = section_router.match(url)
+    if route is None:
         return {"error": "Unrecognized section in URL", "status_code": 400}
 
-    # Fetch data based on the section
-    acc_api = ACCAPI()
+    context = {"url": url, "project_id": project_id, "data": data, "persist_pdfs": PERSIST_PDFS}
+
+    # Fetch the data the section depends on
+    report_progress("fetching", 10)
     try:
-        print(f"Fetching data for {section} section...")
-        if section == "Budgets":
-            response = acc_api.call_api(f"cost/v1/containers/{project_id}/budgets")["results"]
-        elif section == "Costs":
-            response = acc_api.call_api(f"cost/v1/containers/{project_id}/contracts")["results"]
-        elif section == "Forms":
-            response = acc_api.call_api(f"construction/forms/v1/projects/{project_id}/forms")["data"]
+        print(f"Fetching data for {route['name']} section...")
+        with span("prefetch", section=route["name"], dependencies=len(route["dependencies"])):
+            context.update(section_router.prefetch(route, context, ACCAPI))
     except Exception as e:
         print(f"Failed to fetch data: {str(e)}")
         return {"error": f"Failed to fetch data: {str(e)}", "status_code": 500}
 
-    # Create and modify Excel file based on the section data
-    excel_modifier = ExcelModifier(template_filename="templates/template.xlsx", modified_folder="modified_files")
     try:
-        excel_modifier.open_workbook()
-
-        # Add headers and data to the Excel file based on the section
-        if section == "Budgets":
-            headers = ["Formatted Code", "Unit Price", "Original Amount"]
-            # for col, header in enumerate(headers, start=1):
-            #     excel_modifier.modify_cell(f"{chr(64 + col)}1", header)
-            
-            pretty_print_json(response)
-
-            for i, budget in enumerate(response, start=11):
-                excel_modifier.modify_cell(f'D{i}', budget['unitPrice'])
-                
-
-        elif section == "Costs":
-            print("Costs section")
-            from sections_functions.cost import print_cost_cover
-            pdf_path = print_cost_cover(project_id=project_id, url=url)
-            return {"pdf_path": pdf_path, "status_code": 200}
-
-        elif section == "Forms":
-            headers = ["Form Id", "Form Name", "Status"]
-            for col, header in enumerate(headers, start=1):
-                excel_modifier.modify_cell(f"{chr(64 + col)}1", header)
-
-            for i, form in enumerate(response, start=2):
-                excel_modifier.modify_cell(f'A{i}', form['id'])
-                excel_modifier.modify_cell(f'B{i}', form['name'])
-                excel_modifier.modify_cell(f'C{i}', form['status'])
-
-        # excel_modifier.auto_fit_columns()
-        # excel_modifier.add_gridlines()
-
-        # Save Excel file and export to PDF
-        excel_modifier.save_workbook(filename='output.xlsx')
-        pdf_path = excel_modifier.export_to_pdf(filename='output.pdf')
-        print(f"PDF file generated: {pdf_path}")
-
-        # Return the generated PDF path
-        return {"pdf_path": pdf_path, "status_code": 200}
+        with span("handler", section=route["name"], url=url, project_id=project_id):
+            return section_router.handler(route)(context)
     except Exception as e:
         print(f"Failed to process request: {str(e)}")
         return {"error": f"Failed to process request: {str(e)}", "status_code": 500}
 
-    finally:
-        excel_modifier.close_workbook()
-
-def worker():
-    """Background thread that processes requests from the queue."""
-    while True:
-        request_data, response_queue = request_queue.get()
-        with app.app_context():  # Add application context here
-            try:
-                response = process_request(request_data)
-                response_queue.put(response)
-            except Exception as e:
-                print(f"Error processing request: {str(e)}")
-                response_queue.put({"error": str(e), "status_code": 500})
-            finally:
-                request_queue.task_done()
-
-@app.route('/generate-pdf', methods=['POST'])
-def generate_pdf():
-    data = request.get_json()
-
-    # Response queue to get the result from the background thread
-    response_queue = queue.Queue()
-
-    # Add the request to the queue
-    
-    request_queue.put((data, response_queue))
-
-    response = response_queue.get()
-
-    # Send the PDF file if processing is successful
-    print("Response: ", response)
-    if "pdf_path" in response:
+def send_artifact(pdf_path, fingerprint, headers=None):
+    """
+    Sends a cached PDF with its fingerprint as ETag and its creation time as Last-Modified;
+    conditional GETs for an unchanged PDF get a 304 without a body.
+    """
+    pdf_file = send_file(pdf_path, as_attachment=True, download_name="output.pdf", mimetype="application/pdf",
+                         conditional=True, etag=fingerprint, last_modified=os.path.getmtime(pdf_path))
+    # Clients may keep the PDF but have to revalidate before reusing it.
+    pdf_file.headers["Cache-Control"] = "private, no-cache"
+    pdf_file.headers.update(headers or {})
+    return pdf_file
+
+
+def pdf_response(response, fingerprint=None):
+    """
+    Turns a worker result dict into the PDF download, or a JSON error.
+    With a fingerprint the PDF is stored in the artifact cache and sent from there.
+    """
+    print("Response: ", {key: value for key, value in response.items() if key != "pdf_bytes"})
+    timing_headers = {
+            "X-Queue-Wait-Ms": str(response.get("queue_wait_ms", 0)),
+            "X-Processing-Ms": str(response.get("processing_ms", 0)),
+    }
+    if "pdf_bytes" in response and fingerprint:
+        return send_artifact(artifact_cache.put(fingerprint, response["pdf_bytes"]), fingerprint, timing_headers)
+    elif "pdf_bytes" in response:
+        pdf_file = send_file(io.BytesIO(response["pdf_bytes"]), as_attachment=True, download_name="output.pdf", mimetype="application/pdf")
+        pdf_file.headers.update(timing_headers)
+        return pdf_file
+    elif "pdf_path" in response:
         pdf_path = response["pdf_path"]
         
         print(pdf_path)
@@ -156,28 +200,262 @@ def generate_pdf():
         # pdf_path = os.path.normpath(pdf_path)
 
         if os.path.exists(pdf_path):
-            return send_file(pdf_path, as_attachment=True, download_name="output.pdf", mimetype="application/pdf")
+            pdf_file = send_file(pdf_path, as_attachment=True, download_name="output.pdf", mimetype="application/pdf")
+            pdf_file.headers.update(timing_headers)
+            return pdf_file
         else:
-            return jsonify({"error": "PDF generation failed."}), 500
+            return jsonify({"error": "PDF generation failed."}), 500, timing_headers
     else:
-        return jsonify({"error": response.get("error", "Unknown error")}), response.get("status_code", 500)
+        return jsonify({"error": response.get("error", "Unknown error")}), response.get("status_code", 500), timing_headers
+
+
+@app.route('/generate-pdf', methods=['GET', 'POST'])
+def generate_pdf():
+    """
+    Synchronous wrapper around the job API: submits a job and waits for its PDF.
+
+    A PDF generated for the same inputs within ARTIFACT_CACHE_TTL is served from the artifact
+    cache; GET requests (?url=...) can revalidate it with If-None-Match / If-Modified-Since.
+    "refresh" forces a new render.
+    """
+    data = request.get_json() if request.method == 'POST' else request.args.to_dict()
+    key = coalescing_key(data)
+    fingerprint = request_fingerprint(key)
+    if not data.get('refresh'):
+        cached_path = artifact_cache.get(fingerprint)
+        if cached_path:
+            print(f"Serving cached PDF {fingerprint}")
+            return send_artifact(cached_path, fingerprint)
+
+    section = detect_section(data.get('url') or "")
+    deadline = client_deadline(REQUEST_TIMEOUT)
+    try:
+        job = job_store.submit(process_request, data, section=section, key=key, deadline=deadline, request_id=g.request_id)
+    except QueueFull as e:
+        return queue_full_response(e)
+    try:
+        response = job_store.wait(job, timeout=max(0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        # The job keeps running; its PDF can still be fetched through the job API.
+        status_url = url_for('job_status', job_id=job["id"])
+        return jsonify({"error": "PDF generation is taking too long.", "status_url": status_url}), 504, {"Location": status_url}
+    return pdf_response(response, fingerprint)
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queues a PDF generation job and returns its id right away."""
+    data = request.get_json(silent=True) or {}
+    if not data.get('url'):
+        return jsonify({"error": "URL not provided"}), 400
+    try:
+        job = job_store.submit(process_request, data, section=detect_section(data['url']), key=coalescing_key(data),
+                               deadline=client_deadline(), request_id=g.request_id)
+    except QueueFull as e:
+        return queue_full_response(e)
+    status_url = url_for('job_status', job_id=job["id"])
+    return jsonify({
+            "job_id": job["id"],
+            "state": job["state"],
+            "status_url": status_url,
+            "result_url": url_for('job_result', job_id=job["id"]),
+    }), 202, {"Location": status_url}
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job_store.describe(job))
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    if job["state"] in ("queued", "running"):
+        return jsonify(job_store.describe(job)), 409
+    result = job["result"] or {}
+    if job["state"] == "done" and "pdf_bytes" not in result and "pdf_path" not in result:
+        # Jobs without a PDF (the equipment reports batch) answer with their outcome.
+        return jsonify(job_store.describe(job)), result.get("status_code", 200)
+    fingerprint = request_fingerprint(job["key"])
+    cached_path = artifact_cache.get(fingerprint)
+    if cached_path:
+        return send_artifact(cached_path, fingerprint)
+    return pdf_response(job["result"], fingerprint)
+
+
+@app.route('/jobs/<job_id>/trace', methods=['GET'])
+def job_trace(job_id):
+    """
+    The spans recorded for a job so far, in start order: queue wait, ACC calls, template,
+    filling, saving and conversion, each with its duration and attributes. Only jobs run in
+    this process are collected (not with WORKER_MODE=process; use TRACE_OUTPUT there).
+    """
+    spans = collector.get(job_id)
+    if spans is None and job_store.get(job_id) is None:
+        return jsonify({"error": "Trace not found or expired"}), 404
+    return jsonify({"trace_id": job_id, "spans": spans or []})
+
+
+def valid_webhook_signature(body, signature):
+    """Checks an x-adsk-signature header ("sha1hash=<hex HMAC-SHA1 of the body>")."""
+    expected = "sha1hash=" + hmac.new(WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def store_pregenerated(fingerprint, future):
+    """Done callback of a webhook job: keeps its PDF in the artifact cache for the next request."""
+    result = future.result()
+    if isinstance(result, dict) and result.get("pdf_bytes"):
+        artifact_cache.put(fingerprint, result["pdf_bytes"])
+        print(f"Pre-generated PDF {fingerprint}")
+
+
+@app.route('/webhooks/acc', methods=['POST'])
+def acc_webhook():
+    """
+    Receives ACC cost payment events (WEBHOOK_EVENTS) and regenerates the payment's cover
+    sheet as a background job, so whoever opens it next is served a ready PDF.
+
+    The payment's cached PDFs are discarded right away, as they no longer match ACC. An
+    event attaches to a queued render of the same cover, never to one already running (it
+    may have read ACC before the change). Events that are not handled are acknowledged with
+    200, as ACC retries and eventually disables hooks that fail.
+    """
+    if WEBHOOK_SECRET and not valid_webhook_signature(request.get_data(), request.headers.get("x-adsk-signature", "")):
+        return jsonify({"error": "Invalid signature"}), 401
+    event = request.get_json(silent=True) or {}
+    event_name = (event.get("hook") or {}).get("event")
+    if event_name not in WEBHOOK_EVENTS:
+        return jsonify({"status": "ignored", "event": event_name}), 200
+
+    payload = event.get("payload") or {}
+    project_id = str(payload.get("containerId") or payload.get("projectId") or "").removeprefix("b.")
+    payment_id = payload.get("id")
+    if not project_id or not payment_id:
+        return jsonify({"error": "Event has no project or payment id"}), 400
+    print(f"ACC event {event_name} for payment {payment_id}")
+
+    data = {"url": f"https://acc.autodesk.com/build/cost/projects/{project_id}/cost/cost?preview={payment_id}"}
+    key = coalescing_key(data)
+    fingerprint = request_fingerprint(key)
+    # Every cached PDF showing the payment: its own cover, alone or as "all_payments", and the
+    # covers of the latest period, which a cost URL without a payment id prints.
+    period_data = {"url": f"https://acc.autodesk.com/build/cost/projects/{project_id}/cost/cost"}
+    for stale in (data, {**data, "all_payments": True}, period_data, {**period_data, "all_payments": True}):
+        artifact_cache.discard(request_fingerprint(coalescing_key(stale)))
+    try:
+        job = job_store.submit(process_request, data, section="Costs", key=key, priority="background",
+                               request_id=g.request_id, attach_running=False)
+    except QueueFull as e:
+        return queue_full_response(e)
+    if not job.get("pregenerate"):
+        # Once per job, however many events attach to it.
+        job["pregenerate"] = True
+        job["future"].add_done_callback(lambda future: store_pregenerated(fingerprint, future))
+    status_url = url_for('job_status', job_id=job["id"])
+    return jsonify({"status": "queued", "job_id": job["id"], "status_url": status_url}), 202, {"Location": status_url}
+
+
+def run_equipment_forms(data):
+    """Worker entry point for the equipment reports batch."""
+    # Imported here: it pulls in pandas, which no other request needs.
+    from trash.ACC_Smart_Forms import generate_smart_form
+    generate_smart_form()
+    return {"status_code": 200}
 
 
 @app.route('/generate-equipment-form', methods=['GET'])
 def generate_equipment_form():
-    smart_form_object = generate_smart_form()
-    
-    return "Equipment form generated successfully! Might take a while to reflect in the ACC."
-
+    # Runs as a batch job so it cannot starve interactive PDF requests; repeated triggers
+    # while it is still queued or running attach to the same job.
+    try:
+        job = job_store.submit(run_equipment_forms, {}, section="Equipment", key=("equipment-forms",), priority="batch",
+                               request_id=g.request_id)
+    except QueueFull as e:
+        return queue_full_response(e)
+    status_url = url_for('job_status', job_id=job["id"])
+    return jsonify({
+            "message": "Equipment form generation queued. Might take a while to reflect in the ACC.",
+            "job_id": job["id"],
+            "state": job["state"],
+            "status_url": status_url,
+            "result_url": url_for('job_result', job_id=job["id"]),
+    }), 202, {"Location": status_url}
+
+
+@app.route('/queue-stats', methods=['GET'])
+def queue_stats():
+    """Queue depth and wait times per priority class."""
+    return jsonify({
+            "depth": worker_pool.queue_depths(),
+            "weights": worker_pool.weights,
+            "classes": worker_pool.class_stats,
+            "sections": worker_pool.stats,
+            "capacity": worker_pool.capacity,
+            "shed": worker_pool.shed,
+    })
+
+
+
+http_requests_total = registry.counter("http_requests_total", "HTTP requests answered.", labels=("endpoint", "method", "status"))
+http_request_seconds = registry.histogram("http_request_duration_seconds", "Time to answer HTTP requests.", labels=("endpoint",))
+
+registry.collect("pdf_queue_depth", "Jobs waiting for a worker.", worker_pool.queue_depths, labels=("priority",))
+registry.collect("pdf_workers_busy", "Workers processing a job.", worker_pool.busy)
+registry.collect("pdf_workers", "Workers in the pool.", lambda: worker_pool.workers)
+registry.collect("pdf_worker_utilization", "Share of the workers processing a job.", lambda: worker_pool.busy() / worker_pool.workers)
+registry.collect("pdf_jobs_shed_total", "Jobs refused because the queue was full or dropped after their deadline.",
+                 lambda: {(reason,): count for reason, count in worker_pool.shed.items()}, type_="counter", labels=("reason",))
+registry.collect("pdf_jobs_coalesced_total", "Submissions attached to an identical unfinished job.",
+                 lambda: job_store.stats["coalesced"], type_="counter")
+registry.collect("artifact_cache_requests_total", "Artifact cache lookups.",
+                 lambda: {("hit",): artifact_cache.stats["hits"], ("miss",): artifact_cache.stats["misses"]}, type_="counter", labels=("result",))
+registry.collect("artifact_cache_hit_ratio", "Share of artifact cache lookups served from the cache.",
+                 lambda: artifact_cache.stats["hits"] / max(1, artifact_cache.stats["hits"] + artifact_cache.stats["misses"]))
+registry.collect("artifact_cache_evicted_bytes_total", "Bytes evicted from the output folder.",
+                 lambda: artifact_cache.stats["evicted_bytes"], type_="counter")
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    # Correlation id of the request, taken from the caller (a proxy, the add-in) if it sends one.
+    g.request_id = request.headers.get("X-Request-Id") or new_id()
+
+
+@app.after_request
+def record_request_metrics(response):
+    response.headers["X-Request-Id"] = g.get("request_id", "")
+    endpoint = request.endpoint or "unknown"
+    http_requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if "request_started_at" in g:
+        http_request_seconds.observe(time.perf_counter() - g.request_started_at, endpoint=endpoint)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, job, stage, queue and cache metrics in the Prometheus text format."""
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 
 @app.route('/health_check_upstream1')
 def health_check():
+    if worker_pool.draining:
+        return "Server is shutting down.", 503
+    mark_startup("first_healthy_response")
     return "Server is up and running!"
 
 
-# Start the worker thread
-threading.Thread(target=worker, daemon=True).start()
+# Start the workers (not again inside the pool's own worker processes, nor on worker.py nodes)
+if multiprocessing.parent_process() is None and START_WORKER_POOL:
+    worker_pool.start()
 
+# Development server; production deployments run serve.py
 if __name__ == '__main__':
     app.run(debug=True, port=8000, host="0.0.0.0")
@@ -2,11 +2,13 @@
 
 
 a = Analysis(
-    ['app.py'],
+    ['serve.py'],
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('modified_files', 'modified_files')],
-    hiddenimports=['flask', 'threading', 'queue', 'os', 'json', 're'],
+    hiddenimports=['flask', 'threading', 'queue', 'os', 'json', 're', 'app', 'waitress', 'trash.ACC_Smart_Forms',
+                   # Section handlers are imported by name on their first request (see SectionRouter)
+                   'sections_functions.budget', 'sections_functions.forms', 'sections_functions.cost'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
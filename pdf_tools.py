@@ -0,0 +1,183 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zlib
+from contextlib import ExitStack
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import IndirectObject, NameObject
+
+
+# Ghostscript binary used by compact_pdf(); without it a lossless pypdf pass is used instead.
+GHOSTSCRIPT = os.getenv("GHOSTSCRIPT", "gswin64c" if sys.platform.startswith('win') else "gs")
+
+# Image quality preset for Ghostscript: /screen, /ebook, /printer or /prepress.
+PDF_COMPACT_PRESET = os.getenv("PDF_COMPACT_PRESET", "/printer")
+
+
+def bundle_pdfs(documents, output_path):
+    """
+    Concatenates generated PDFs into one document with a bookmark per input.
+
+    Inputs are read from open file handles, so pypdf only pulls in the objects the
+    copied pages reference instead of loading each file whole. Fonts and images that
+    are byte-identical across documents (the same signature or font subset on every
+    cover) are stored once in the bundle.
+
+    Parameters:
+    - documents: list of (title, pdf_path) pairs, in bundle order.
+    - output_path: str, where the bundle is written.
+
+    Returns:
+    - dict: "path", "page_count", "documents" (titles included) and "skipped"
+      (paths that could not be read), or None if nothing could be bundled.
+    """
+    writer = PdfWriter()
+    included, skipped = [], []
+
+    with ExitStack() as stack:
+        for title, pdf_path in documents:
+            try:
+                pdf_file = stack.enter_context(open(pdf_path, "rb"))
+                writer.append(PdfReader(pdf_file), outline_item=title)
+                included.append(title)
+            except Exception as e:
+                print(f"Skipping {pdf_path} in bundle: {e}")
+                skipped.append(pdf_path)
+
+        if not included:
+            print("No PDFs to bundle.")
+            return None
+
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+        writer.page_mode = "/UseOutlines"
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "wb") as bundle_file:
+            writer.write(bundle_file)
+
+    page_count = len(writer.pages)
+    print(f"Bundled {len(included)} PDFs ({page_count} pages) into {output_path}")
+    return {"path": output_path, "page_count": page_count, "documents": included, "skipped": skipped}
+
+
+def split_pdf(pdf_bytes, page_ranges):
+    """
+    Splits one PDF into several by page ranges.
+
+    Parameters:
+    - pdf_bytes: bytes of the combined PDF.
+    - page_ranges: list of (start, stop) zero-based, stop-exclusive page ranges.
+
+    Returns:
+    - list: the PDF bytes for every range, in the same order.
+    """
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    parts = []
+    for start, stop in page_ranges:
+        writer = PdfWriter()
+        for page in reader.pages[start:stop]:
+            writer.add_page(page)
+        # Pages of a combined document share resources; keep only what this part uses.
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        parts.append(buffer.getvalue())
+    return parts
+
+
+def compact_pdf(pdf_bytes, name="document"):
+    """
+    Shrinks a generated PDF and reports how much it saved.
+
+    With Ghostscript available the PDF is rewritten with subset and compressed fonts,
+    recompressed and deduplicated images and linearized for fast first-page display.
+    Otherwise pypdf recompresses every stream at the highest zlib level and merges
+    identical objects, which is lossless but cannot subset fonts or linearize.
+    The original is kept if the result is not smaller.
+
+    Parameters:
+    - pdf_bytes: bytes of the PDF.
+    - name: str, how the document is called in the report.
+
+    Returns:
+    - tuple: (pdf bytes, report dict with "name", "method", "original_bytes",
+      "compacted_bytes" and "saved_bytes").
+    """
+    method = "ghostscript" if shutil.which(GHOSTSCRIPT) else "pypdf"
+    try:
+        compacted = _compact_with_ghostscript(pdf_bytes) if method == "ghostscript" else _compact_with_pypdf(pdf_bytes)
+    except Exception as e:
+        print(f"Could not compact {name}: {e}")
+        compacted = pdf_bytes
+
+    if len(compacted) >= len(pdf_bytes):
+        compacted, method = pdf_bytes, "unchanged"
+    report = {
+            "name": name,
+            "method": method,
+            "original_bytes": len(pdf_bytes),
+            "compacted_bytes": len(compacted),
+            "saved_bytes": len(pdf_bytes) - len(compacted),
+    }
+    print(f"Compacted {name} with {method}: {report['original_bytes']} -> {report['compacted_bytes']} bytes "
+          f"({report['saved_bytes']} saved)")
+    return compacted, report
+
+
+def compact_pdf_file(pdf_path):
+    """Compacts a PDF file in place and returns the compact_pdf() report."""
+    with open(pdf_path, "rb") as pdf_file:
+        pdf_bytes = pdf_file.read()
+    compacted, report = compact_pdf(pdf_bytes, name=os.path.basename(pdf_path))
+    if report["saved_bytes"]:
+        with open(pdf_path, "wb") as pdf_file:
+            pdf_file.write(compacted)
+    return report
+
+
+def _compact_with_ghostscript(pdf_bytes):
+    with tempfile.TemporaryDirectory(prefix="pdf_compact_") as work_dir:
+        input_path = os.path.join(work_dir, "input.pdf")
+        output_path = os.path.join(work_dir, "output.pdf")
+        with open(input_path, "wb") as pdf_file:
+            pdf_file.write(pdf_bytes)
+        subprocess.run([
+                GHOSTSCRIPT, "-sDEVICE=pdfwrite", "-dCompatibilityLevel=1.5",
+                f"-dPDFSETTINGS={PDF_COMPACT_PRESET}",
+                "-dSubsetFonts=true", "-dCompressFonts=true", "-dEmbedAllFonts=true",
+                "-dDetectDuplicateImages=true", "-dFastWebView=true",
+                "-dNOPAUSE", "-dBATCH", "-dQUIET", f"-sOutputFile={output_path}", input_path,
+        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with open(output_path, "rb") as pdf_file:
+            return pdf_file.read()
+
+
+def _compact_with_pypdf(pdf_bytes):
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(pdf_bytes)))
+    # Images shared by several pages (a logo on every page) must be compressed only once.
+    done = set()
+    for page in writer.pages:
+        page.compress_content_streams(level=9)
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources else None
+        for xobject_ref in (dict.values(xobjects.get_object()) if xobjects else []):
+            if isinstance(xobject_ref, IndirectObject):
+                object_id = (xobject_ref.idnum, xobject_ref.generation)
+                if object_id in done:
+                    continue
+                done.add(object_id)
+            xobject = xobject_ref.get_object()
+            filters = xobject.get("/Filter")
+            # Re-deflate images that are stored raw or deflated at a low level; leave JPEG and friends alone.
+            if filters not in (None, "/FlateDecode", ["/FlateDecode"]) or "/DecodeParms" in xobject:
+                continue
+            xobject._data = zlib.compress(xobject.get_data(), 9)
+            xobject[NameObject("/Filter")] = NameObject("/FlateDecode")
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
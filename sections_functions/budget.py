@@ -0,0 +1,134 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ACCAPI import ACCAPI
+from ExcelModifier import ExcelModifier
+from JobStore import report_progress
+from Metrics import stage_timer
+from Tracing import propagate
+
+
+# Budgets requested per ACC call (the Cost API allows up to 100).
+BUDGET_PAGE_SIZE = int(os.getenv("BUDGET_PAGE_SIZE", "100"))
+
+# Budget lines per sheet before the report continues on a new sheet with its own header and totals.
+BUDGET_ROWS_PER_SHEET = int(os.getenv("BUDGET_ROWS_PER_SHEET", "2000"))
+
+# Report columns, A onwards: (header in templates/budget_template.xlsx, ACC budget field).
+BUDGET_COLUMNS = [
+        ("Code", "formattedCode"),
+        ("Name", "name"),
+        ("Quantity", "quantity"),
+        ("Unit", "unit"),
+        ("Unit Price", "unitPrice"),
+        ("Original Amount", "originalAmount"),
+        ("Revised", "revised"),
+        ("Actual Cost", "actualCost"),
+        ("Projected Cost", "projectedCost"),
+]
+
+# ACC returns amounts as strings; these are written as numbers so the totals can add them up.
+NUMERIC_FIELDS = {"quantity", "unitPrice", "originalAmount", "revised", "actualCost", "projectedCost"}
+
+# Template row of the first budget line, and the totals row below it.
+DATA_START_ROW = 3
+TOTALS = {"F4": "=SUM(F{first_row}:F{last_row})", "G4": "=SUM(G{first_row}:G{last_row})",
+          "H4": "=SUM(H{first_row}:H{last_row})", "I4": "=SUM(I{first_row}:I{last_row})"}
+
+
+def fetch_budget_page(acc_api, project_id, offset, limit=BUDGET_PAGE_SIZE):
+    """Returns one page of the Cost API budgets list, with its "results" and "pagination"."""
+    return acc_api.call_api(f"cost/v1/containers/{project_id}/budgets", params={"limit": limit, "offset": offset})
+
+
+def iter_budgets(acc_api, project_id, first_page=None, page_size=BUDGET_PAGE_SIZE):
+    """
+    Yields every budget of the project, one page at a time.
+
+    The next page is requested while the current one is being written, so the report is
+    never waiting on ACC for more than one page and never holds more than two in memory.
+
+    Parameters:
+    - acc_api: ACCAPI instance.
+    - project_id: str, the cost container (project) id.
+    - first_page: the already fetched page at offset 0, if any.
+    - page_size: int, budgets per request.
+    """
+    page = first_page or fetch_budget_page(acc_api, project_id, 0, page_size)
+    offset = 0
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        while True:
+            results = page.get("results") or []
+            total = (page.get("pagination") or {}).get("totalResults", 0)
+            offset += len(results)
+            next_page = None
+            if results and offset < total:
+                next_page = executor.submit(propagate(fetch_budget_page), acc_api, project_id, offset, page_size)
+            yield from results
+            if next_page is None:
+                return
+            report_progress("fetching", min(60, 10 + 50 * offset // total))
+            page = next_page.result()
+
+
+def budget_rows(budgets):
+    """Turns budgets into report rows in BUDGET_COLUMNS order."""
+    for budget in budgets:
+        row = []
+        for _, field in BUDGET_COLUMNS:
+            value = budget.get(field)
+            if field in NUMERIC_FIELDS and value not in (None, ""):
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    pass
+            row.append(value)
+        yield row
+
+
+def export_budgets(context):
+    """
+    Lists every budget of the project (code, name, quantities and amounts) and returns the PDF.
+
+    Budgets are fetched page by page and streamed into the report, so memory stays flat however
+    many budget lines the project has. The header repeats on every printed page, and every
+    BUDGET_ROWS_PER_SHEET lines the report continues on a new sheet with its own totals.
+    """
+    persist_pdfs = context["persist_pdfs"]
+    acc_api = ACCAPI()
+    try:
+        first_page = fetch_budget_page(acc_api, context["project_id"], 0)
+    except Exception as e:
+        print(f"Failed to fetch data: {str(e)}")
+        return {"error": f"Failed to fetch data: {str(e)}", "status_code": 500}
+
+    excel_modifier = ExcelModifier(template_filename="templates/budget_template.xlsx", modified_folder="modified_files")
+    file_name = f"budgets_{uuid.uuid4().hex}"
+    report_progress("filling", 20)
+    try:
+        excel_modifier.open_workbook()
+        with stage_timer("cell_fill"):
+            report = excel_modifier.write_streaming_report(
+                    budget_rows(iter_budgets(acc_api, context["project_id"], first_page)),
+                    data_start_row=DATA_START_ROW, filename=f"{file_name}.xlsx", footer_values=TOTALS,
+                    rows_per_sheet=BUDGET_ROWS_PER_SHEET)
+    finally:
+        # Releases the pooled Excel instance before the conversion below leases one.
+        excel_modifier.close_workbook()
+    print(f"Budgets report: {report['row_count']} budgets on {report['sheet_count']} sheets")
+
+    report_progress("converting", 70)
+    try:
+        excel_modifier.queue_pdf_export(file_name, fit_to_page=False)
+        entry = excel_modifier.export_pending_to_pdf()[0]
+        if entry["status"] != "ok":
+            return {"error": "PDF generation failed.", "status_code": 500}
+        with open(entry["pdf_path"], "rb") as pdf_file:
+            pdf_bytes = pdf_file.read()
+        if not persist_pdfs:
+            os.remove(entry["pdf_path"])
+        return {"pdf_bytes": pdf_bytes, "status_code": 200}
+    finally:
+        if not persist_pdfs and os.path.exists(report["path"]):
+            os.remove(report["path"])
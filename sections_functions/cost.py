@@ -7,6 +7,7 @@ from urllib.parse import urlparse, parse_qs
 
 from ACCAPI import ACCAPI
 from ExcelModifier import ExcelModifier
+from Metrics import timed
 
 
 def pretty_print_json(data):
@@ -45,15 +46,11 @@ def modify_cell_with_null_check(excel_modifier, letter, cell, value):
 
 
 
-def print_cost_cover(project_id, url):
-    acc_api = ACCAPI()
-
-    cost_payment_response = acc_api.call_api(f"cost/v1/containers/{project_id}/payments")["results"]
-    change_order_response = acc_api.call_api(f"cost/v1/containers/{project_id}/cost-items")["results"]
-    sov_response = acc_api.call_api(f"cost/v1/containers/{project_id}/schedule-of-values")["results"]
-    
-    # pretty_print_json(sov_response)
-
+def find_cost_payments(cost_payment_response, url):
+    """
+    Selects the contract payments to print: the one referenced by the URL, or else every
+    payment of the most recent month that has any.
+    """
     # Initialize variables
     current_date = datetime.now()
     
@@ -61,7 +58,7 @@ def print_cost_cover(project_id, url):
     cost_payments = []
     
     
-    cost_id = extract_cost_id(url)
+    cost_id = extract_cost_id(url) if url else None
     
     
     if cost_id:
@@ -83,38 +80,146 @@ def print_cost_cover(project_id, url):
     
     print(f"cost id is {cost_id}")
     print(len(cost_payments))
-    change_orders = [change_order for change_order in change_order_response if change_order["contractId"] in [cost_payment["associationId"] for cost_payment in cost_payments]]
-    # pretty_print_json(change_orders)
+    return cost_payments
+
+
+@timed("cell_fill")
+def fill_cost_cover(excel_modifier, acc_api, project_id, payment, new):
+    """
+    Fills the active sheet of excel_modifier with one payment's cover.
+
+    new tells whether the payment has no saved workbook from an earlier review stage yet;
+    it decides, together with the payment status, which column (D/E/F) is written.
+    payment["status"] is replaced by the reviewing party's name used in the PDF name.
+    """
+    payment_number = payment["id"]
+
+    payment_items = acc_api.call_api(
+            f"cost/v1/containers/{project_id}/payment-items",
+            params={
+                    "paymentId": payment_number
+            }
+    )["results"]
 
-   
+    nic_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("NIC" in item["number"])]
+    sic_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("SIC" in item["number"])]
+    inf_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("INF" in item["number"])]
+    rem_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("REM" in item["number"])]
     
+    new_item = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in nic_change_orders_ids) ])
+    similar_item = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in sic_change_orders_ids) ])
+    inflation_rate = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in inf_change_orders_ids)])
+    remeasured = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in rem_change_orders_ids)])
+
+    print("Payment:")
+    pretty_print_json(payment)
+    letter = "D"
     
-    for payment in cost_payments:
-        association_Id = payment["associationId"]
-        payment_number = payment["id"]
-        items = [item for item in change_orders if item["contractId"] == association_Id]
+    if new:
+        letter = "D"
+        payment["status"] = "Main-Contractor"
+    elif payment["status"] == "revise" or payment["status"] == "inReview":
+        letter = "E"
+        payment["status"] = "Consultant"
+    elif payment["status"] == "accepted" or payment["status"] == "approved":
+        letter = "F"
+        payment["status"] = "Owner"
+    else:
+        letter = "D"
+        payment["status"] = "Main-Contractor"
 
 
+    print("--------------------------------TEST----------------------------------------------")
+    payment_items = acc_api.call_api(f"cost/v1/containers/{project_id}/payment-items?filter[paymentId]={payment_number}")["results"]
+    project_mobilization = [item for item in payment_items if item["number"] in ["01-71", "01-72"]]
+    project_mobilization = sum([float(item["amount"]) for item in project_mobilization])
+    
+    properties = payment["properties"]
 
-        payment_items = acc_api.call_api(
-                f"cost/v1/containers/{project_id}/payment-items",
-                params={
-                        "paymentId": payment_number
-                }
-        )["results"]
+    property_000 = next(iter([p for p in properties if "000" in p["name"]]), {})
+    property_001 = next(iter([p for p in properties if "001" in p["name"]]), {})
+    property_002 = next(iter([p for p in properties if "002" in p["name"]]), {})
+    property_003 = next(iter([p for p in properties if "003" in p["name"]]), {})
+    property_004 = next(iter([p for p in properties if "004" in p["name"]]), {})
+    property_005 = next(iter([p for p in properties if "005" in p["name"]]), {})
+    property_006 = next(iter([p for p in properties if "006" in p["name"]]), {})
 
-        nic_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("NIC" in item["number"])]
-        sic_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("SIC" in item["number"])]
-        inf_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("INF" in item["number"])]
-        rem_change_orders_ids = [item["id"] for item in payment_items if item["associationType"] == "SCO" and ("REM" in item["number"])]
-        
-        new_item = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in nic_change_orders_ids) ])
-        similar_item = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in sic_change_orders_ids) ])
-        inflation_rate = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in inf_change_orders_ids)])
-        remeasured = sum([ float(item["amount"]) for item in payment_items if (item["parentId"] in rem_change_orders_ids)])
-        
 
 
+    start_date_obj = datetime.strptime(payment["startDate"], "%Y-%m-%d")
+    end_date_obj = datetime.strptime(payment["endDate"], "%Y-%m-%d")
+    
+    # Format both dates
+    arabic_months = {
+            "January": "يناير", "February": "فبراير", "March": "مارس",
+            "April": "أبريل", "May": "مايو", "June": "يونيو",
+            "July": "يوليو", "August": "أغسطس", "September": "سبتمبر",
+            "October": "أكتوبر", "November": "نوفمبر", "December": "ديسمبر"
+    }
+
+    # Format the date and translate the month
+    first_date = start_date_obj.strftime("%d %B %Y")  # This already puts day before month
+    last_date = end_date_obj.strftime("%d %B %Y")
+    
+    # Replace English month names with Arabic
+    for eng, arab in arabic_months.items():
+        first_date = first_date.replace(eng, arab)
+        last_date = last_date.replace(eng, arab)
+
+    
+    
+    
+    
+    
+    
+    
+    if len(payment["recipients"]) >= 1:
+        pretty_print_json(f"recipients: {payment["recipients"]}")
+        reviewer = acc_api.call_api(f"construction/admin/v1/projects/{project_id}/users/{payment["recipients"][0]['id']}")
+        excel_modifier.modify_cell("D52", reviewer["name"])
+        pretty_print_json(reviewer)
+        print(f"Reviewer: {reviewer['name']}")
+
+    title = f"""عقد تنفيذ فيلات منطقة V35 - مدينتي
+    عن أعمال حتى {last_date}"""  
+    payment_gary_number = int(payment["number"][-1:])
+    subtitle = f"مستخلص جاري رقم ({payment_gary_number}) "
+    excel_modifier.modify_cell("D2", title)
+    excel_modifier.modify_cell("E4", subtitle)
+    excel_modifier.modify_cell("C6", first_date)
+    excel_modifier.modify_cell("F6", last_date)
+    excel_modifier.modify_cell("C44", payment_gary_number )
+    modify_cell_with_null_check(excel_modifier, letter, "10", payment.get("originalAmount"))
+    modify_cell_with_null_check(excel_modifier, letter, "13", new_item)
+    modify_cell_with_null_check(excel_modifier, letter, "14", similar_item)
+    modify_cell_with_null_check(excel_modifier, letter, "15", remeasured)
+    modify_cell_with_null_check(excel_modifier, letter, "16", inflation_rate)
+    modify_cell_with_null_check(excel_modifier, letter, "20", payment.get("amount"))
+    modify_cell_with_null_check(excel_modifier, letter, "23", project_mobilization)
+    modify_cell_with_null_check(excel_modifier, letter, "26", payment.get("materials"))
+    modify_cell_with_null_check(excel_modifier, letter, "35", property_000.get("value"))
+    modify_cell_with_null_check(excel_modifier, letter, "36", property_001.get("value"))
+    modify_cell_with_null_check(excel_modifier, letter, "37", property_002.get("value"))
+    modify_cell_with_null_check(excel_modifier, letter, "38", property_003.get("value"))
+    modify_cell_with_null_check(excel_modifier, letter, "45", property_006.get("value"))
+
+
+def print_cost_cover(project_id, url, in_memory=False, persist_pdf=False):
+    """
+    Fills the cost cover sheet for the payment referenced by the URL and exports it to PDF.
+
+    Returns the PDF path, or the PDF bytes when in_memory is True. persist_pdf additionally
+    keeps an in-memory PDF in modified_files.
+    """
+    acc_api = ACCAPI()
+
+    cost_payment_response = acc_api.call_api(f"cost/v1/containers/{project_id}/payments")["results"]
+    
+    cost_payments = find_cost_payments(cost_payment_response, url)
+    
+    for payment in cost_payments:
+        payment_number = payment["id"]
+
         # Determine the template path based on association ID
         template_filename = f"{payment_number}.xlsx"
         template_path = os.path.join("modified_files", template_filename)
@@ -125,121 +230,28 @@ def print_cost_cover(project_id, url):
         else:
             selected_template = "templates/cost_cover_template.xlsx"
 
-
-        sovs = [sov for sov in sov_response if sov["contractId"] == association_Id]
-        
-        project_mobilization = [sov for sov in sovs if sov["name"] == "Project Mobilization"]
-        if project_mobilization:
-            project_mobilization = project_mobilization[0]
-        else:
-            project_mobilization = {"amount": 0}
         excel_modifier = ExcelModifier(template_filename=selected_template, modified_folder="modified_files")
         try:
             excel_modifier.open_workbook()
-            print("Payment:")
-            pretty_print_json(payment)
-            letter = "D"
-            
-            if new:
-                letter = "D"
-                payment["status"] = "Main-Contractor"
-            elif payment["status"] == "revise" or payment["status"] == "inReview":
-                letter = "E"
-                payment["status"] = "Consultant"
-            elif payment["status"] == "accepted" or payment["status"] == "approved":
-                letter = "F"
-                payment["status"] = "Owner"
-            else:
-                letter = "D"
-                payment["status"] = "Main-Contractor"
-
-
-            print("--------------------------------TEST----------------------------------------------")
-            payment_items = acc_api.call_api(f"cost/v1/containers/{project_id}/payment-items?filter[paymentId]={payment_number}")["results"]
-            project_mobilization = [item for item in payment_items if item["number"] in ["01-71", "01-72"]]
-            project_mobilization = sum([float(item["amount"]) for item in project_mobilization])
-            
-            properties = payment["properties"]
-
-            property_000 = next(iter([p for p in properties if "000" in p["name"]]), {})
-            property_001 = next(iter([p for p in properties if "001" in p["name"]]), {})
-            property_002 = next(iter([p for p in properties if "002" in p["name"]]), {})
-            property_003 = next(iter([p for p in properties if "003" in p["name"]]), {})
-            property_004 = next(iter([p for p in properties if "004" in p["name"]]), {})
-            property_005 = next(iter([p for p in properties if "005" in p["name"]]), {})
-            property_006 = next(iter([p for p in properties if "006" in p["name"]]), {})
-
-
-
-            start_date_obj = datetime.strptime(payment["startDate"], "%Y-%m-%d")
-            end_date_obj = datetime.strptime(payment["endDate"], "%Y-%m-%d")
-            
-            # Format both dates
-            arabic_months = {
-                    "January": "يناير", "February": "فبراير", "March": "مارس",
-                    "April": "أبريل", "May": "مايو", "June": "يونيو",
-                    "July": "يوليو", "August": "أغسطس", "September": "سبتمبر",
-                    "October": "أكتوبر", "November": "نوفمبر", "December": "ديسمبر"
-            }
-
-            # Format the date and translate the month
-            first_date = start_date_obj.strftime("%d %B %Y")  # This already puts day before month
-            last_date = end_date_obj.strftime("%d %B %Y")
-            
-            # Replace English month names with Arabic
-            for eng, arab in arabic_months.items():
-                first_date = first_date.replace(eng, arab)
-                last_date = last_date.replace(eng, arab)
-
-            
-            
-            
-            
-            
-            
-            
-            if len(payment["recipients"]) >= 1:
-                pretty_print_json(f"recipients: {payment["recipients"]}")
-                reviewer = acc_api.call_api(f"construction/admin/v1/projects/{project_id}/users/{payment["recipients"][0]['id']}")
-                excel_modifier.modify_cell("D52", reviewer["name"])
-                pretty_print_json(reviewer)
-                print(f"Reviewer: {reviewer['name']}")
-
-            title = f"""عقد تنفيذ فيلات منطقة V35 - مدينتي
-    عن أعمال حتى {last_date}"""  
-            payment_gary_number = int(payment["number"][-1:])
-            subtitle = f"مستخلص جاري رقم ({payment_gary_number}) "
-            excel_modifier.modify_cell("D2", title)
-            excel_modifier.modify_cell("E4", subtitle)
-            excel_modifier.modify_cell("C6", first_date)
-            excel_modifier.modify_cell("F6", last_date)
-            excel_modifier.modify_cell("C44", payment_gary_number )
-            modify_cell_with_null_check(excel_modifier, letter, "10", payment.get("originalAmount"))
-            modify_cell_with_null_check(excel_modifier, letter, "13", new_item)
-            modify_cell_with_null_check(excel_modifier, letter, "14", similar_item)
-            modify_cell_with_null_check(excel_modifier, letter, "15", remeasured)
-            modify_cell_with_null_check(excel_modifier, letter, "16", inflation_rate)
-            modify_cell_with_null_check(excel_modifier, letter, "20", payment.get("amount"))
-            modify_cell_with_null_check(excel_modifier, letter, "23", project_mobilization)
-            modify_cell_with_null_check(excel_modifier, letter, "26", payment.get("materials"))
-            modify_cell_with_null_check(excel_modifier, letter, "35", property_000.get("value"))
-            modify_cell_with_null_check(excel_modifier, letter, "36", property_001.get("value"))
-            modify_cell_with_null_check(excel_modifier, letter, "37", property_002.get("value"))
-            modify_cell_with_null_check(excel_modifier, letter, "38", property_003.get("value"))
-            modify_cell_with_null_check(excel_modifier, letter, "45", property_006.get("value"))
-           
-            
-            
-
-
+            fill_cost_cover(excel_modifier, acc_api, project_id, payment, new)
             
             print(f"Payment Number: {payment_number}")
-            excel_modifier.save_workbook(filename=f'{payment_number}.xlsx')
+            if in_memory:
+                # The saved workbook is the starting point of the next review stage, so it is still kept on disk
+                xlsx_bytes = excel_modifier.save_workbook_to_bytes(filename=f'{payment_number}.xlsx')
+            else:
+                excel_modifier.save_workbook(filename=f'{payment_number}.xlsx')
             try:
                 project = acc_api.call_api(f"construction/admin/v1/projects/{project_id}")
             except Exception:
                 project =  None
                 print("Failed to fetch project name PROP PERMISSION ISSUE")
+            if in_memory:
+                pdf_filename = f'{payment["number"]}_{payment["status"]}' if persist_pdf else None
+                pdf_bytes = excel_modifier.export_to_pdf_bytes(xlsx_bytes=xlsx_bytes, pdf_filename=pdf_filename)
+                print("COST PY: PDF generated in memory")
+                return pdf_bytes
+
             pdf_path = excel_modifier.export_to_pdf(payment, filename='output.pdf', excel_filename=payment_number)
             
             print(f"COST PY: PDF file generated: {pdf_path}")
@@ -256,4 +268,90 @@ def print_cost_cover(project_id, url):
         except Exception as e:
             print(f"Failed to modify Excel file: {str(e)}")
         finally:
-            excel_modifier.close_workbook()
\ No newline at end of file
+            excel_modifier.close_workbook()
+
+
+def print_cost_covers(project_id, url=None, split=True, persist_pdf=False, modified_folder="modified_files"):
+    """
+    Prints the covers of several payments with a single conversion.
+
+    The cover template is cloned once per payment inside one workbook (picking up each
+    payment's saved review stage), the workbook is converted in one pass and, with split,
+    the PDF is cut back into one file per payment by page.
+
+    Parameters:
+    - project_id: str, the ACC project (cost container) id.
+    - url: str, optional cost URL; without a payment id every payment of the latest month is printed.
+    - split: bool, return one PDF per payment instead of the combined PDF.
+    - persist_pdf: bool, also keep the PDFs in modified_files.
+    - modified_folder: str, folder of the review stages and persisted PDFs.
+
+    Returns:
+    - list of dicts with "payment_id", "pdf_filename" and "pdf_bytes" when split,
+      otherwise the combined PDF bytes; None if nothing could be generated.
+    """
+    acc_api = ACCAPI()
+
+    cost_payment_response = acc_api.call_api(f"cost/v1/containers/{project_id}/payments")["results"]
+    cost_payments = find_cost_payments(cost_payment_response, url)
+
+    excel_modifier = ExcelModifier(template_filename="templates/cost_cover_template.xlsx", modified_folder=modified_folder)
+    try:
+        excel_modifier.open_workbook()
+        printed = []
+        for payment in cost_payments:
+            payment_number = payment["id"]
+            state_path = os.path.join(excel_modifier.modified_folder, f"{payment_number}.xlsx")
+            new = not os.path.exists(state_path)
+            sheet = None
+            try:
+                sheet = excel_modifier.add_template_sheet(payment["number"] or payment_number, state_path=None if new else state_path)
+                fill_cost_cover(excel_modifier, acc_api, project_id, payment, new)
+                # The single-payment workbook is the starting point of the next review stage
+                excel_modifier.save_sheet_state(f"{payment_number}.xlsx")
+                printed.append({"payment_id": payment_number, "pdf_filename": f'{payment["number"]}_{payment["status"]}'})
+            except Exception as e:
+                print(f"Failed to fill cover for payment {payment_number}: {str(e)}")
+                # A half-filled clone would be converted with the others and shift every later PDF.
+                if sheet is not None:
+                    excel_modifier.remove_sheet(sheet)
+
+        if not printed:
+            return None
+        excel_modifier.drop_template_sheet()
+
+        pdfs = excel_modifier.export_sheets_to_pdf_bytes(split=split)
+        if not pdfs or not split:
+            return pdfs
+        if len(pdfs) != len(printed):
+            print(f"COST PY: {len(pdfs)} PDFs for {len(printed)} covers, not matching them to payments")
+            return None
+
+        for entry, pdf_bytes in zip(printed, pdfs):
+            entry["pdf_bytes"] = pdf_bytes
+            if persist_pdf:
+                with open(os.path.join(excel_modifier.modified_folder, entry["pdf_filename"]), "wb") as pdf_file:
+                    pdf_file.write(pdf_bytes)
+        print(f"COST PY: {len(printed)} cover PDFs generated in one conversion")
+        return printed
+    except Exception as e:
+        print(f"Failed to modify Excel file: {str(e)}")
+    finally:
+        excel_modifier.close_workbook()
+
+
+def export_cost_cover(context):
+    """
+    Section handler for cost URLs: the cover of the payment in the URL, or with
+    "all_payments" in the request every payment of the period in one PDF.
+    """
+    project_id, url = context["project_id"], context["url"]
+    print("Costs section")
+    if context["data"].get('all_payments'):
+        # Every payment of the period in one PDF, rendered with a single conversion
+        pdf_bytes = print_cost_covers(project_id=project_id, url=url, split=False)
+    else:
+        pdf_bytes = print_cost_cover(project_id=project_id, url=url, in_memory=True, persist_pdf=context["persist_pdfs"])
+    if not pdf_bytes:
+        return {"error": "PDF generation failed.", "status_code": 500}
+    return {"pdf_bytes": pdf_bytes, "status_code": 200}
@@ -0,0 +1,36 @@
+from ExcelModifier import ExcelModifier
+from JobStore import report_progress
+from Metrics import stage_timer
+
+
+def export_forms(context):
+    """
+    Lists the project's forms (id, name and status) in the template and returns the PDF.
+    Expects the forms list under context["forms"].
+    """
+    persist_pdfs = context["persist_pdfs"]
+    excel_modifier = ExcelModifier(template_filename="templates/template.xlsx", modified_folder="modified_files")
+    report_progress("filling", 40)
+    try:
+        excel_modifier.open_workbook()
+
+        headers = ["Form Id", "Form Name", "Status"]
+        with stage_timer("cell_fill"):
+            for col, header in enumerate(headers, start=1):
+                excel_modifier.modify_cell(f"{chr(64 + col)}1", header)
+
+            for i, form in enumerate(context["forms"], start=2):
+                excel_modifier.modify_cell(f'A{i}', form['id'])
+                excel_modifier.modify_cell(f'B{i}', form['name'])
+                excel_modifier.modify_cell(f'C{i}', form['status'])
+
+        # Export straight to PDF bytes, optionally keeping copies in modified_files
+        report_progress("converting", 70)
+        xlsx_bytes = excel_modifier.save_workbook_to_bytes(filename='output.xlsx' if persist_pdfs else None)
+        pdf_bytes = excel_modifier.export_to_pdf_bytes(xlsx_bytes=xlsx_bytes, pdf_filename='output.pdf' if persist_pdfs else None)
+        if not pdf_bytes:
+            return {"error": "PDF generation failed.", "status_code": 500}
+
+        return {"pdf_bytes": pdf_bytes, "status_code": 200}
+    finally:
+        excel_modifier.close_workbook()
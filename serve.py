@@ -0,0 +1,139 @@
+"""
+Production entry point: python serve.py
+
+Serves app.py with waitress, a multi-threaded WSGI server that also runs on Windows, where
+the Excel backend lives. Without waitress installed Werkzeug's threaded server is used,
+still without the debugger and reloader. The port opens as soon as the app is imported;
+the optional warm-up then loads the rest in the background, and SIGTERM (or Ctrl+C)
+drains the queued and running jobs before the process exits.
+"""
+# Imported first, so the startup clock starts as close to process start as possible.
+from Metrics import mark_startup
+
+import _thread
+import io
+import os
+import signal
+import threading
+import time
+
+# Interface and port to listen on.
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+
+# Threads answering HTTP requests. /generate-pdf holds one while its job runs, so this should
+# exceed WORKER_COUNT (the number of jobs processed at once, see WorkerPool).
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+
+# Seconds queued and running jobs get to finish after SIGTERM before the server stops anyway.
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "120"))
+
+# Warm up templates, converter and ACC token right after the port opens.
+WARM_UP = os.getenv("WARM_UP", "true").lower() == "true"
+
+
+def load_app():
+    """Imports the app (which starts its worker pool) and returns (Flask app, worker pool)."""
+    import app
+    mark_startup("imported")
+    return app.app, app.worker_pool
+
+
+def warm_up():
+    """
+    Loads what the first requests would otherwise pay for: the templates, a warm converter
+    (one LibreOffice profile per converter slot on Linux, the Excel pool on Windows) and an
+    ACC access token. Runs after the port is open, so health checks pass meanwhile.
+    """
+    started_at = time.perf_counter()
+    from ACCAPI import ACCAPI
+    from ExcelModifier import USE_XLWINGS, CONVERTER_WORKERS, convert_xlsx_bytes_to_pdf
+
+    templates = {}
+    for name in sorted(os.listdir("templates")):
+        with open(os.path.join("templates", name), "rb") as template_file:
+            templates[name] = template_file.read()
+
+    try:
+        if USE_XLWINGS:
+            from ExcelAppPool import get_excel_pool
+            pool = get_excel_pool()
+            leases = [pool.acquire() for _ in range(pool.size)]
+            for lease in leases:
+                pool.release(lease)
+        else:
+            import openpyxl
+            for name, template_bytes in templates.items():
+                if name.endswith(".xlsx"):
+                    openpyxl.load_workbook(io.BytesIO(template_bytes)).close()
+            # The first conversion on a slot creates its LibreOffice profile, which takes seconds.
+            if "template.xlsx" in templates:
+                for _ in range(max(1, CONVERTER_WORKERS)):
+                    convert_xlsx_bytes_to_pdf(templates["template.xlsx"])
+    except Exception as e:
+        print(f"Could not warm up the converter: {e}")
+
+    try:
+        acc_api = ACCAPI()
+        # Without a saved refresh token this would wait for an interactive login.
+        if acc_api.load_refresh_token():
+            acc_api.get_valid_access_token()
+    except Exception as e:
+        print(f"Could not prime the ACC token: {e}")
+
+    print(f"Warmed up {len(templates)} templates, the converter and the ACC token in {time.perf_counter() - started_at:.1f}s")
+    mark_startup("warmed_up")
+
+
+def create_server(wsgi_app):
+    """Returns (serve_forever, server name) for waitress if installed, else Werkzeug."""
+    try:
+        from waitress.server import create_server as create_waitress_server
+    except ImportError:
+        from werkzeug.serving import make_server
+        server = make_server(HOST, PORT, wsgi_app, threaded=True)
+        return server.serve_forever, "werkzeug"
+    server = create_waitress_server(wsgi_app, host=HOST, port=PORT, threads=SERVER_THREADS)
+    return server.run, "waitress"
+
+
+def main():
+    wsgi_app, worker_pool = load_app()
+    serve_forever, server_name = create_server(wsgi_app)
+    mark_startup("listening")
+    if WARM_UP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    draining = threading.Event()
+    drained = threading.Event()
+
+    def drain():
+        # New jobs are refused with 503 from here on, while requests already waiting for a
+        # job keep their connection until it finishes.
+        worker_pool.drain(DRAIN_TIMEOUT)
+        drained.set()
+        _thread.interrupt_main()
+
+    def on_signal(signum, frame):
+        if drained.is_set():
+            # Raised in the main thread, which makes the server stop and finish its responses.
+            raise KeyboardInterrupt
+        if draining.is_set():
+            print("Shutdown already in progress")
+            return
+        draining.set()
+        print(f"Received signal {signum}, draining jobs (up to {DRAIN_TIMEOUT:.0f}s)")
+        threading.Thread(target=drain, name="drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    print(f"Serving on {HOST}:{PORT} with {server_name} ({SERVER_THREADS} threads, {worker_pool.workers} workers)")
+    try:
+        serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print("Server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+from svgpathtools import svgstr2paths
+
+
+# Number of rendered signatures kept in memory.
+SIGNATURE_CACHE_SIZE = int(os.getenv("SIGNATURE_CACHE_SIZE", "256"))
+
+TRANSPARENT = (0, 0, 0, 0)
+WHITE = (255, 255, 255, 255)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def render_signature_png(svg_code, background=TRANSPARENT, size=(600, 300), line_width=2):
+    """
+    Rasterizes an SVG signature to PNG bytes.
+
+    Results are cached by a hash of the SVG content and the drawing options, so a signature
+    that appears on many forms is only rasterized once per process.
+
+    Parameters:
+    - svg_code: str, SVG code as a string.
+    - background: RGBA tuple for the canvas, transparent by default.
+    - size: (width, height) of the image in pixels.
+    - line_width: int, stroke width in pixels.
+
+    Returns:
+    - bytes: the PNG image.
+    """
+    key = (hashlib.sha256(svg_code.encode("utf-8")).hexdigest(), tuple(background), tuple(size), line_width)
+    with _cache_lock:
+        png_bytes = _cache.get(key)
+        if png_bytes is not None:
+            _cache.move_to_end(key)
+            cache_stats["hits"] += 1
+            return png_bytes
+        cache_stats["misses"] += 1
+
+    png_bytes = _rasterize(svg_code, background, size, line_width)
+
+    with _cache_lock:
+        _cache[key] = png_bytes
+        _cache.move_to_end(key)
+        while len(_cache) > SIGNATURE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png_bytes
+
+
+def _rasterize(svg_code, background, size, line_width):
+    paths, _ = svgstr2paths(svg_code)
+
+    img = Image.new('RGBA', size, background)
+    draw = ImageDraw.Draw(img)
+
+    # Segments that continue where the previous one ended are joined into a single
+    # polyline, so a stroke costs one draw call instead of one per segment.
+    for path in paths:
+        points = []
+        for segment in path:
+            start = (segment.start.real, segment.start.imag)
+            end = (segment.end.real, segment.end.imag)
+            if points and points[-1] != start:
+                draw.line(points, fill='black', width=line_width, joint='curve')
+                points = []
+            if not points:
+                points.append(start)
+            points.append(end)
+        if points:
+            draw.line(points, fill='black', width=line_width, joint='curve')
+
+    buffer = BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
@@ -0,0 +1,76 @@
+"""
+Shared fixtures for the tests: run from the repository root with
+
+    python -m unittest discover tests      (or python -m pytest tests)
+
+Nothing here talks to ACC; FakeACCAPI answers the Cost API calls the sections make.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+# Templates and the output folder are looked up relative to the working directory.
+os.chdir(REPO_ROOT)
+
+PROJECT_ID = "1234abcd-1234-1234-1234-123456789012"
+
+
+def sample_payment(number=1, status="draft"):
+    """A Cost API payment as print_cost_cover() sees it."""
+    return {
+            "id": f"{number:08d}-aaaa-bbbb-cccc-dddddddddddd",
+            "associationType": "Contract",
+            "number": f"PAY-{number}",
+            "status": status,
+            "startDate": "2026-09-01",
+            "endDate": "2026-09-30",
+            "recipients": [],
+            "properties": [{"name": "000 Retention", "value": "1500"}, {"name": "006 Advance", "value": "250"}],
+            "amount": "125000",
+            "originalAmount": "1000000",
+            "materials": "3200",
+    }
+
+
+class FakeACCAPI:
+    """Answers the Cost API endpoints used by the sections and records every call."""
+
+    def __init__(self, payments=None, payment_items=None):
+        self.payments = payments if payments is not None else [sample_payment()]
+        self.payment_items = payment_items if payment_items is not None else [
+                {"id": "co-1", "associationType": "SCO", "number": "NIC-1", "amount": "0", "parentId": None},
+                {"id": "i-1", "associationType": "Item", "number": "A-1", "amount": "4000", "parentId": "co-1"},
+                {"id": "i-2", "associationType": "Item", "number": "01-71", "amount": "900", "parentId": None},
+        ]
+        self.calls = []
+
+    def call_api(self, endpoint, params=None):
+        self.calls.append((endpoint, params))
+        if endpoint.endswith("/payments"):
+            return {"results": [dict(payment) for payment in self.payments]}
+        if "payment-items" in endpoint:
+            return {"results": [dict(item) for item in self.payment_items]}
+        return {"results": [], "data": []}
+
+
+def temp_folder(test_case):
+    """A scratch folder removed after the test."""
+    folder = tempfile.mkdtemp(prefix="acc_pdf_test_")
+    test_case.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+    return folder
+
+
+def libreoffice_available():
+    """True if a real LibreOffice can convert documents on this machine."""
+    if shutil.which("libreoffice") is None:
+        return False
+    try:
+        result = subprocess.run(["libreoffice", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0 and b"LibreOffice" in result.stdout
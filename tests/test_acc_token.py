@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from tests.helpers import REPO_ROOT, temp_folder
+
+import ACCAPI as acc_module
+from ACCAPI import ACCAPI
+from Metrics import mark_startup
+
+import app
+
+
+def token_response(status_code, body):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode("utf-8")
+    return response
+
+
+class AccessTokenCacheTest(unittest.TestCase):
+    """Access tokens are shared by every ACCAPI of the process and refreshed shortly before they expire."""
+
+    def setUp(self):
+        # refresh_token.txt is read and written in the working directory.
+        os.chdir(temp_folder(self))
+        self.addCleanup(os.chdir, REPO_ROOT)
+        with open("refresh_token.txt", "w") as token_file:
+            token_file.write("refresh-1")
+        self.valid_refresh_token = "refresh-1"
+        self.refreshes = 0
+        for patcher in (mock.patch.dict(acc_module._token_cache, access_token=None, expires_at=0),
+                        mock.patch.object(acc_module.requests, "post", self.token_endpoint),
+                        mock.patch("builtins.input", side_effect=AssertionError("asked for a new authorization"))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def token_endpoint(self, url, headers=None, data=None, verify=None):
+        """APS token endpoint: every refresh token works once and is replaced by a new one."""
+        if data.get("grant_type") == "authorization_code":
+            self.valid_refresh_token = "refresh-authorized"
+            return token_response(200, {"access_token": f"access-{data['code']}", "refresh_token": self.valid_refresh_token,
+                                        "expires_in": 3600})
+        if data["refresh_token"] != self.valid_refresh_token:
+            return token_response(400, {"error": "invalid_grant"})
+        self.refreshes += 1
+        self.valid_refresh_token = f"refresh-{self.refreshes + 1}"
+        return token_response(200, {"access_token": f"access-{self.refreshes}", "refresh_token": self.valid_refresh_token,
+                                    "expires_in": 3600})
+
+    def test_token_is_shared_until_it_is_about_to_expire(self):
+        self.assertEqual(ACCAPI().get_valid_access_token(), "access-1")
+        self.assertEqual(ACCAPI().get_valid_access_token(), "access-1")
+        self.assertEqual(self.refreshes, 1)
+
+        acc_module._token_cache["expires_at"] = time.time() + acc_module.TOKEN_REFRESH_MARGIN - 1
+        self.assertEqual(ACCAPI().get_valid_access_token(), "access-2")
+        ACCAPI().invalidate_access_token()
+        self.assertEqual(ACCAPI().get_valid_access_token(), "access-3")
+        with open("refresh_token.txt") as token_file:
+            self.assertEqual(token_file.read(), "refresh-4")
+
+    def test_refresh_token_rotated_by_another_process(self):
+        acc_api = ACCAPI()
+        load_refresh_token = acc_api.load_refresh_token
+
+        def rotated_after_read():
+            # Another process refreshes between this read and this process's refresh.
+            token = load_refresh_token()
+            if token == "refresh-1":
+                self.token_endpoint(None, data={"refresh_token": token})
+                acc_api.save_refresh_token(self.valid_refresh_token)
+            return token
+
+        with mock.patch.object(acc_api, "load_refresh_token", side_effect=rotated_after_read):
+            self.assertEqual(acc_api.get_valid_access_token(), "access-2")
+        self.assertEqual(self.refreshes, 2)
+
+    def test_prompt_does_not_hold_the_token_lock(self):
+        os.remove("refresh_token.txt")
+        prompted, answer = threading.Event(), threading.Event()
+        prompts = []
+
+        def authorization_code(prompt):
+            prompts.append(prompt)
+            prompted.set()
+            answer.wait(5)
+            return "code"
+
+        tokens = []
+        with mock.patch("builtins.input", side_effect=authorization_code):
+            first = threading.Thread(target=lambda: tokens.append(ACCAPI().get_valid_access_token()))
+            first.start()
+            self.assertTrue(prompted.wait(5))
+            # Other threads can use the lock while the prompt waits...
+            invalidating = threading.Thread(target=ACCAPI().invalidate_access_token)
+            invalidating.start()
+            invalidating.join(1)
+            self.assertFalse(invalidating.is_alive())
+            # ...and a thread needing a token waits for the prompt's instead of prompting again.
+            second = threading.Thread(target=lambda: tokens.append(ACCAPI().get_valid_access_token()))
+            second.start()
+            time.sleep(0.1)
+            answer.set()
+            first.join(5)
+            second.join(5)
+        self.assertEqual(tokens, ["access-code", "access-code"])
+        self.assertEqual(len(prompts), 1)
+        with open("refresh_token.txt") as token_file:
+            self.assertEqual(token_file.read(), "refresh-authorized")
+
+
+class StartupMetricsTest(unittest.TestCase):
+
+    def test_startup_milestones_are_exported(self):
+        mark_startup("imported")
+        metrics = app.app.test_client().get("/metrics").get_data(as_text=True)
+        self.assertIn('app_startup_seconds{milestone="imported"}', metrics)
+
+
+if __name__ == '__main__':
+    unittest.main()
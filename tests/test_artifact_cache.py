@@ -0,0 +1,104 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from tests.helpers import PROJECT_ID, temp_folder
+
+from ArtifactCache import ArtifactCache
+
+import app
+
+
+PDF = b"%PDF-1.4 cached cover"
+
+
+class ArtifactCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = temp_folder(self)
+        self.cache = ArtifactCache(self.folder, ttl=60, max_bytes=1024)
+
+    def test_hit_and_expiry(self):
+        path = self.cache.put("abc", PDF)
+        self.assertEqual(self.cache.get("abc"), path)
+        self.assertIsNone(self.cache.get("missing"))
+        # Older than the TTL
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        self.assertIsNone(self.cache.get("abc"))
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    def test_artifact_removed_while_looked_up_is_a_miss(self):
+        self.cache.put("abc", PDF)
+        with mock.patch("ArtifactCache.os.utime", side_effect=FileNotFoundError):
+            self.assertIsNone(self.cache.get("abc"))
+        self.assertEqual(self.cache.stats, {"hits": 0, "misses": 1, "evicted_files": 0, "evicted_bytes": 0})
+
+    def test_eviction_keeps_review_stages(self):
+        stage = os.path.join(self.folder, "00000001-aaaa-bbbb-cccc-dddddddddddd.xlsx")
+        with open(stage, "wb") as stage_file:
+            stage_file.write(b"x" * 2048)
+        first = self.cache.put("first", b"x" * 600)
+        old = time.time() - 30
+        os.utime(first, (old, old))
+        second = self.cache.put("second", b"x" * 600)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(second))
+        self.assertTrue(os.path.exists(stage))
+        self.assertEqual(self.cache.stats["evicted_files"], 1)
+
+    def test_fingerprint_covers_key_and_settings(self):
+        fingerprint = self.cache.fingerprint(("key",), settings=("native", False))
+        self.assertEqual(fingerprint, self.cache.fingerprint(("key",), settings=("native", False)))
+        self.assertNotEqual(fingerprint, self.cache.fingerprint(("other key",), settings=("native", False)))
+        self.assertNotEqual(fingerprint, self.cache.fingerprint(("key",), settings=("libreoffice", False)))
+
+
+class CoalescingKeyTest(unittest.TestCase):
+    cost_url = f"https://acc.autodesk.com/build/cost/projects/{PROJECT_ID}/cost/cost"
+
+    def test_same_payment_same_key(self):
+        key = app.coalescing_key({"url": f"{self.cost_url}?preview=pay-1"})
+        self.assertEqual(key, (PROJECT_ID, "Costs", "pay-1", False))
+        self.assertEqual(key, app.coalescing_key({"url": f"{self.cost_url}?selectId=pay-1&utm_source=mail"}))
+        self.assertNotEqual(key, app.coalescing_key({"url": f"{self.cost_url}?preview=pay-2"}))
+        self.assertNotEqual(key, app.coalescing_key({"url": f"{self.cost_url}?preview=pay-1", "all_payments": True}))
+
+
+class ConditionalGetTest(unittest.TestCase):
+    """A cached PDF can be revalidated with If-None-Match or If-Modified-Since."""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.query = {"url": f"https://acc.autodesk.com/build/cost/projects/{PROJECT_ID}/cost/cost?preview=pay-1"}
+        self.fingerprint = app.request_fingerprint(app.coalescing_key(self.query))
+        app.artifact_cache.put(self.fingerprint, PDF)
+        self.addCleanup(app.artifact_cache.discard, self.fingerprint)
+
+    def test_cached_pdf_and_revalidation(self):
+        response = self.client.get("/generate-pdf", query_string=self.query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, PDF)
+        self.assertEqual(response.headers["ETag"], f'"{self.fingerprint}"')
+        self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+        response.close()
+
+        response = self.client.get("/generate-pdf", query_string=self.query, headers={"If-None-Match": f'"{self.fingerprint}"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+        last_modified = self.client.get("/generate-pdf", query_string=self.query).headers["Last-Modified"]
+        response = self.client.get("/generate-pdf", query_string=self.query, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_pdf_is_sent_again(self):
+        response = self.client.get("/generate-pdf", query_string=self.query, headers={"If-None-Match": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, PDF)
+        response.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
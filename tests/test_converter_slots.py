@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import time
+import unittest
+from unittest import mock
+
+from tests.helpers import temp_folder
+
+import ExcelModifier as excel_modifier
+
+
+def hold_slot(holders_dir, log_path):
+    """Holds a converter slot for a moment and logs how many holders there were meanwhile."""
+    with excel_modifier._converter_slot() as profile_dir:
+        marker = os.path.join(holders_dir, str(os.getpid()))
+        open(marker, "w").close()
+        time.sleep(0.2)
+        holders = len(os.listdir(holders_dir))
+        os.remove(marker)
+    with open(log_path, "a") as log_file:
+        log_file.write(f"{holders} {os.path.basename(profile_dir)}\n")
+
+
+@unittest.skipIf(excel_modifier.USE_XLWINGS, "LibreOffice converter slots are not used with Excel")
+class ConverterSlotsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = temp_folder(self)
+        self.holders_dir = os.path.join(self.folder, "holders")
+        os.mkdir(self.holders_dir)
+        self.log_path = os.path.join(self.folder, "log")
+        for patcher in (mock.patch.object(excel_modifier, "CONVERTER_DIR", self.folder),
+                        mock.patch.object(excel_modifier, "CONVERTER_WORKERS", 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cap_holds_across_processes(self):
+        # Forked processes, as WORKER_MODE=process and worker nodes on one machine convert.
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=hold_slot, args=(self.holders_dir, self.log_path)) for _ in range(5)]
+        started = time.monotonic()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+            self.assertEqual(process.exitcode, 0)
+        elapsed = time.monotonic() - started
+
+        with open(self.log_path) as log_file:
+            lines = [line.split() for line in log_file.read().splitlines()]
+        self.assertEqual(len(lines), 5)
+        self.assertLessEqual(max(int(holders) for holders, _ in lines), 2)
+        self.assertEqual({profile for _, profile in lines}, {"pdf_converter_profile_0", "pdf_converter_profile_1"})
+        # Five holders of 0.2 s on two slots take at least three rounds.
+        self.assertGreaterEqual(elapsed, 0.6)
+
+    def test_slot_is_freed_after_an_error(self):
+        with self.assertRaises(RuntimeError):
+            with excel_modifier._converter_slot():
+                raise RuntimeError("conversion failed")
+        for _ in range(2):
+            with excel_modifier._converter_slot() as first, excel_modifier._converter_slot() as second:
+                self.assertNotEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pypdf import PdfReader
+
+from tests.helpers import PROJECT_ID, FakeACCAPI, sample_payment
+
+import sections_functions.cost as cost
+
+
+def page_count(pdf_bytes):
+    return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+class PrintCostCoversTest(unittest.TestCase):
+    """print_cost_covers() converts every cover in one workbook and splits it back per payment."""
+
+    def setUp(self):
+        # Review stages are written to a scratch folder, not the real modified_files.
+        output = tempfile.TemporaryDirectory(prefix="cost_covers_test_")
+        self.addCleanup(output.cleanup)
+        self.folder = output.name
+        self.payments = [sample_payment(number) for number in (1, 2, 3)]
+        for patcher in (mock.patch.object(cost, "ACCAPI", lambda: FakeACCAPI(self.payments)),
+                        mock.patch("ExcelModifier.PDF_RENDERER", "native")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def print_covers(self, **kwargs):
+        return cost.print_cost_covers(PROJECT_ID, modified_folder=self.folder, **kwargs)
+
+    def state_exists(self, payment):
+        return os.path.exists(os.path.join(self.folder, f'{payment["id"]}.xlsx'))
+
+    def test_one_pdf_per_payment(self):
+        printed = self.print_covers()
+        self.assertEqual([entry["payment_id"] for entry in printed], [payment["id"] for payment in self.payments])
+        self.assertEqual([page_count(entry["pdf_bytes"]) for entry in printed], [1, 1, 1])
+        self.assertTrue(all(self.state_exists(payment) for payment in self.payments))
+
+    def test_failed_cover_is_left_out(self):
+        fill_cost_cover = cost.fill_cost_cover
+
+        def fill_or_fail(excel_modifier, acc_api, project_id, payment, new):
+            fill_cost_cover(excel_modifier, acc_api, project_id, payment, new)
+            if payment["number"] == "PAY-2":
+                raise ValueError("payment items could not be read")
+
+        with mock.patch.object(cost, "fill_cost_cover", fill_or_fail):
+            printed = self.print_covers()
+            combined = self.print_covers(split=False)
+
+        # The half-filled cover of PAY-2 is not converted, so the others keep their own PDFs.
+        self.assertEqual([entry["payment_id"] for entry in printed], [self.payments[0]["id"], self.payments[2]["id"]])
+        self.assertEqual([page_count(entry["pdf_bytes"]) for entry in printed], [1, 1])
+        self.assertEqual(page_count(combined), 2)
+        self.assertFalse(self.state_exists(self.payments[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
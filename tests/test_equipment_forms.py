@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+import tests.helpers  # noqa: F401  (puts the repository on sys.path)
+
+import app
+
+
+class EquipmentFormsTest(unittest.TestCase):
+    """The equipment reports run as a batch job with no PDF to download."""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def run_job(self, outcome):
+        with mock.patch.object(app, "run_equipment_forms", return_value=outcome):
+            response = self.client.get("/generate-equipment-form")
+            self.assertEqual(response.status_code, 202)
+            body = response.get_json()
+            self.assertEqual(response.headers["Location"], body["status_url"])
+            app.job_store.wait(app.job_store.get(body["job_id"]), timeout=5)
+        return self.client.get(body["result_url"])
+
+    def test_result_of_a_job_without_pdf(self):
+        response = self.run_job({"status_code": 200})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["state"], "done")
+
+    def test_failed_job(self):
+        response = self.run_job({"error": "Smart form template missing", "status_code": 500})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json()["error"], "Smart form template missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import shutil
+import threading
+import time
+import unittest
+
+from tests.helpers import REPO_ROOT, temp_folder
+
+from JobBroker import BrokerPool, SQLiteBroker, check_shared_state, publish_shared_state, run_worker
+from WorkerPool import QueueFull, ShuttingDown
+
+
+def render(data):
+    """A job as the workers run it: module level, so it can be pickled."""
+    return {"pdf_bytes": b"%PDF " + data["name"].encode("utf-8"), "status_code": 200}
+
+
+class SQLiteBrokerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(temp_folder(self), "jobs.sqlite3")
+        self.broker = SQLiteBroker(self.path, lease_timeout=0.3)
+
+    def test_every_job_is_claimed_once(self):
+        job_ids = [f"job-{i}" for i in range(40)]
+        for job_id in job_ids:
+            self.broker.put(job_id, render, {"name": job_id})
+        claimed = []
+        barrier = threading.Barrier(8)
+
+        def claim_all(worker_id):
+            # A broker per thread, as separate worker processes have.
+            broker = SQLiteBroker(self.path)
+            barrier.wait()
+            while True:
+                job = broker.claim(worker_id)
+                if job is None:
+                    return
+                claimed.append(job[0])
+
+        threads = [threading.Thread(target=claim_all, args=(f"worker-{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(job_ids))
+        self.assertEqual(self.broker.running(), 40)
+
+    def test_claim_order_follows_priority_classes(self):
+        self.broker.put("background", render, {"name": "b"}, priority="background")
+        self.broker.put("batch", render, {"name": "b"}, priority="batch")
+        self.broker.put("interactive", render, {"name": "i"})
+        self.assertEqual([self.broker.claim("w")[0] for _ in range(3)], ["interactive", "batch", "background"])
+
+    def test_job_without_heartbeat_is_queued_again(self):
+        self.broker.put("job", render, {"name": "job"})
+        self.assertEqual(self.broker.claim("first")[0], "job")
+        # Heartbeats keep the lease...
+        for _ in range(3):
+            time.sleep(0.15)
+            self.broker.heartbeat("job")
+            self.assertIsNone(self.broker.claim("second"))
+        # ...and once they stop, another worker gets the job.
+        time.sleep(0.4)
+        job_id, fn, data, row = self.broker.claim("second")
+        self.assertEqual((job_id, data), ("job", {"name": "job"}))
+        self.assertEqual(self.broker.jobs(["job"])["job"]["worker"], "second")
+
+    def test_job_past_its_deadline_expires(self):
+        self.broker.put("late", render, {"name": "late"}, deadline=time.time() - 1)
+        self.broker.put("on time", render, {"name": "on time"}, deadline=time.time() + 60)
+        self.assertEqual(self.broker.claim("w")[0], "on time")
+        self.assertIsNone(self.broker.claim("w"))
+        self.assertEqual(self.broker.jobs(["late"])["late"]["state"], "expired")
+
+
+class BrokerPoolCapacityTest(unittest.TestCase):
+
+    def test_capacity_holds_under_concurrent_submissions(self):
+        broker = SQLiteBroker(os.path.join(temp_folder(self), "jobs.sqlite3"))
+        pool = BrokerPool(broker=broker, artifact_dir=temp_folder(self), capacity=5)
+        accepted, rejected = [], []
+        barrier = threading.Barrier(20)
+
+        def submit():
+            barrier.wait()
+            try:
+                accepted.append(pool.submit(render, {"name": "job"}))
+            except QueueFull:
+                rejected.append(True)
+
+        threads = [threading.Thread(target=submit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(accepted), len(rejected)), (5, 15))
+        self.assertEqual(pool.shed["rejected"], 15)
+        self.assertEqual(pool.queue_size(), 5)
+
+        pool.draining = True
+        with self.assertRaises(ShuttingDown):
+            pool.submit(render, {"name": "job"})
+
+
+class SharedStateTest(unittest.TestCase):
+
+    def setUp(self):
+        folder = temp_folder(self)
+        self.broker = SQLiteBroker(os.path.join(folder, "jobs.sqlite3"))
+        self.state_dir = os.path.join(folder, "modified_files")
+        self.templates_dir = os.path.join(folder, "templates")
+        shutil.copytree(os.path.join(REPO_ROOT, "templates"), self.templates_dir)
+        self.other_dir = os.path.join(folder, "other")
+
+    def test_worker_needs_the_servers_folder_and_templates(self):
+        with self.assertRaises(RuntimeError):
+            check_shared_state(self.broker, self.state_dir, self.templates_dir)
+        publish_shared_state(self.broker, self.state_dir, self.templates_dir)
+        check_shared_state(self.broker, self.state_dir, self.templates_dir)
+
+        # A local folder of the same name is not the shared one.
+        os.makedirs(self.other_dir)
+        with self.assertRaises(RuntimeError):
+            check_shared_state(self.broker, self.other_dir, self.templates_dir)
+
+        # Publishing again keeps the marker, so running workers stay valid.
+        publish_shared_state(self.broker, self.state_dir, self.templates_dir)
+        check_shared_state(self.broker, self.state_dir, self.templates_dir)
+
+        with open(os.path.join(self.templates_dir, "cost_cover_template.xlsx"), "ab") as template_file:
+            template_file.write(b"changed")
+        with self.assertRaises(RuntimeError):
+            check_shared_state(self.broker, self.state_dir, self.templates_dir)
+
+
+class BrokerRoundTripTest(unittest.TestCase):
+    """A web server's BrokerPool and a worker sharing one folder."""
+
+    def setUp(self):
+        folder = temp_folder(self)
+        os.symlink(os.path.join(REPO_ROOT, "templates"), os.path.join(folder, "templates"))
+        os.chdir(folder)
+        self.addCleanup(os.chdir, REPO_ROOT)
+        broker = SQLiteBroker("jobs.sqlite3")
+        self.pool = BrokerPool(broker=broker, artifact_dir="artifacts", poll_interval=0.05).start()
+        self.stop = threading.Event()
+        worker = threading.Thread(target=run_worker, args=(SQLiteBroker("jobs.sqlite3"), "artifacts", 2, "test-worker", self.stop, 0.05))
+        worker.start()
+        self.addCleanup(worker.join, 5)
+        self.addCleanup(self.stop.set)
+
+    def test_results_and_expiry(self):
+        future = self.pool.submit(render, {"name": "cover"}, section="Costs")
+        result = future.result(timeout=10)
+        self.assertEqual(result["pdf_bytes"], b"%PDF cover")
+        self.assertIn("queue_wait_ms", result)
+        self.assertEqual(os.listdir("artifacts"), [])
+
+        late = self.pool.submit(render, {"name": "late"}, deadline=lambda: time.monotonic() - 1)
+        self.assertEqual(late.result(timeout=10)["status_code"], 503)
+        self.assertTrue(self.pool.drain(timeout=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
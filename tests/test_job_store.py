@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+
+import tests.helpers  # noqa: F401  (puts the repository on sys.path)
+
+from JobStore import JobStore
+from WorkerPool import QueueFull, WorkerPool
+
+
+def render(data):
+    return {"pdf_bytes": b"%PDF", "status_code": 200}
+
+
+class SlowPool(WorkerPool):
+    """A pool whose submit() takes a while, or waits for a signal, like a busy broker."""
+
+    def __init__(self, gate=None, error=None, **kwargs):
+        super().__init__(workers=1, mode="thread", section_limits={}, **kwargs)
+        self.gate = gate
+        self.error = error
+        self.submitted = []
+
+    def submit(self, fn, data, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(0.001)
+        if self.error is not None:
+            raise self.error
+        self.submitted.append(kwargs["priority"])
+        return super().submit(fn, data, **kwargs)
+
+
+class JobStoreTest(unittest.TestCase):
+
+    def submit_concurrently(self, store, count, **kwargs):
+        jobs = [None] * count
+        barrier = threading.Barrier(count)
+
+        def submit(index):
+            barrier.wait()
+            try:
+                jobs[index] = store.submit(render, {}, **kwargs)
+            except QueueFull as e:
+                jobs[index] = e
+
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return jobs
+
+    def test_concurrent_duplicates_share_one_job(self):
+        for _ in range(50):
+            pool = SlowPool()
+            store = JobStore(pool)
+            jobs = self.submit_concurrently(store, 4, key=("payment", 1))
+            self.assertEqual(len({job["id"] for job in jobs}), 1)
+            self.assertEqual(len(pool.submitted), 1)
+            self.assertEqual(jobs[0]["attached"], 4)
+            self.assertIn("future", jobs[0])
+
+        pool.start()
+        self.addCleanup(pool.drain, 5)
+        self.assertEqual(store.wait(jobs[0], timeout=5)["status_code"], 200)
+        self.assertEqual(store.get(jobs[0]["id"])["state"], "done")
+        self.assertEqual(store.in_flight, {})
+
+    def test_refused_job_fails_attached_requests(self):
+        gate = threading.Event()
+        store = JobStore(SlowPool(gate=gate, error=QueueFull(1, retry_after=4)))
+        outcome = {}
+
+        def submit_first():
+            try:
+                store.submit(render, {}, key=("payment", 1))
+            except QueueFull as e:
+                outcome["error"] = e
+
+        first = threading.Thread(target=submit_first)
+        first.start()
+        while not store.in_flight:
+            time.sleep(0.001)
+        attached = store.submit(render, {}, key=("payment", 1))
+        gate.set()
+        first.join()
+
+        self.assertIsInstance(outcome["error"], QueueFull)
+        self.assertEqual(store.wait(attached, timeout=5)["status_code"], 429)
+        self.assertEqual(store.in_flight, {})
+        self.assertIsNone(store.get(attached["id"]))
+
+    def test_urgent_request_attaching_before_the_job_is_queued(self):
+        gate = threading.Event()
+        pool = SlowPool(gate=gate)
+        store = JobStore(pool)
+        first = threading.Thread(target=store.submit, args=(render, {}), kwargs={"key": ("payment", 1), "priority": "background"})
+        first.start()
+        while not store.in_flight:
+            time.sleep(0.001)
+        job = store.submit(render, {}, key=("payment", 1), priority="interactive")
+        gate.set()
+        first.join()
+        self.assertEqual(job["priority"], "interactive")
+        self.assertEqual(pool.queue_depths(), {"interactive": 1, "batch": 0, "background": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import pypdfium2
+from PIL import Image, ImageFilter
+
+from tests.helpers import PROJECT_ID, FakeACCAPI, libreoffice_available, sample_payment, temp_folder
+
+from ExcelModifier import ExcelModifier
+from sections_functions.cost import fill_cost_cover
+
+
+# Largest difference in ink coverage (0 to 1) allowed in any cell of the comparison grid.
+# Fonts and anti-aliasing differ between the renderers (about 0.05 here); a missing block,
+# a shifted table or an empty amount column is well above it. Single values are not checked
+# this way, their glyphs differ too much between the two renderers.
+VISUAL_DIFF_TOLERANCE = 0.25
+
+# Size both pages are compared at, after cropping them to their content, and the grid of
+# regions whose ink coverage is compared.
+COMPARE_SIZE = (240, 340)
+COMPARE_GRID = (8, 12)
+
+
+def rasterize(pdf_bytes, page=0, scale=2):
+    """Renders one PDF page to a grayscale array in 0..1 (1 is white)."""
+    document = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        image = document[page].render(scale=scale).to_pil().convert("L")
+    finally:
+        document.close()
+    return numpy.asarray(image, dtype=numpy.float32) / 255
+
+
+def visual_difference(first, second):
+    """
+    Largest difference in ink coverage between the same region of two rasterized pages.
+    Each page is cropped to its ink and scaled to COMPARE_SIZE, so margins and page scaling
+    do not count, and strokes are thickened so their weight does not either.
+    """
+    def coverage(page):
+        ink = numpy.argwhere(page < 0.8)
+        if len(ink):
+            (top, left), (bottom, right) = ink.min(axis=0), ink.max(axis=0) + 1
+            page = page[top:bottom, left:right]
+        image = Image.fromarray(((page < 0.7) * 255).astype(numpy.uint8)).resize(COMPARE_SIZE, Image.BOX)
+        image = image.point(lambda value: 255 if value > 40 else 0).filter(ImageFilter.MaxFilter(5))
+        pixels = numpy.asarray(image, dtype=numpy.float32) / 255
+        columns, rows = COMPARE_GRID
+        height, width = pixels.shape[0] // rows, pixels.shape[1] // columns
+        return pixels[:height * rows, :width * columns].reshape(rows, height, columns, width).mean(axis=(1, 3))
+
+    return float(numpy.abs(coverage(first) - coverage(second)).max())
+
+
+class NativeRendererVisualDiffTest(unittest.TestCase):
+    """The native cost cover must look like the LibreOffice one."""
+
+    def render_cover(self, renderer):
+        modifier = ExcelModifier(template_filename="templates/cost_cover_template.xlsx", modified_folder=temp_folder(self))
+        modifier.open_workbook()
+        try:
+            fill_cost_cover(modifier, FakeACCAPI(), PROJECT_ID, sample_payment(), new=True)
+            pdf_bytes = modifier.export_to_pdf_bytes(renderer=renderer)
+        finally:
+            modifier.close_workbook()
+        self.assertTrue(pdf_bytes and pdf_bytes.startswith(b"%PDF"), f"{renderer} produced no PDF")
+        return pdf_bytes
+
+    def test_native_cover_is_one_filled_page(self):
+        pdf_bytes = self.render_cover("native")
+        document = pypdfium2.PdfDocument(pdf_bytes)
+        self.assertEqual(len(document), 1)
+        document.close()
+        page = rasterize(pdf_bytes)
+        self.assertGreater((page < 0.5).mean(), 0.01, "the cover has almost no ink")
+
+    def test_difference_metric_detects_missing_content(self):
+        page = rasterize(self.render_cover("native"))
+        self.assertEqual(visual_difference(page, page), 0)
+        # The same cover at another resolution is within tolerance...
+        self.assertLess(visual_difference(page, rasterize(self.render_cover("native"), scale=1.3)), VISUAL_DIFF_TOLERANCE)
+        # ...a cover missing a block of amounts is not.
+        height, width = page.shape
+        damaged = page.copy()
+        damaged[int(height * 0.4):int(height * 0.7), int(width * 0.2):int(width * 0.35)] = 1
+        self.assertGreater(visual_difference(page, damaged), VISUAL_DIFF_TOLERANCE)
+
+    @unittest.skipUnless(libreoffice_available(), "LibreOffice is not installed")
+    def test_native_matches_libreoffice(self):
+        native_pdf = self.render_cover("native")
+        libreoffice_pdf = self.render_cover("libreoffice")
+
+        native_document, libreoffice_document = pypdfium2.PdfDocument(native_pdf), pypdfium2.PdfDocument(libreoffice_pdf)
+        try:
+            self.assertEqual(len(native_document), len(libreoffice_document))
+            for native_size, libreoffice_size in zip(native_document[0].get_size(), libreoffice_document[0].get_size()):
+                self.assertAlmostEqual(native_size, libreoffice_size, delta=2)
+        finally:
+            native_document.close()
+            libreoffice_document.close()
+
+        difference = visual_difference(rasterize(native_pdf), rasterize(libreoffice_pdf))
+        if difference > VISUAL_DIFF_TOLERANCE:
+            # Keep both pages for a look at what differs.
+            folder = tempfile.mkdtemp(prefix="cover_visual_diff_")
+            for name, pdf_bytes in (("native", native_pdf), ("libreoffice", libreoffice_pdf)):
+                Image.fromarray((rasterize(pdf_bytes) * 255).astype("uint8")).save(os.path.join(folder, f"{name}.png"))
+            self.fail(f"native cover differs from LibreOffice's by {difference:.3f} "
+                      f"(tolerance {VISUAL_DIFF_TOLERANCE}), pages saved in {folder}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import io
+import unittest
+
+import tests.helpers  # noqa: F401  (puts the repository on sys.path)
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+from pdf_tools import _compact_with_pypdf
+
+
+def pdf_with_shared_image(pages=2, width=200, height=100):
+    """A PDF whose pages all draw the same raw (unfiltered) RGB image, like a logo."""
+    writer = PdfWriter()
+    image = DecodedStreamObject()
+    image.set_data(bytes((x * 7 + y * 3) % 256 for y in range(height) for x in range(width * 3)))
+    image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(width),
+            NameObject("/Height"): NumberObject(height),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    image_ref = writer._add_object(image)
+    for _ in range(pages):
+        page = writer.add_blank_page(width=300, height=200)
+        content = DecodedStreamObject()
+        content.set_data(f"q {width} 0 0 {height} 10 10 cm /Logo Do Q".encode("ascii"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+                NameObject("/XObject"): DictionaryObject({NameObject("/Logo"): image_ref}),
+        })
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue(), image.get_data()
+
+
+class CompactWithPypdfTest(unittest.TestCase):
+
+    def test_shared_image_is_compressed_once(self):
+        pdf_bytes, pixels = pdf_with_shared_image(pages=3)
+        compacted = _compact_with_pypdf(pdf_bytes)
+        self.assertLess(len(compacted), len(pdf_bytes))
+
+        reader = PdfReader(io.BytesIO(compacted))
+        self.assertEqual(len(reader.pages), 3)
+        for page in reader.pages:
+            logo = page["/Resources"]["/XObject"]["/Logo"].get_object()
+            self.assertEqual(logo["/Filter"], "/FlateDecode")
+            self.assertEqual(logo.get_data(), pixels)
+            self.assertEqual(page.images[0].image.size, (200, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
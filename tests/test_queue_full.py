@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+from tests.helpers import PROJECT_ID
+
+from WorkerPool import QueueFull, ShuttingDown
+
+import app
+
+
+class QueueFullResponseTest(unittest.TestCase):
+    """A full queue asks the client to slow down (429), a shutdown to come back later (503)."""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.body = {"url": f"https://acc.autodesk.com/build/cost/projects/{PROJECT_ID}/cost/cost?preview=pay-1", "refresh": True}
+
+    def post(self, path, error):
+        with mock.patch.object(app.job_store, "submit", side_effect=error):
+            return self.client.post(path, json=self.body)
+
+    def test_queue_at_capacity_is_429(self):
+        for path in ("/generate-pdf", "/jobs"):
+            response = self.post(path, QueueFull(50, retry_after=12))
+            self.assertEqual(response.status_code, 429, path)
+            self.assertEqual(response.headers["Retry-After"], "12")
+
+    def test_shutting_down_is_503(self):
+        for path in ("/generate-pdf", "/jobs"):
+            response = self.post(path, ShuttingDown(retry_after=3))
+            self.assertEqual(response.status_code, 503, path)
+            self.assertEqual(response.headers["Retry-After"], "3")
+
+
+if __name__ == '__main__':
+    unittest.main()
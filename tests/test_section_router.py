@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from tests.helpers import PROJECT_ID, temp_folder
+
+from SectionRouter import SectionRouter
+
+import app
+
+
+class SectionRouterTest(unittest.TestCase):
+
+    def test_first_matching_pattern_wins(self):
+        router = SectionRouter()
+        router.register("Cost items", r"/cost/items", "json:dumps")
+        router.register("Costs", r"/cost", "json:dumps")
+        router.register("Catch all", r".", "json:dumps")
+        self.assertEqual(router.match("https://acc.autodesk.com/cost/items/1")["name"], "Cost items")
+        self.assertEqual(router.match("https://acc.autodesk.com/cost/cost/1")["name"], "Costs")
+        self.assertEqual(router.match("https://acc.autodesk.com/forms")["name"], "Catch all")
+        self.assertIsNone(SectionRouter().match("https://acc.autodesk.com/cost"))
+
+    def test_app_sections(self):
+        base = f"https://acc.autodesk.com/build/{{}}/projects/{PROJECT_ID}/"
+        self.assertEqual(app.detect_section(base.format("budget") + "budgets"), "Budgets")
+        self.assertEqual(app.detect_section(base.format("cost") + "cost/cost?preview=1"), "Costs")
+        self.assertEqual(app.detect_section(base.format("forms") + "forms"), "Forms")
+        self.assertIsNone(app.detect_section(base.format("files") + "files"))
+
+    def test_handler_is_imported_on_first_use(self):
+        folder = temp_folder(self)
+        with open(os.path.join(folder, "lazy_section.py"), "w") as module_file:
+            module_file.write("def export(context):\n    return {'status_code': 200, 'url': context['url']}\n")
+        sys.path.insert(0, folder)
+        self.addCleanup(sys.path.remove, folder)
+        self.addCleanup(sys.modules.pop, "lazy_section", None)
+
+        router = SectionRouter()
+        router.register("Lazy", r"/lazy", "lazy_section:export")
+        route = router.match("https://acc.autodesk.com/lazy")
+        self.assertNotIn("lazy_section", sys.modules)
+
+        handler = router.handler(route)
+        self.assertIn("lazy_section", sys.modules)
+        self.assertEqual(handler({"url": "u"}), {"status_code": 200, "url": "u"})
+        self.assertIs(router.handler(route), handler)
+
+    def test_prefetch_fetches_every_dependency(self):
+        router = SectionRouter()
+        router.register("Forms", r"/forms", "json:dumps", dependencies={
+                "forms": ("construction/forms/v1/projects/{project_id}/forms", "data"),
+                "templates": ("construction/forms/v1/projects/{project_id}/form-templates", "data"),
+        })
+        acc_api = mock.Mock()
+        acc_api.call_api.side_effect = lambda endpoint: {"data": endpoint.rsplit("/", 1)[-1]}
+        fetched = router.prefetch(router.match("/forms"), {"project_id": PROJECT_ID}, lambda: acc_api)
+        self.assertEqual(fetched, {"forms": "forms", "templates": "form-templates"})
+        acc_api.call_api.assert_any_call(f"construction/forms/v1/projects/{PROJECT_ID}/forms")
+
+        # Sections without dependencies never build an ACCAPI.
+        router.register("Budgets", r"/budget", "json:dumps")
+        self.assertEqual(router.prefetch(router.match("/budget"), {}, mock.Mock(side_effect=AssertionError)), {})
+
+    def test_failed_prefetch_is_a_server_error(self):
+        acc_api = mock.Mock()
+        acc_api.call_api.side_effect = ConnectionError("ACC is unreachable")
+        handler = mock.Mock()
+        with mock.patch.object(app, "ACCAPI", lambda: acc_api), \
+                mock.patch.object(app.section_router, "handler", return_value=handler):
+            result = app.process_request({"url": f"https://acc.autodesk.com/build/forms/projects/{PROJECT_ID}/forms"})
+        self.assertEqual(result["status_code"], 500)
+        self.assertIn("ACC is unreachable", result["error"])
+        handler.assert_not_called()
+
+    def test_unknown_section_is_a_bad_request(self):
+        result = app.process_request({"url": f"https://acc.autodesk.com/build/files/projects/{PROJECT_ID}/files"})
+        self.assertEqual(result["status_code"], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+from urllib.parse import urlparse
+
+from tests.helpers import PROJECT_ID
+
+import webhook_simulator
+
+import app
+
+
+SECRET = "webhook-test-secret"
+PAYMENT_ID = "00000001-aaaa-bbbb-cccc-dddddddddddd"
+
+
+class AccWebhookTest(unittest.TestCase):
+    """Events from webhook_simulator, posted to /webhooks/acc through the Flask test client."""
+
+    def setUp(self):
+        client = app.app.test_client()
+
+        def post(url, data, headers, timeout):
+            return client.post(urlparse(url).path, data=data, headers=headers)
+
+        self.job = {"id": "webhook-job", "future": Future()}
+        self.submit = mock.Mock(return_value=self.job)
+        for patcher in (mock.patch.object(webhook_simulator.requests, "post", post),
+                        mock.patch.object(app, "WEBHOOK_SECRET", SECRET),
+                        mock.patch.object(app.job_store, "submit", self.submit)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, event_name="payment.updated-1.0", secret=SECRET, payment_id=PAYMENT_ID):
+        event = webhook_simulator.build_event(event_name, PROJECT_ID, payment_id)
+        return webhook_simulator.send_event(event, url="http://localhost/webhooks/acc", secret=secret)
+
+    def fingerprint(self, url, all_payments=False):
+        data = {"url": url, "all_payments": True} if all_payments else {"url": url}
+        return app.request_fingerprint(app.coalescing_key(data))
+
+    def test_event_discards_stale_pdfs_and_pregenerates(self):
+        cost_url = f"https://acc.autodesk.com/build/cost/projects/{PROJECT_ID}/cost/cost"
+        stale = [self.fingerprint(f"{cost_url}?preview={PAYMENT_ID}"),
+                 self.fingerprint(f"{cost_url}?preview={PAYMENT_ID}", all_payments=True),
+                 self.fingerprint(cost_url),
+                 self.fingerprint(cost_url, all_payments=True)]
+        other_payment = self.fingerprint(f"{cost_url}?preview=00000002-aaaa-bbbb-cccc-dddddddddddd")
+        for fingerprint in stale + [other_payment]:
+            app.artifact_cache.put(fingerprint, b"%PDF old")
+            self.addCleanup(app.artifact_cache.discard, fingerprint)
+
+        response = self.send()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()["job_id"], "webhook-job")
+        for fingerprint in stale:
+            self.assertIsNone(app.artifact_cache.get(fingerprint))
+        self.assertIsNotNone(app.artifact_cache.get(other_payment))
+
+        _, data = self.submit.call_args.args
+        self.assertEqual(data, {"url": f"{cost_url}?preview={PAYMENT_ID}"})
+        self.assertEqual(self.submit.call_args.kwargs["priority"], "background")
+        self.assertFalse(self.submit.call_args.kwargs["attach_running"])
+
+        # A second delivery attaches to the same job without a second callback.
+        self.assertEqual(self.send().status_code, 202)
+        self.job["future"].set_result({"pdf_bytes": b"%PDF new", "status_code": 200})
+        with open(app.artifact_cache.get(stale[0]), "rb") as pdf_file:
+            self.assertEqual(pdf_file.read(), b"%PDF new")
+
+    def test_unsigned_event_is_refused(self):
+        self.assertEqual(self.send(secret="").status_code, 401)
+        self.assertEqual(self.send(secret="wrong secret").status_code, 401)
+        self.submit.assert_not_called()
+
+    def test_other_events_are_acknowledged(self):
+        response = self.send(event_name="payment.deleted-1.0")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "ignored")
+        self.submit.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import threading
+import time
+import unittest
+
+import tests.helpers  # noqa: F401  (puts the repository on sys.path)
+
+from WorkerPool import QueueFull, ShuttingDown, WorkerPool
+
+
+def record(data):
+    data["log"].append(data["name"])
+    return {"status_code": 200}
+
+
+class WorkerPoolTest(unittest.TestCase):
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault("weights", {"interactive": 8, "batch": 2, "background": 1})
+        kwargs.setdefault("section_limits", {})
+        pool = WorkerPool(mode="thread", **kwargs)
+        # Worker threads are daemons; drain lets the running ones finish before the next test.
+        self.addCleanup(pool.drain, 5)
+        return pool
+
+    def test_weighted_fair_queuing_order(self):
+        pool = self.make_pool(workers=1)
+        log = []
+        futures = [pool.submit(record, {"log": log, "name": f"batch-{i}"}, priority="batch") for i in range(2)]
+        futures += [pool.submit(record, {"log": log, "name": f"interactive-{i}"}, priority="interactive") for i in range(10)]
+        pool.start()
+        for future in futures:
+            future.result(timeout=5)
+        # Finish tags grow by 1/8 for interactive and 1/2 for batch jobs: interactive work goes
+        # first, but a batch job still runs at every fourth interactive one (on equal tags too).
+        self.assertEqual([name.split("-")[0] for name in log],
+                         ["interactive"] * 3 + ["batch"] + ["interactive"] * 4 + ["batch"] + ["interactive"] * 3)
+        self.assertEqual([name for name in log if name.startswith("interactive")], [f"interactive-{i}" for i in range(10)])
+
+    def test_section_limit_parks_jobs_without_holding_workers(self):
+        pool = self.make_pool(workers=3, section_limits={"Costs": 1})
+        release = threading.Event()
+        lock = threading.Lock()
+        running = {"Costs": 0, "max": 0}
+
+        def cost_job(data):
+            with lock:
+                running["Costs"] += 1
+                running["max"] = max(running["max"], running["Costs"])
+            release.wait(5)
+            with lock:
+                running["Costs"] -= 1
+            return {"status_code": 200}
+
+        costs = [pool.submit(cost_job, {}, section="Costs") for _ in range(3)]
+        pool.start()
+        # With one Costs job running the others are parked, and a Forms job still gets a worker.
+        forms = pool.submit(record, {"log": [], "name": "form"}, section="Forms")
+        self.assertEqual(forms.result(timeout=5)["status_code"], 200)
+        self.wait_for(lambda: len(pool.parked.get("Costs", ())) == 2)
+        self.assertEqual(pool.busy(), 1)
+        self.assertEqual(pool.queue_depths()["interactive"], 2)
+
+        release.set()
+        for future in costs:
+            self.assertEqual(future.result(timeout=5)["status_code"], 200)
+        self.assertEqual(running["max"], 1)
+        self.assertEqual(pool.queue_size(), 0)
+
+    def test_picked_job_counts_as_running(self):
+        pool = self.make_pool(workers=1)
+        pool.submit(record, {"log": [], "name": "job"}, section="Costs")
+        # A job taken off the queue is running before the worker does anything else with it,
+        # so drain() cannot report an empty pool in between.
+        job = pool._next_job()
+        self.assertEqual(pool.busy(), 1)
+        self.assertFalse(pool.drain(timeout=0.1))
+        pool._leave(job["section"])
+        self.assertTrue(pool.drain(timeout=1))
+
+    def test_expired_job_frees_its_section_slot(self):
+        pool = self.make_pool(workers=1, section_limits={"Costs": 1})
+        expired = pool.submit(record, {"log": [], "name": "late"}, section="Costs", deadline=lambda: time.monotonic() - 1)
+        on_time = pool.submit(record, {"log": [], "name": "on time"}, section="Costs")
+        pool.start()
+        self.assertEqual(expired.result(timeout=5)["status_code"], 503)
+        self.assertEqual(on_time.result(timeout=5)["status_code"], 200)
+        self.assertEqual(pool.shed["expired"], 1)
+        self.assertEqual(pool.busy(), 0)
+
+    def test_capacity_holds_under_concurrent_submissions(self):
+        pool = self.make_pool(workers=1, capacity=5)
+        accepted, rejected = [], []
+        barrier = threading.Barrier(20)
+
+        def submit():
+            barrier.wait()
+            try:
+                accepted.append(pool.submit(record, {"log": [], "name": "job"}))
+            except QueueFull:
+                rejected.append(True)
+
+        threads = [threading.Thread(target=submit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(accepted), len(rejected)), (5, 15))
+        self.assertEqual(pool.shed["rejected"], 15)
+
+        pool.start()
+        self.assertTrue(pool.drain(timeout=5))
+        with self.assertRaises(ShuttingDown):
+            pool.submit(record, {"log": [], "name": "job"})
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not met in time")
+            time.sleep(0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import re
 from datetime import datetime
 from ACCAPI import ACCAPI
 from ExcelModifier import ExcelModifier
+from pdf_tools import bundle_pdfs
 import pandas as pd
 
 
@@ -135,6 +136,9 @@ def generate_smart_form():
         # df_filtered.to_excel("D:\\OneDrive - Square Engineering Firm\\Users\\ABDALLAH.MAMDOUH\\Desktop\\New Microsoft Excel Worksheet9.xlsx", index=False)
         date_now = (datetime.now().strftime("%A, %B %d, %Y"))
 
+        # Saved workbooks are converted together at the end instead of one LibreOffice run each
+        pending_exports = []
+
         for proj in df_filtered["project_name"].unique():
             df_project = df_filtered[df_filtered["project_name"] == proj]
             print(f"Processing project: {proj}")
@@ -143,60 +147,34 @@ def generate_smart_form():
 
             # Open workbook for current project
             modifier.open_workbook()
-            m = 7  # Starting from row 7
-
-            # Modify each row for the project
-            for _, row in df_project.iterrows():
-                print(f"Modifying row {m} with data: {row}")  # Check the row data before modifying
-
-                # Ensure all required columns have data
-                if not pd.isnull(row["form_Num"]) and not pd.isnull(row["project_name"]) and not pd.isnull(row["form_date"]):
-                    # Modify cells only if data is available
-                    modifier.modify_cell(f'A{m}', row.get("form_Num", ""))
-                    modifier.modify_cell(f'B{m}', row.get("project_name", ""))
-                    modifier.modify_cell(f'D{m}', row.get("form_date", ""))
-                    modifier.modify_cell(f'H{m}', row.get("form_desc", ""))
-                    modifier.modify_cell(f'P{m}', row.get("قيمة الساعة", ""))
-                    modifier.modify_cell(f'R{m}', row.get("الخصم", ""))
-                    modifier.modify_cell(f'S{m}', f"=P{m}*Q{m}-R{m}")
-                    modifier.modify_cell(f'L{m}', row.get("اسم المقاول", ""))
-                    modifier.modify_cell(f'M{m}', row.get("المعدات", ""))
-                    modifier.modify_cell(f'Q{m}', row.get("عدد ساعات معدة", ""))
-                    modifier.modify_cell(f'O{m}', 1)
-                    modifier.modify_cell(f'N{m}', provider_type)
-                    modifier.modify_cell(f'I{m}', WBS_code)
-                    modifier.modify_cell(f'J{m}', change_on)
-                    modifier.modify_cell(f'K{m}', order_name)
-
-                    # Only increment row number if data is populated
-                    m += 1
-                else:
-                    print(f"Skipping row {m} due to missing data")
-
-                # Insert a new row if necessary
-                if m >= 8:  # Ensuring it doesn't insert too early
-                    modifier.insert_row(m)
-
-            modifier.modify_cell(f'S{m + 2}', f"=SUM(S7:S{m})")
 
+            def equipment_rows(df_project=df_project):
+                """Yields one report row per complete form entry, columns A to S."""
+                for _, row in df_project.iterrows():
+                    # Ensure all required columns have data
+                    if pd.isnull(row["form_Num"]) or pd.isnull(row["project_name"]) or pd.isnull(row["form_date"]):
+                        print(f"Skipping row due to missing data: {row.get('form_Num')}")
+                        continue
+                    yield [
+                            row.get("form_Num", ""), row.get("project_name", ""), None, row.get("form_date", ""),
+                            None, None, None, row.get("form_desc", ""), WBS_code, change_on, order_name,
+                            row.get("اسم المقاول", ""), row.get("المعدات", ""), provider_type, 1,
+                            row.get("قيمة الساعة", ""), row.get("عدد ساعات معدة", ""), row.get("الخصم", ""),
+                            "=P{row}*Q{row}-R{row}",
+                    ]
 
             try:
-                # modifier.save_workbook()  # Save workbook after all rows are processed
-                # modifier.export_to_pdf_no_upload(excel_filename=f"{proj} - {date_now}")
-                modifier.modified_folder = "modified_files"
+                # One folder per project so the batch export below does not mix up same-named reports
+                modifier.modified_folder = os.path.join("modified_files", sanitize_filename(proj))
+                os.makedirs(modifier.modified_folder, exist_ok=True)
                 date_now = datetime.now().strftime("%A, %B %d, %Y")  # Format: Tuesday, February 11, 2025
                 file_name = f"Equipment ({date_now})"
 
+                # Rows are streamed below the template header starting at row 7, total in the footer
                 print(f"Saving workbook as {file_name}.xlsx")
-                modifier.save_workbook(filename=f"{file_name}.xlsx")
-                print(f"Exporting to PDF")
-                print("-" * 40)
-                modifier.export_to_pdf_no_upload(excel_filename=file_name)
-                print(f"uploading  PDF")
-                print("-" * 40)
-                print(proj)
-                pdf_path = os.path.join(modifier.modified_folder, file_name)
-                acc_api.upload_equipment_pdf_to_acc(pdf_path=f"modified_files/{file_name}.pdf", filename=f"{file_name}", folder_name=f"Equipment/{proj}")
+                modifier.write_streaming_report(equipment_rows(), data_start_row=7, filename=f"{file_name}.xlsx",
+                                                footer_values={"S9": "=SUM(S7:S{last_row})"})
+                pending_exports.append(modifier.queue_pdf_export(file_name, job=proj))
 
             except Exception as e:
                 print(f"Error saving workbook: {e}")
@@ -223,57 +201,31 @@ def generate_smart_form():
             modifier = ExcelModifier(template_file, output_folder)
 
             modifier.open_workbook()
-            m = 7  # Starting from row 7
-
-            # Modify each row for the project
-            for _, row in df_project.iterrows():
-                print(f"Modifying row {m} with data: {row}")  # Check the row data before modifying
-
-                
-                # Ensure all required columns have data
-                if not pd.isnull(row["project_name"]):
-                    # Modify cells only if data is available
-                    modifier.modify_cell(f'A{m}', row.get("project_name", ""))
-                    modifier.modify_cell(f'I{m}', row.get("قيمة الساعة", ""))
-                    modifier.modify_cell(f'K{m}', row.get("الخصم", ""))
-                    modifier.modify_cell(f'L{m}', f"=I{m}*J{m}-K{m}")
-                    modifier.modify_cell(f'E{m}', row.get("اسم المقاول", ""))
-                    modifier.modify_cell(f'F{m}', row.get("المعدات", ""))
-                    modifier.modify_cell(f'J{m}', row.get("عدد ساعات معدة", ""))
-                    modifier.modify_cell(f'H{m}', row.get("الكمية", ""))
-                    modifier.modify_cell(f'G{m}', provider_type)
-                    modifier.modify_cell(f'B{m}', WBS_code)
-                    modifier.modify_cell(f'C{m}', change_on)
-                    modifier.modify_cell(f'D{m}', order_name)
-
-                    # Only increment row number if data is populated
-                    m += 1
-                else:
-                    print(f"Skipping row {m} due to missing data")
-
-                # Insert a new row if necessary
-                if m >= 8:  # Ensuring it doesn't insert too early
-                    modifier.insert_row(m)
-
-
-            modifier.modify_cell(f'L{m + 2}', f"=SUM(L7:L{m})")
 
+            def summary_rows(df_project=df_project):
+                """Yields one summary row per contractor and equipment, columns A to L."""
+                for _, row in df_project.iterrows():
+                    # Ensure all required columns have data
+                    if pd.isnull(row["project_name"]):
+                        print("Skipping row due to missing data")
+                        continue
+                    yield [
+                            row.get("project_name", ""), WBS_code, change_on, order_name,
+                            row.get("اسم المقاول", ""), row.get("المعدات", ""), provider_type, row.get("الكمية", ""),
+                            row.get("قيمة الساعة", ""), row.get("عدد ساعات معدة", ""), row.get("الخصم", ""),
+                            "=I{row}*J{row}-K{row}",
+                    ]
 
             try:
-                modifier.modified_folder = "modified_files"
+                modifier.modified_folder = os.path.join("modified_files", sanitize_filename(proj))
+                os.makedirs(modifier.modified_folder, exist_ok=True)
                 date_now = datetime.now().strftime("%A, %B %d, %Y")  # Format: Tuesday, February 11, 2025
                 file_name = f"Equipment Summary ({date_now})"
                 
                 print(f"Saving workbook as {file_name}.xlsx")
-                modifier.save_workbook(filename=f"{file_name}.xlsx")
-                print(f"Exporting to PDF")
-                print("-" * 40)
-                modifier.export_to_pdf_no_upload(excel_filename=file_name)
-                print(f"uploading  PDF")
-                print("-" * 40)
-                print(proj)
-                pdf_path = os.path.join(modifier.modified_folder, file_name)
-                acc_api.upload_equipment_pdf_to_acc(pdf_path=f"modified_files/{file_name}.pdf", filename=f"{file_name}", folder_name=f"Equipment/{proj}")
+                modifier.write_streaming_report(summary_rows(), data_start_row=7, filename=f"{file_name}.xlsx",
+                                                footer_values={"L9": "=SUM(L7:L{last_row})"})
+                pending_exports.append(modifier.queue_pdf_export(file_name, job=proj))
                 
                 
                 # modifier.save_workbook(filename=f"{file_name}.xlsx")  
@@ -286,7 +238,21 @@ def generate_smart_form():
             finally:
                 modifier.close_workbook()
 
-
+        print(f"Exporting {len(pending_exports)} workbooks to PDF")
+        print("-" * 40)
+        exported = [entry for entry in ExcelModifier.convert_batch_to_pdf(pending_exports) if entry["status"] == "ok"]
+        for entry in exported:
+            print(f"uploading PDF for {entry['job']}")
+            print("-" * 40)
+            acc_api.upload_equipment_pdf_to_acc(pdf_path=entry["pdf_path"], filename=entry["pdf_filename"], folder_name=f"Equipment/{entry['job']}")
+
+        # All of this run's reports in one bookmarked file, so nobody has to collect them project by project
+        date_now = datetime.now().strftime("%A, %B %d, %Y")
+        bundle_name = f"Equipment Reports ({date_now})"
+        bundle = bundle_pdfs([(f"{entry['job']} - {entry['pdf_filename']}", entry["pdf_path"]) for entry in exported],
+                             os.path.join("modified_files", f"{bundle_name}.pdf"))
+        if bundle:
+            acc_api.upload_equipment_pdf_to_acc(pdf_path=bundle["path"], filename=bundle_name, folder_name="Equipment")
 
 
     except EnvironmentError as env_err:
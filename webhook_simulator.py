@@ -0,0 +1,76 @@
+"""
+Stands in for ACC webhooks during development and tests:
+
+    python webhook_simulator.py <project id> <payment id> [<payment id> ...]
+
+Posts cost payment events to the server's /webhooks/acc in the shape APS delivers them,
+signed with WEBHOOK_SECRET when it is set, and prints how the server answered.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+
+import requests
+
+
+# Receiver the events are posted to.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://localhost:8000/webhooks/acc")
+
+# Secret the events are signed with; must match the server's.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+
+def build_event(event_name, project_id, payment_id, status="draft"):
+    """Returns an APS webhook callback body for a cost payment event."""
+    return {
+            "version": "1.0.0",
+            "resourceUrn": f"urn:adsk.cost:payment:{payment_id}",
+            "hook": {
+                    "hookId": str(uuid.uuid4()),
+                    "system": "autodesk.construction.cost",
+                    "event": event_name,
+                    "tenant": project_id,
+                    "scope": {"project": f"b.{project_id}"},
+            },
+            "payload": {
+                    "id": payment_id,
+                    "containerId": project_id,
+                    "status": status,
+                    "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            },
+    }
+
+
+def send_event(event, url=WEBHOOK_URL, secret=WEBHOOK_SECRET):
+    """Posts an event like ACC does and returns the response."""
+    body = json.dumps(event).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["x-adsk-signature"] = "sha1hash=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha1).hexdigest()
+    return requests.post(url, data=body, headers=headers, timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send simulated ACC cost payment events.")
+    parser.add_argument("project_id")
+    parser.add_argument("payment_ids", nargs="+")
+    parser.add_argument("--event", default="payment.updated-1.0", help="event name, e.g. payment.created-1.0")
+    parser.add_argument("--status", default="draft", help="payment status in the payload")
+    parser.add_argument("--url", default=WEBHOOK_URL)
+    parser.add_argument("--repeat", type=int, default=1, help="times every event is sent (ACC may deliver twice)")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between events")
+    args = parser.parse_args()
+
+    for _ in range(args.repeat):
+        for payment_id in args.payment_ids:
+            response = send_event(build_event(args.event, args.project_id, payment_id, args.status), url=args.url)
+            print(f"{args.event} {payment_id}: {response.status_code} {response.text.strip()}")
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Worker node entry point: python worker.py
+
+Runs PDF generation jobs that a web server started with JOB_TRANSPORT=sqlite queued in the
+broker (BROKER_PATH), and leaves their PDFs in BROKER_ARTIFACT_DIR for it to pick up. Any
+number of workers can run, on this machine or others. Run it from the repository root.
+
+Workers keep no state of their own, but the jobs do: cost covers keep each payment's review
+stage in modified_files, and every section renders from templates. Every node needs the web
+server's modified_files (the same share, like BROKER_PATH and BROKER_ARTIFACT_DIR, e.g. mounted
+or symlinked there) and identical templates; a worker without them refuses to start.
+
+SIGTERM (or Ctrl+C) stops claiming jobs and lets the running ones finish.
+"""
+# Imported first, so the startup clock starts as close to process start as possible.
+from Metrics import mark_startup
+
+import os
+import signal
+import sys
+import threading
+
+# This process only runs jobs; the app must not start a pool of its own when imported.
+os.environ["START_WORKER_POOL"] = "false"
+
+# Jobs this worker runs at the same time.
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+
+
+def main():
+    # The jobs are app functions; importing the app up front keeps that out of the first job.
+    import app  # noqa: F401
+    from JobBroker import run_worker
+    mark_startup("imported")
+
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        if not stop.is_set():
+            print(f"Received signal {signum}, finishing running jobs")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    try:
+        run_worker(concurrency=WORKER_CONCURRENCY, stop=stop)
+    except RuntimeError as e:
+        print(f"Worker not started: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()